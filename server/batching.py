@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Dynamic micro-batching for single-row predictions.
+
+Many concurrent single-row predict_temperature / classify_weather calls each
+pay for a full model invocation. A MicroBatcher queues them instead: a
+background thread takes the first waiting request, keeps collecting for up to
+max_wait_ms or until max_batch_size requests are queued, scores them with one
+vectorized *_batch call and hands each caller its own row of the result.
+
+max_wait_ms trades latency for throughput (0 = only batch what is already
+queued); max_batch_size bounds the matrix size. stats() reports request and
+batch counts plus a batch-size histogram in power-of-two buckets
+("4" counts batches of 3-4 requests).
+
+http_server.py batches in-process; worker_pool.py batches the requests it
+forwards from Node into one "coalesced" worker request (worker.py). predict
+is only imported by the scoring helpers, so the pool supervisor stays light.
+"""
+
+import time
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+DEFAULT_MAX_BATCH_SIZE = 64
+DEFAULT_MAX_WAIT_MS = 2.0
+
+_STOP = object()
+
+
+def _debug_print(msg: str):
+    import sys
+    print("[batching.py] " + msg, file=sys.stderr)
+
+
+def split_batch_result(result: Dict[str, Any], n: int) -> List[Any]:
+    """
+    Per-row dicts from a *_batch result: array fields are indexed, the rest
+    (metrics) shared. Rows that failed validation become ValueErrors, which
+    the batcher raises for that caller only.
+    """
+    rows: List[Any] = [{} for _ in range(n)]
+    errors = result.get('errors') or {}
+    for key, value in result.items():
+        if key in ('valid', 'errors'):
+            continue
+        if isinstance(value, np.ndarray):
+            for row, v in zip(rows, value.tolist()):
+                row[key] = v
+        else:
+            for row in rows:
+                row[key] = value
+    for i, messages in errors.items():
+        rows[i] = ValueError("Invalid input: " + "; ".join(messages))
+    return rows
+
+
+class MicroBatcher:
+    """Queue single rows and score them in batches with `score_batch(rows) -> [result per row]`."""
+
+    def __init__(self, score_batch: Callable[[List[Any]], List[Any]],
+                 max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+                 max_wait_ms: float = DEFAULT_MAX_WAIT_MS,
+                 name: str = "batcher"):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self.score_batch = score_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.name = name
+        self._queue: "queue.Queue" = queue.Queue()
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._batches = 0
+        self._largest = 0
+        self._histogram: Dict[int, int] = {}
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, row: Any) -> Future:
+        """
+        Queue one row; the future resolves to its result, or raises when
+        score_batch returned an exception for it. If scoring the whole batch
+        raises, every caller in that batch gets the error.
+        """
+        if self._closed:
+            raise RuntimeError("%s is closed" % self.name)
+        fut: Future = Future()
+        self._queue.put((row, fut))
+        return fut
+
+    def __call__(self, row: Any, timeout: Optional[float] = None) -> Any:
+        return self.submit(row).result(timeout)
+
+    def _collect(self, first) -> list:
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                self._queue.put(_STOP)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is _STOP:
+                return
+            batch = self._collect(first)
+            self._record(len(batch))
+            rows = [row for row, _ in batch]
+            try:
+                results = self.score_batch(rows)
+                if len(results) != len(rows):
+                    raise RuntimeError("score_batch returned %d results for %d rows" % (len(results), len(rows)))
+            except Exception as e:
+                _debug_print("%s: batch of %d failed: %s" % (self.name, len(rows), e))
+                for _, fut in batch:
+                    fut.set_exception(e)
+                continue
+            for (_, fut), result in zip(batch, results):
+                if isinstance(result, Exception):
+                    fut.set_exception(result)
+                else:
+                    fut.set_result(result)
+
+    def _record(self, size: int):
+        bucket = 1 << (size - 1).bit_length()
+        with self._lock:
+            self._requests += size
+            self._batches += 1
+            self._largest = max(self._largest, size)
+            self._histogram[bucket] = self._histogram.get(bucket, 0) + 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "requests": self._requests,
+                "batches": self._batches,
+                "mean_batch_size": self._requests / self._batches if self._batches else 0.0,
+                "max_batch_size_seen": self._largest,
+                "batch_size_histogram": {str(k): v for k, v in sorted(self._histogram.items())},
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000.0,
+            }
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._queue.put(_STOP)
+            self._thread.join()
+
+
+def temperature_batcher(models=None, **kwargs) -> MicroBatcher:
+    """Batches {humidity, pressure, wind_speed, clouds} rows; results match predict_temperature()."""
+    from predict import predict_temperature_batch
+
+    def score(rows):
+        return split_batch_result(predict_temperature_batch(rows, models=models), len(rows))
+    kwargs.setdefault("name", "temperature-batcher")
+    return MicroBatcher(score, **kwargs)
+
+
+def weather_batcher(models=None, **kwargs) -> MicroBatcher:
+    """Batches {temperature, humidity, ...} rows; results match classify_weather()."""
+    from predict import classify_weather_batch
+
+    def score(rows):
+        return split_batch_result(classify_weather_batch(rows, models=models), len(rows))
+    kwargs.setdefault("name", "weather-batcher")
+    return MicroBatcher(score, **kwargs)
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Model artifact load benchmark
+Times loading every model and metric artifact from the serving directory in
+each format: the six joblib pickles, the six compiled .npz/.json files and
+the single weather_models.bundle (read once, or memory-mapped), and a cold
+ModelRegistry.load_all() as load_models() runs it, including resolving which
+file serves each artifact.
+
+Usage: python benchmarks/artifacts.py [--repeat 50] [--json]
+"""
+
+import os
+import json
+import argparse
+
+from common import time_calls
+
+
+def load_benchmark(model_dir=None, repeat=50):
+    import joblib
+    from compiled import BUNDLE_NAME, compiled_name, load_bundle, load_json, load_model
+    from predict import PICKLE_FILES, MODEL_KEYS, OPTIONAL_KEYS, _possible_model_dirs, new_registry
+
+    if model_dir is None:
+        model_dir = next(d for d in _possible_model_dirs()
+                         if os.path.exists(os.path.join(d, BUNDLE_NAME)))
+    # optional artifacts only count when this model dir has them
+    files = {k: f for k, f in PICKLE_FILES.items()
+             if k not in OPTIONAL_KEYS or os.path.exists(os.path.join(model_dir, f))}
+    pickles = [os.path.join(model_dir, f) for f in files.values()]
+    compiled = [(os.path.join(model_dir, compiled_name(f, k in MODEL_KEYS)), k in MODEL_KEYS)
+                for k, f in files.items()]
+    bundle = os.path.join(model_dir, BUNDLE_NAME)
+
+    def load_pickles():
+        return [joblib.load(p) for p in pickles]
+
+    def load_compiled():
+        return [load_model(p) if is_model else load_json(p) for p, is_model in compiled]
+
+    out = {"model_dir": model_dir}
+    if all(os.path.exists(p) for p in pickles):
+        out["pickles"] = time_calls(load_pickles, repeat)
+    if all(os.path.exists(p) for p, _ in compiled):
+        out["compiled_files"] = time_calls(load_compiled, repeat)
+    if os.path.exists(bundle):
+        out["bundle_read"] = time_calls(lambda: load_bundle(bundle), repeat)
+        out["bundle_mmap"] = time_calls(lambda: load_bundle(bundle, mmap=True), repeat)
+    out["registry_load_all"] = time_calls(lambda: new_registry(log=None).load_all(), repeat)
+    return out
+
+
+def run(quick=False):
+    return load_benchmark(repeat=10 if quick else 50)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load time of the model artifact formats")
+    parser.add_argument("--model-dir", help="directory holding the artifacts (default: the serving directory)")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+    report = load_benchmark(args.model_dir, args.repeat)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        for name, r in report.items():
+            if isinstance(r, dict):
+                print(f"{name}: median {r['median_us']:.0f} us (p95 {r['p95_us']:.0f} us)")
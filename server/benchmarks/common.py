@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Shared helpers for the benchmarks: import path, timers, peak memory and
+synthetic datasets shaped like server/data/weather_dataset.csv.
+"""
+
+import os
+import sys
+import time
+import statistics
+import tracemalloc
+from typing import Any, Callable, Dict, Tuple
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ML_DIR = os.path.join(SERVER_DIR, "ml_models")
+for _d in (SERVER_DIR, ML_DIR):
+    if _d not in sys.path:
+        sys.path.insert(0, _d)
+
+import numpy as np
+
+COLUMNS = ['temperature', 'humidity', 'pressure', 'wind_speed', 'clouds', 'rain', 'cloudiness']
+
+
+def time_calls(fn: Callable[[], Any], repeat: int, warmup: int = 3) -> Dict[str, float]:
+    """Per-call latency summary in microseconds."""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1e6)
+    samples.sort()
+    return {
+        "calls": repeat,
+        "median_us": statistics.median(samples),
+        "p95_us": samples[min(len(samples) - 1, int(0.95 * len(samples)))],
+        "min_us": samples[0],
+    }
+
+
+def time_once(fn: Callable[[], Any]) -> Tuple[Any, float]:
+    """(result, elapsed ms)."""
+    start = time.perf_counter()
+    result = fn()
+    return result, (time.perf_counter() - start) * 1000.0
+
+
+def peak_memory(fn: Callable[[], Any]) -> Tuple[Any, float, float]:
+    """(result, elapsed ms, peak traced allocation in MB). NumPy buffers are traced too."""
+    tracemalloc.start()
+    try:
+        result, ms = time_once(fn)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, ms, peak / (1024 * 1024)
+
+
+def synthetic_rows(n_rows: int, seed: int = 0) -> Dict[str, np.ndarray]:
+    """Columns with the same ranges and roughly the same relationships as the real dataset."""
+    rng = np.random.default_rng(seed)
+    humidity = rng.integers(20, 100, n_rows)
+    pressure = rng.integers(990, 1035, n_rows)
+    wind_speed = np.round(rng.uniform(0, 15, n_rows), 1)
+    clouds = rng.integers(0, 101, n_rows)
+    temperature = np.round(35 - 0.15 * humidity + 0.02 * (pressure - 1013) - 0.3 * wind_speed
+                           - 0.05 * clouds + rng.normal(0, 1.5, n_rows), 1)
+    rain = ((humidity > 75) & (clouds > 60) ^ (rng.random(n_rows) < 0.05)).astype(int)
+    cloudiness = ((clouds > 50) ^ (rng.random(n_rows) < 0.05)).astype(int)
+    return dict(zip(COLUMNS, (temperature, humidity, pressure, wind_speed, clouds, rain, cloudiness)))
+
+
+def write_synthetic_csv(path: str, n_rows: int, seed: int = 0) -> str:
+    import pandas as pd
+    pd.DataFrame(synthetic_rows(n_rows, seed)).to_csv(path, index=False)
+    return path
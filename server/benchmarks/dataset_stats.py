@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Dataset statistics benchmark
+Times get_dataset_stats() and its peak traced memory on synthetic datasets of
+growing size: a full recomputation (use_cache=False), a cold sidecar cache and
+a warm one.
+
+Usage: python benchmarks/dataset_stats.py [--quick] [--json]
+"""
+
+import os
+import json
+import shutil
+import argparse
+import tempfile
+
+from common import peak_memory, time_once, write_synthetic_csv
+
+ROW_COUNTS = (10_000, 100_000, 1_000_000)
+QUICK_ROW_COUNTS = (10_000, 100_000)
+
+
+def stats_benchmark(row_counts=ROW_COUNTS):
+    from predict import get_dataset_stats
+    from stats_cache import cache_path_for
+
+    out = {}
+    tmp_dir = tempfile.mkdtemp(prefix="weather-bench-stats-")
+    try:
+        for n in row_counts:
+            path = write_synthetic_csv(os.path.join(tmp_dir, "weather_%d.csv" % n), n)
+            _, full_ms, full_mb = peak_memory(lambda: get_dataset_stats(use_cache=False, data_path=path))
+            if os.path.exists(cache_path_for(path)):
+                os.unlink(cache_path_for(path))
+            _, cold_ms, cold_mb = peak_memory(lambda: get_dataset_stats(data_path=path))
+            _, warm_ms = time_once(lambda: get_dataset_stats(data_path=path))
+            out[str(n)] = {
+                "full_ms": full_ms, "full_peak_mb": full_mb,
+                "cold_cache_ms": cold_ms, "cold_cache_peak_mb": cold_mb,
+                "warm_cache_ms": warm_ms,
+                "file_mb": os.path.getsize(path) / (1024 * 1024),
+            }
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    return out
+
+
+def run(quick=False):
+    return stats_benchmark(QUICK_ROW_COUNTS if quick else ROW_COUNTS)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="get_dataset_stats() time and memory on synthetic data")
+    parser.add_argument("--quick", action="store_true", help="skip the 1M-row dataset")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+    report = run(args.quick)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        for n, r in report.items():
+            print(f"{n} rows ({r['file_mb']:.1f} MB): full {r['full_ms']:.0f} ms / {r['full_peak_mb']:.0f} MB, "
+                  f"cold cache {r['cold_cache_ms']:.0f} ms / {r['cold_cache_peak_mb']:.0f} MB, "
+                  f"warm cache {r['warm_cache_ms']:.1f} ms")
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Warm prediction benchmarks
+Per-call latency of predict_temperature / classify_weather with the models
+already loaded, and batch throughput of the *_batch functions at growing
+batch sizes.
+
+Usage: python benchmarks/latency.py [--calls 2000] [--quick] [--json]
+"""
+
+import json
+import argparse
+
+from common import time_calls, time_once, synthetic_rows
+
+import numpy as np
+
+BATCH_SIZES = (1, 100, 10_000, 1_000_000)
+QUICK_BATCH_SIZES = (1, 100, 10_000)
+
+
+def warm_latency(calls=2000):
+    from predict import get_registry, predict_temperature, classify_weather
+    models = get_registry()
+    models.load_all()
+    return {
+        "predict_temperature": time_calls(lambda: predict_temperature(70, 1013, 5, 50, models=models), calls),
+        "classify_weather": time_calls(lambda: classify_weather(22, 70, 1013, 5, 50, models=models), calls),
+    }
+
+
+def batch_throughput(sizes=BATCH_SIZES, repeat=3):
+    """Best-of-`repeat` time per batch size, as ms and rows per second."""
+    from predict import get_registry, predict_temperature_batch, classify_weather_batch, TEMP_FEATURES, WEATHER_FEATURES
+    models = get_registry()
+    cols = synthetic_rows(max(sizes), seed=1)
+    temp = np.column_stack([cols[f] for f in TEMP_FEATURES]).astype(float)
+    weather = np.column_stack([cols[f] for f in WEATHER_FEATURES]).astype(float)
+    out = {}
+    for name, fn, X in (("predict_temperature_batch", predict_temperature_batch, temp),
+                        ("classify_weather_batch", classify_weather_batch, weather)):
+        out[name] = {}
+        for n in sizes:
+            ms = min(time_once(lambda: fn(X[:n], models=models))[1] for _ in range(repeat))
+            out[name][str(n)] = {"batch_ms": ms, "rows_per_sec": n / (ms / 1000.0) if ms else None}
+    return out
+
+
+def run(quick=False, calls=2000):
+    return {
+        "warm": warm_latency(calls // 4 if quick else calls),
+        "batch": batch_throughput(QUICK_BATCH_SIZES if quick else BATCH_SIZES),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Warm latency and batch throughput of the prediction functions")
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--quick", action="store_true", help="fewer calls, batches up to 10k rows")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+    report = run(args.quick, args.calls)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        for name, r in report["warm"].items():
+            print(f"{name}: median {r['median_us']:.1f} us, p95 {r['p95_us']:.1f} us")
+        for name, sizes in report["batch"].items():
+            for n, r in sizes.items():
+                print(f"{name} [{n} rows]: {r['batch_ms']:.2f} ms, {r['rows_per_sec']:,.0f} rows/s")
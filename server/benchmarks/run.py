@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Benchmark runner
+Runs the suites (startup, artifacts, latency, stats, training), prints one JSON report
+and compares it against a stored baseline (benchmarks/baseline.json). A
+metric regresses when it is worse than the baseline by more than --tolerance
+(relative) and by more than a small absolute floor, so sub-millisecond noise
+doesn't fail a run. Exits 1 on any regression.
+
+Timings ending in _ms/_us and peak memory (_peak_mb) are compared, lower
+being better; rows_per_sec is reported only (its _ms twin is compared with the
+noise floor applied). Baselines are machine-specific: record one
+with --update-baseline on the machine that runs the comparison.
+
+Usage: python benchmarks/run.py [--suite NAME ...] [--quick] [--output FILE]
+                                [--baseline FILE] [--update-baseline] [--tolerance 0.25]
+"""
+
+import os
+import sys
+import json
+import platform
+import argparse
+from typing import Any, Dict, List
+
+from common import SERVER_DIR
+import startup
+import artifacts
+import latency
+import dataset_stats
+import training
+
+BASELINE_PATH = os.path.join(SERVER_DIR, "benchmarks", "baseline.json")
+SUITES = ("startup", "artifacts", "latency", "stats", "training")
+
+# metric suffix -> (higher is better, absolute noise floor)
+METRIC_KINDS = {
+    "_ms": (False, 1.0),
+    "_us": (False, 20.0),
+    "_peak_mb": (False, 1.0),
+}
+
+
+def run_suite(name: str, quick: bool) -> Dict[str, Any]:
+    if name == "startup":
+        runs = 3 if quick else 5
+        return {script: startup.measure_cold_start(path, args, runs)
+                for script, (path, args) in startup.SCRIPTS.items()}
+    if name == "artifacts":
+        return artifacts.run(quick)
+    if name == "latency":
+        return latency.run(quick)
+    if name == "stats":
+        return dataset_stats.run(quick)
+    if name == "training":
+        return training.run(quick)
+    raise ValueError("Unknown suite: " + name)
+
+
+def flatten(report: Dict[str, Any], prefix: str = "") -> Dict[str, float]:
+    out = {}
+    for k, v in report.items():
+        key = prefix + str(k)
+        if isinstance(v, dict):
+            out.update(flatten(v, key + "."))
+        elif isinstance(v, (int, float)) and not isinstance(v, bool):
+            out[key] = float(v)
+    return out
+
+
+def _kind(metric: str):
+    leaf = metric.rsplit(".", 1)[-1]
+    for suffix, kind in METRIC_KINDS.items():
+        if leaf.endswith(suffix):
+            return kind
+    return None
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[Dict[str, Any]]:
+    """Every metric present in both reports, flagged when it regressed."""
+    cur, base = flatten(current["results"]), flatten(baseline["results"])
+    rows = []
+    for metric in sorted(set(cur) & set(base)):
+        kind = _kind(metric)
+        if kind is None or base[metric] == 0:
+            continue
+        higher_better, floor = kind
+        old, new = base[metric], cur[metric]
+        change = (new - old) / old
+        worse = -change if higher_better else change
+        regressed = worse > tolerance and abs(new - old) > floor
+        rows.append({"metric": metric, "baseline": old, "current": new, "change": change, "regressed": regressed})
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the benchmark suites and compare against a baseline")
+    parser.add_argument("--suite", action="append", choices=SUITES, help="suite to run (repeatable; default: all)")
+    parser.add_argument("--quick", action="store_true", help="smaller inputs (baseline must be recorded the same way)")
+    parser.add_argument("--output", help="also write the JSON report here")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true", help="store this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=float(os.getenv("BENCH_TOLERANCE", "0.25")),
+                        help="allowed relative slowdown before a metric counts as a regression")
+    args = parser.parse_args(argv)
+
+    suites = args.suite or list(SUITES)
+    report = {
+        "quick": args.quick,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "results": {},
+    }
+    for name in suites:
+        print("[run.py] running %s..." % name, file=sys.stderr)
+        report["results"][name] = run_suite(name, args.quick)
+
+    status = 0
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("quick") != args.quick:
+            print("[run.py] baseline was recorded with quick=%s; skipping comparison" % baseline.get("quick"),
+                  file=sys.stderr)
+        else:
+            report["comparison"] = compare(report, baseline, args.tolerance)
+            regressions = [r for r in report["comparison"] if r["regressed"]]
+            report["regressions"] = [r["metric"] for r in regressions]
+            for r in regressions:
+                print("[run.py] REGRESSION %s: %.3f -> %.3f (%+.0f%%)"
+                      % (r["metric"], r["baseline"], r["current"], r["change"] * 100), file=sys.stderr)
+            status = 1 if regressions else 0
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    print(text)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
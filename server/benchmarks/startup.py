@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark for the prediction CLIs
+Times fresh `python predict_*.py ...` processes and breaks the import cost
+down with `-X importtime`. It is also the startup regression check: it exits
+non-zero when a median cold start exceeds the budget (DEFAULT_BUDGET_MS, or
+--budget-ms / STARTUP_BUDGET_MS; 0 turns the time check off), or when a heavy
+module (pandas, sklearn) is imported although compiled models are being served.
+
+Usage: python benchmarks/startup.py [--runs 5] [--budget-ms 500] [--json]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ML_DIR = os.path.join(SERVER_DIR, "ml_models")
+
+SCRIPTS = {
+    "predict_linear": (os.path.join(ML_DIR, "predict_linear.py"), ["70", "1013", "5", "50"]),
+    "predict_logistic": (os.path.join(ML_DIR, "predict_logistic.py"), ["22", "70", "1013", "5", "50"]),
+}
+
+# must not be imported on the compiled (NumPy-only) serving path
+HEAVY_MODULES = ("pandas", "sklearn")
+# a NumPy-only cold start takes ~100 ms; importing pandas/sklearn again costs ~1 s
+DEFAULT_BUDGET_MS = 500.0
+
+
+def _run(cmd):
+    start = time.perf_counter()
+    proc = subprocess.run(cmd, capture_output=True, text=True)
+    elapsed_ms = (time.perf_counter() - start) * 1000.0
+    if proc.returncode != 0:
+        raise RuntimeError("%s failed: %s %s" % (cmd[1], proc.stdout.strip(), proc.stderr.strip()[-500:]))
+    return elapsed_ms, proc.stderr
+
+
+def measure_cold_start(script, args, runs=5):
+    """Wall-clock ms of `runs` fresh interpreter launches."""
+    times = [_run([sys.executable, script] + args)[0] for _ in range(runs)]
+    return {
+        "runs": runs,
+        "min_ms": min(times),
+        "median_ms": statistics.median(times),
+        "max_ms": max(times),
+    }
+
+
+def import_time_report(script, args, top=15):
+    """Parse `-X importtime` output: total import time and the slowest top-level packages."""
+    _, stderr = _run([sys.executable, "-X", "importtime", script] + args)
+    total_us = 0
+    packages = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        try:
+            parts = line[len("import time:"):].split("|")
+            self_us = int(parts[0].strip())
+            cumulative_us = int(parts[1].strip())
+            raw_name = parts[2]
+        except (ValueError, IndexError):
+            continue
+        total_us += self_us
+        # top-level imports have no leading indentation in the name column
+        if not raw_name[1:].startswith(" "):
+            name = raw_name.strip()
+            packages[name] = packages.get(name, 0) + cumulative_us
+    slowest = sorted(packages.items(), key=lambda kv: kv[1], reverse=True)[:top]
+    imported = set(packages)
+    return {
+        "total_import_ms": total_us / 1000.0,
+        "slowest": [{"module": n, "cumulative_ms": us / 1000.0} for n, us in slowest],
+        "heavy_modules": [m for m in HEAVY_MODULES if any(n == m or n.startswith(m + ".") for n in imported)],
+    }
+
+
+def _compiled_models_served():
+    sys.path.insert(0, SERVER_DIR)
+    try:
+        from predict import get_registry
+        registry = get_registry()
+        return not any(registry.source(k).endswith(".pkl") for k in ("linear", "rain", "cloud"))
+    except Exception:
+        return False
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cold-start benchmark for the prediction CLIs")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--budget-ms", type=float,
+                        default=float(os.getenv("STARTUP_BUDGET_MS") or DEFAULT_BUDGET_MS),
+                        help="fail when a median cold start exceeds this; 0 disables "
+                             "(env STARTUP_BUDGET_MS, default %.0f)" % DEFAULT_BUDGET_MS)
+    parser.add_argument("--json", action="store_true", help="print machine-readable JSON only")
+    args = parser.parse_args(argv)
+
+    compiled = _compiled_models_served()
+    report = {"compiled_models": compiled, "scripts": {}}
+    failures = []
+    for name, (script, script_args) in SCRIPTS.items():
+        entry = measure_cold_start(script, script_args, args.runs)
+        entry["imports"] = import_time_report(script, script_args, args.top)
+        report["scripts"][name] = entry
+        if args.budget_ms and entry["median_ms"] > args.budget_ms:
+            failures.append("%s: median cold start %.0f ms > budget %.0f ms" % (name, entry["median_ms"], args.budget_ms))
+        if compiled and entry["imports"]["heavy_modules"]:
+            failures.append("%s: imports %s on the compiled path" % (name, ", ".join(entry["imports"]["heavy_modules"])))
+    report["failures"] = failures
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        for name, entry in report["scripts"].items():
+            print(f"{name}: median {entry['median_ms']:.1f} ms (min {entry['min_ms']:.1f}, max {entry['max_ms']:.1f}), "
+                  f"imports {entry['imports']['total_import_ms']:.1f} ms")
+            for mod in entry["imports"]["slowest"]:
+                print(f"    {mod['cumulative_ms']:8.1f} ms  {mod['module']}")
+        for f in failures:
+            print("FAIL: " + f)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
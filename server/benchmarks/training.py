@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Training benchmark
+Times the fit step of both training scripts (fit_linear_regression,
+fit_logistic_classifier on the same split they use) and the end-to-end
+train_all.py / train_streaming.py runs, on a synthetic dataset. Artifacts go
+to a temporary directory; the real models are never touched.
+
+Usage: python benchmarks/training.py [--rows 100000] [--quick] [--json]
+"""
+
+import os
+import json
+import shutil
+import argparse
+import tempfile
+
+from common import time_once, write_synthetic_csv
+
+DEFAULT_ROWS = 100_000
+QUICK_ROWS = 10_000
+
+
+def training_benchmark(n_rows=DEFAULT_ROWS):
+    import pandas as pd
+    from sklearn.model_selection import train_test_split
+    from train_linear_regression import FEATURES as LINEAR_FEATURES, fit_linear_regression
+    from train_logistic_regression import FEATURES as LOGISTIC_FEATURES, fit_logistic_classifier
+    from train_all import train_all
+    from train_streaming import train_streaming
+
+    tmp_dir = tempfile.mkdtemp(prefix="weather-bench-train-")
+    try:
+        path = write_synthetic_csv(os.path.join(tmp_dir, "weather.csv"), n_rows)
+        df = pd.read_csv(path)
+
+        X_tr, X_te, y_tr, y_te = train_test_split(df[LINEAR_FEATURES], df['temperature'], test_size=0.2, random_state=42)
+        _, linear_ms = time_once(lambda: fit_linear_regression(X_tr, y_tr, X_te, y_te))
+        X_tr, X_te, y_tr, y_te = train_test_split(df[LOGISTIC_FEATURES], df['rain'], test_size=0.2, random_state=42)
+        _, logistic_ms = time_once(lambda: fit_logistic_classifier(X_tr, y_tr, X_te, y_te))
+
+        model_dir = os.path.join(tmp_dir, "models")
+        os.makedirs(model_dir)
+        _, all_ms = time_once(lambda: train_all(path, model_dir, verbose=False))
+        _, streaming_ms = time_once(lambda: train_streaming(path, model_dir=model_dir, verbose=False))
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    return {
+        "rows": n_rows,
+        "fit_linear_regression_ms": linear_ms,
+        "fit_logistic_classifier_ms": logistic_ms,
+        "train_all_ms": all_ms,
+        "train_streaming_ms": streaming_ms,
+    }
+
+
+def run(quick=False, rows=None):
+    return training_benchmark(rows or (QUICK_ROWS if quick else DEFAULT_ROWS))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Training time of the model fitting paths")
+    parser.add_argument("--rows", type=int)
+    parser.add_argument("--quick", action="store_true", help=f"{QUICK_ROWS} rows instead of {DEFAULT_ROWS}")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+    report = run(args.quick, args.rows)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        for k, v in report.items():
+            print(f"{k}: {v:.1f}" if isinstance(v, float) else f"{k}: {v}")
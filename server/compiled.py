@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+"""
+Compiled (NumPy-only) versions of the trained models.
+
+The sklearn models are a LinearRegression and two binary LogisticRegressions,
+so scoring is a dot product (plus a sigmoid). export_dir() writes each model's
+coef_, intercept_, feature order and classes to a small .npz file; the
+predictors here read it back and score with NumPy alone — no sklearn, no
+pandas, no input validation overhead.
+
+Metric dicts are exported to JSON next to the .npz files. A manifest records
+the sha256 (and size/mtime) of the pickle each artifact was exported from, so
+the model registry only uses a compiled artifact while it still matches its
+pickle.
+
+export_dir() also writes everything — coefficients, feature schemas, classes,
+metrics and confusion counts — into one versioned bundle file
+(weather_models.bundle), which load_bundle() reads with a single read() (or
+memory-maps). Layout:
+
+    magic (8 bytes) | format version (u32) | header length (u32)
+    | sha256 of everything after this 48-byte prefix (32 bytes)
+    | header JSON | zero padding to 64 bytes | float64 coefficient data
+
+The header describes every member; arrays are 64-byte aligned slices of the
+data section, so models come back as zero-copy views of the buffer.
+"""
+
+import os
+import json
+import struct
+import hashlib
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+MANIFEST_NAME = "compiled_manifest.json"
+BUNDLE_NAME = "weather_models.bundle"
+BUNDLE_MAGIC = b"WXBUNDLE"
+BUNDLE_FORMAT_VERSION = 1
+_PREFIX = struct.Struct("<8sII32s")
+_ALIGN = 64
+
+
+class CompiledModel:
+    """Base class: a linear score X @ coef.T + intercept over named features."""
+
+    kind = ""
+
+    def __init__(self, coef, intercept, features):
+        self.coef_ = np.atleast_2d(np.asarray(coef, dtype=np.float64))
+        self.intercept_ = np.atleast_1d(np.asarray(intercept, dtype=np.float64))
+        self.feature_names_in_ = np.asarray(features, dtype=str)
+        self.n_features_in_ = self.coef_.shape[1]
+
+    def _matrix(self, X) -> np.ndarray:
+        # DataFrames are reordered by column name, everything else is taken as-is
+        if hasattr(X, "columns"):
+            X = X[list(self.feature_names_in_)].to_numpy(dtype=np.float64)
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.shape[1] != self.n_features_in_:
+            raise ValueError("Expected %d features %s, got %d"
+                             % (self.n_features_in_, list(self.feature_names_in_), X.shape[1]))
+        return X
+
+    def decision_function(self, X) -> np.ndarray:
+        scores = self._matrix(X) @ self.coef_.T + self.intercept_
+        return scores[:, 0] if scores.shape[1] == 1 else scores
+
+
+class CompiledLinear(CompiledModel):
+    kind = "linear"
+
+    def predict(self, X) -> np.ndarray:
+        return self.decision_function(X)
+
+
+class CompiledLogistic(CompiledModel):
+    kind = "logistic"
+
+    def __init__(self, coef, intercept, features, classes):
+        super().__init__(coef, intercept, features)
+        self.classes_ = np.asarray(classes)
+
+    def predict_proba(self, X) -> np.ndarray:
+        scores = self.decision_function(X)
+        if scores.ndim == 1:
+            with np.errstate(over="ignore"):
+                pos = 1.0 / (1.0 + np.exp(-scores))
+            return np.column_stack((1.0 - pos, pos))
+        scores = scores - scores.max(axis=1, keepdims=True)
+        exp = np.exp(scores)
+        return exp / exp.sum(axis=1, keepdims=True)
+
+    def predict(self, X) -> np.ndarray:
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+
+class FusedBinaryLogistic:
+    """
+    Several binary logistic models over the same features, scored together.
+
+    Coefficients are stacked into one (n_models, n_features) matrix, so all
+    probabilities come from a single matrix multiply; labels are derived from
+    the scores instead of a second predict() call.
+    """
+
+    def __init__(self, models, features=None):
+        models = list(models)
+        if not models:
+            raise ValueError("Nothing to fuse")
+        for m in models:
+            if not isinstance(m, CompiledLogistic) or m.coef_.shape[0] != 1 or len(m.classes_) != 2:
+                raise ValueError("Only binary logistic models can be fused")
+        features = list(features) if features is not None else list(models[0].feature_names_in_)
+        rows = []
+        for m in models:
+            names = list(m.feature_names_in_)
+            if sorted(names) != sorted(features):
+                raise ValueError("Fused models must share the same features")
+            rows.append(m.coef_[0, [names.index(f) for f in features]])
+        self.feature_names_in_ = np.asarray(features, dtype=str)
+        self.coef_ = np.vstack(rows)
+        self.intercept_ = np.concatenate([m.intercept_ for m in models])
+        self.classes_ = np.vstack([m.classes_ for m in models])
+
+    def decision_function(self, X) -> np.ndarray:
+        """(n_samples, n_models) raw scores."""
+        if hasattr(X, "columns"):
+            X = X[list(self.feature_names_in_)].to_numpy(dtype=np.float64)
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        return X @ self.coef_.T + self.intercept_
+
+    def predict_with_proba(self, X):
+        """Labels and the probability of each predicted label, both (n_samples, n_models)."""
+        scores = self.decision_function(X)
+        with np.errstate(over="ignore"):
+            pos = 1.0 / (1.0 + np.exp(-scores))
+        positive = scores > 0
+        # same decision rule as sklearn: classes_[1] when the score is positive
+        labels = np.where(positive, self.classes_[:, 1], self.classes_[:, 0])
+        return labels, np.where(positive, pos, 1.0 - pos)
+
+
+def _feature_names(model, features=None):
+    # the names the model was fitted with win; `features` covers models fitted on arrays
+    names = getattr(model, "feature_names_in_", None)
+    if names is not None:
+        return [str(n) for n in names]
+    if features is None:
+        raise ValueError("Model has no feature_names_in_; pass features explicitly")
+    return list(features)
+
+
+def compile_model(model, features=None) -> CompiledModel:
+    """Build a compiled predictor from a fitted sklearn linear/logistic model."""
+    feats = _feature_names(model, features)
+    if hasattr(model, "classes_"):
+        return CompiledLogistic(model.coef_, model.intercept_, feats, model.classes_)
+    return CompiledLinear(model.coef_, model.intercept_, feats)
+
+
+def save_model(compiled: CompiledModel, path: str):
+    arrays = {
+        "kind": np.asarray(compiled.kind),
+        "coef": compiled.coef_,
+        "intercept": compiled.intercept_,
+        "features": compiled.feature_names_in_,
+    }
+    if isinstance(compiled, CompiledLogistic):
+        arrays["classes"] = compiled.classes_
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        np.savez(f, **arrays)
+    os.replace(tmp, path)
+
+
+def load_model(path: str) -> CompiledModel:
+    with np.load(path, allow_pickle=False) as data:
+        kind = str(data["kind"])
+        if kind == "linear":
+            return CompiledLinear(data["coef"], data["intercept"], data["features"])
+        if kind == "logistic":
+            return CompiledLogistic(data["coef"], data["intercept"], data["features"], data["classes"])
+    raise ValueError("Unknown compiled model kind %r in %s" % (kind, path))
+
+
+def _to_builtin(value):
+    if isinstance(value, dict):
+        return {k: _to_builtin(v) for k, v in value.items()}
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def save_json(value: Dict[str, Any], path: str):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(_to_builtin(value), f, indent=2)
+    os.replace(tmp, path)
+
+
+def load_json(path: str) -> Dict[str, Any]:
+    with open(path) as f:
+        return json.load(f)
+
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def compiled_name(pickle_name: str, is_model: bool) -> str:
+    stem = os.path.splitext(pickle_name)[0]
+    return stem + (".npz" if is_model else ".json")
+
+
+# -- single-file bundle ----------------------------------------------------------
+
+def bundle_member(key: str) -> str:
+    """Registry candidate name for one member of the bundle."""
+    return BUNDLE_NAME + "#" + key
+
+
+class ModelBundle:
+    """Every member of a bundle file: {key: CompiledModel or metrics dict}."""
+
+    def __init__(self, members: Dict[str, Any], header: Dict[str, Any], content_sha256: str):
+        self.members = members
+        self.header = header
+        # the body digest from the prefix (checked on load), so the registry needn't hash the file
+        self.content_sha256 = content_sha256
+
+    def __getitem__(self, key: str) -> Any:
+        return self.members[key]
+
+    def keys(self):
+        return self.members.keys()
+
+
+def save_bundle(path: str, models: Dict[str, CompiledModel], metrics: Dict[str, Dict[str, Any]],
+                sources: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """Write models and metric dicts into one bundle file; returns its header."""
+    chunks, offset = [], 0
+    members: Dict[str, Any] = {}
+
+    def add(array):
+        nonlocal offset
+        data = np.ascontiguousarray(array, dtype="<f8").tobytes()
+        ref = {"offset": offset, "shape": list(np.shape(array))}
+        pad = (-len(data)) % _ALIGN
+        chunks.append(data + b"\0" * pad)
+        offset += len(data) + pad
+        return ref
+
+    for key, m in models.items():
+        entry = {"type": "model", "kind": m.kind, "features": [str(f) for f in m.feature_names_in_],
+                 "coef": add(m.coef_), "intercept": add(m.intercept_)}
+        if isinstance(m, CompiledLogistic):
+            entry["classes"] = _to_builtin(m.classes_.tolist())
+        members[key] = entry
+    for key, value in metrics.items():
+        members[key] = {"type": "metrics", "value": _to_builtin(dict(value))}
+
+    header = json.dumps({
+        "format_version": BUNDLE_FORMAT_VERSION,
+        "members": members,
+        "sources": sources or {},
+    }, sort_keys=True).encode("utf-8")
+    header += b" " * ((-(_PREFIX.size + len(header))) % _ALIGN)
+    body = header + b"".join(chunks)
+    prefix = _PREFIX.pack(BUNDLE_MAGIC, BUNDLE_FORMAT_VERSION, len(header), hashlib.sha256(body).digest())
+
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(prefix + body)
+    os.replace(tmp, path)
+    return json.loads(header)
+
+
+def _bundle_from_buffer(buf, verify: bool) -> ModelBundle:
+    if len(buf) < _PREFIX.size:
+        raise ValueError("Truncated model bundle")
+    magic, version, header_len, digest = _PREFIX.unpack_from(buf, 0)
+    if magic != BUNDLE_MAGIC:
+        raise ValueError("Not a model bundle")
+    if version != BUNDLE_FORMAT_VERSION:
+        raise ValueError("Unsupported model bundle version %d" % version)
+    if verify and hashlib.sha256(memoryview(buf)[_PREFIX.size:]).digest() != digest:
+        raise ValueError("Model bundle checksum mismatch")
+    header = json.loads(bytes(buf[_PREFIX.size:_PREFIX.size + header_len]))
+    data_start = _PREFIX.size + header_len
+
+    def array(ref):
+        count = int(np.prod(ref["shape"])) if ref["shape"] else 1
+        flat = np.frombuffer(buf, dtype="<f8", count=count, offset=data_start + ref["offset"])
+        return flat.reshape(ref["shape"])
+
+    members: Dict[str, Any] = {}
+    for key, m in header["members"].items():
+        if m["type"] == "metrics":
+            members[key] = m["value"]
+        elif m["kind"] == "linear":
+            members[key] = CompiledLinear(array(m["coef"]), array(m["intercept"]), m["features"])
+        elif m["kind"] == "logistic":
+            members[key] = CompiledLogistic(array(m["coef"]), array(m["intercept"]), m["features"], m["classes"])
+        else:
+            raise ValueError("Unknown bundle member kind %r" % m["kind"])
+    # the prefix is a function of the body, so its digest identifies the whole file
+    return ModelBundle(members, header, digest.hex())
+
+
+def load_bundle(path: str, mmap: bool = False, verify: bool = True) -> ModelBundle:
+    """
+    Read a bundle with one read() (mmap=False) or map it read-only (mmap=True);
+    model coefficients are views of that buffer either way. Mapped, the pages
+    are shared by every process that maps the file. save_bundle() replaces
+    the file rather than rewriting it, so a mapping keeps seeing the old
+    bundle intact until the registry notices the new one.
+
+    verify=True checks the body against the prefix digest: one sha256 pass
+    over the file, which on the mapped path pages it into the shared cache.
+    """
+    if mmap:
+        return _bundle_from_buffer(np.memmap(path, dtype=np.uint8, mode="r"), verify)
+    with open(path, "rb") as f:
+        return _bundle_from_buffer(f.read(), verify)
+
+
+def export_dir(model_dir: str, pickle_files: Dict[str, str], model_keys, features: Optional[Dict[str, list]] = None):
+    """
+    Export every pickle in `pickle_files` (key -> filename) found in model_dir.
+    Keys listed in `model_keys` are models (-> .npz), the rest metric dicts (-> .json);
+    all of them also go into one bundle file. Returns the manifest that was written.
+    """
+    import joblib
+
+    manifest = {}
+    models, metrics, sources = {}, {}, {}
+    for key, fname in pickle_files.items():
+        src = os.path.join(model_dir, fname)
+        if not os.path.exists(src):
+            continue
+        obj = joblib.load(src)
+        is_model = key in model_keys
+        out_name = compiled_name(fname, is_model)
+        out_path = os.path.join(model_dir, out_name)
+        if is_model:
+            models[key] = compile_model(obj, (features or {}).get(key))
+            save_model(models[key], out_path)
+        else:
+            metrics[key] = dict(obj)
+            save_json(metrics[key], out_path)
+        st = os.stat(src)
+        # the registry trusts an unchanged size/mtime instead of rehashing the source
+        sources[key] = {"source": fname, "source_sha256": file_sha256(src),
+                        "source_mtime_ns": st.st_mtime_ns, "source_size": st.st_size}
+        manifest[out_name] = sources[key]
+    if sources:
+        bundle_path = os.path.join(model_dir, BUNDLE_NAME)
+        save_bundle(bundle_path, models, metrics, sources)
+        manifest[BUNDLE_NAME] = {"format_version": BUNDLE_FORMAT_VERSION, "sha256": file_sha256(bundle_path)}
+        for key, src in sources.items():
+            manifest[bundle_member(key)] = src
+    save_json(manifest, os.path.join(model_dir, MANIFEST_NAME))
+    return manifest
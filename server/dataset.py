@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Locating and reading the weather dataset.
+
+Columns are parsed with explicit narrow dtypes (float32 features, int8 labels)
+and large files can be read in fixed-size chunks so memory stays flat.
+
+When a columnar copy made by ml_models/convert_dataset.py exists next to the
+CSV (weather_dataset.columns/: one .npy per column plus schema.json) and still
+matches the CSV's size and mtime, readers use it instead: columns are
+memory-mapped read-only and wrapped without copying, so nothing is parsed.
+"""
+
+import os
+import io
+import json
+from typing import Any, Dict, Iterator, List, Optional
+
+DATASET_NAME = "weather_dataset.csv"
+
+TEMP_FEATURES = ['humidity', 'pressure', 'wind_speed', 'clouds']
+WEATHER_FEATURES = ['temperature', 'humidity', 'pressure', 'wind_speed', 'clouds']
+LABELS = ['rain', 'cloudiness']
+
+DTYPES = {
+    'temperature': 'float32',
+    'humidity': 'float32',
+    'pressure': 'float32',
+    'wind_speed': 'float32',
+    'clouds': 'float32',
+    'rain': 'int8',
+    'cloudiness': 'int8',
+}
+
+DEFAULT_CHUNKSIZE = 200_000
+
+
+def dataset_candidates() -> List[str]:
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    return [
+        os.path.join(script_dir, "..", "data", DATASET_NAME),
+        os.path.join(script_dir, "data", DATASET_NAME),
+        os.path.join(script_dir, "..", "..", "data", DATASET_NAME)
+    ]
+
+
+def find_dataset_path() -> str:
+    possible = dataset_candidates()
+    for p in possible:
+        if os.path.exists(p):
+            return p
+    raise FileNotFoundError("Could not find weather_dataset.csv in expected locations: " + ", ".join(possible))
+
+
+def _dtypes_for(columns: Optional[List[str]], narrow: bool = True):
+    if not narrow:
+        return None
+    if columns is None:
+        return DTYPES
+    return {c: DTYPES[c] for c in columns if c in DTYPES}
+
+
+# -- columnar copy -------------------------------------------------------------
+
+COLUMNAR_SUFFIX = ".columns"
+SCHEMA_NAME = "schema.json"
+
+
+def columnar_dir_for(csv_path: str) -> str:
+    return os.path.splitext(csv_path)[0] + COLUMNAR_SUFFIX
+
+
+def read_schema(columnar_dir: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(os.path.join(columnar_dir, SCHEMA_NAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def columnar_source(csv_path: str) -> Optional[str]:
+    """The columnar directory for csv_path if it exists and matches the CSV, else None."""
+    cdir = columnar_dir_for(csv_path)
+    schema = read_schema(cdir)
+    if schema is None:
+        return None
+    try:
+        st = os.stat(csv_path)
+    except FileNotFoundError:
+        return cdir
+    src = schema.get("source", {})
+    if src.get("size") == st.st_size and src.get("mtime_ns") == st.st_mtime_ns:
+        return cdir
+    return None
+
+
+def load_columns(columnar_dir: str, columns: Optional[List[str]] = None) -> Dict[str, Any]:
+    """{name: read-only memory-mapped array} for the requested columns."""
+    import numpy as np
+    schema = read_schema(columnar_dir)
+    if schema is None:
+        raise FileNotFoundError("No columnar dataset in " + columnar_dir)
+    names = [c["name"] for c in schema["columns"]]
+    wanted = names if columns is None else list(columns)
+    missing = [c for c in wanted if c not in names]
+    if missing:
+        raise ValueError("Columns not in columnar dataset: " + ", ".join(missing))
+    return {c: np.load(os.path.join(columnar_dir, c + ".npy"), mmap_mode="r") for c in wanted}
+
+
+def write_columnar(csv_path: str, out_dir: Optional[str] = None, narrow: bool = False,
+                   chunksize: int = DEFAULT_CHUNKSIZE) -> Dict[str, Any]:
+    """
+    Convert csv_path to one .npy per column plus schema.json in out_dir
+    (default: columnar_dir_for(csv_path)). Columns keep the dtypes pandas
+    infers from the whole file, so reads match the CSV exactly; narrow=True
+    stores DTYPES instead. The new directory replaces the old one atomically.
+    Returns the schema.
+    """
+    import shutil
+    import numpy as np
+    import pandas as pd
+
+    out_dir = out_dir or columnar_dir_for(csv_path)
+    st = os.stat(csv_path)
+
+    # pass 1: row count and the dtype every chunk agrees on
+    n_rows, dtypes = 0, {}
+    with pd.read_csv(csv_path, chunksize=chunksize, dtype=DTYPES if narrow else None) as reader:
+        for chunk in reader:
+            n_rows += len(chunk)
+            for c in chunk.columns:
+                dt = chunk[c].dtype
+                if not isinstance(dt, np.dtype) or dt.kind not in "biuf":
+                    raise ValueError("Column %s is not numeric (%s)" % (c, dt))
+                dtypes[c] = np.result_type(dtypes[c], dt) if c in dtypes else dt
+
+    tmp_dir = "%s.tmp-%d" % (out_dir, os.getpid())
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    try:
+        # pass 2: fill preallocated .npy files in place
+        outs = {c: np.lib.format.open_memmap(os.path.join(tmp_dir, c + ".npy"), mode="w+",
+                                             dtype=dt, shape=(n_rows,))
+                for c, dt in dtypes.items()}
+        pos = 0
+        with pd.read_csv(csv_path, chunksize=chunksize, dtype=DTYPES if narrow else None) as reader:
+            for chunk in reader:
+                for c, out in outs.items():
+                    out[pos:pos + len(chunk)] = chunk[c].to_numpy()
+                pos += len(chunk)
+        for out in outs.values():
+            out.flush()
+        del outs
+
+        schema = {
+            "version": 1,
+            "rows": n_rows,
+            "columns": [{"name": c, "dtype": dt.str} for c, dt in dtypes.items()],
+            "source": {"name": os.path.basename(csv_path), "size": st.st_size, "mtime_ns": st.st_mtime_ns},
+        }
+        with open(os.path.join(tmp_dir, SCHEMA_NAME), "w") as f:
+            json.dump(schema, f, indent=2)
+
+        old_dir = None
+        if os.path.exists(out_dir):
+            old_dir = "%s.old-%d" % (out_dir, os.getpid())
+            os.rename(out_dir, old_dir)
+        os.rename(tmp_dir, out_dir)
+        if old_dir:
+            shutil.rmtree(old_dir, ignore_errors=True)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    return schema
+
+
+def _frame(arrays: Dict[str, Any], start: int = 0, stop: Optional[int] = None):
+    import pandas as pd
+    return pd.DataFrame({c: a[start:stop] for c, a in arrays.items()}, copy=False)
+
+
+# -- readers -------------------------------------------------------------------
+
+class _Prefix(io.RawIOBase):
+    """Bytes [start, end) of a file, read through like a whole file."""
+
+    def __init__(self, path: str, start: int, end: int):
+        self._f = open(path, "rb")
+        self._f.seek(start)
+        self._remaining = max(0, end - start)
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        n = min(len(b), self._remaining)
+        if n <= 0:
+            return 0
+        got = self._f.readinto(memoryview(b)[:n])
+        self._remaining -= got
+        return got
+
+    def close(self):
+        self._f.close()
+        super().close()
+
+
+def open_range(path: str, start: int, end: int):
+    """Binary file object over bytes [start, end) of path; bytes appended past `end` are never read."""
+    return io.BufferedReader(_Prefix(path, start, end))
+
+
+def read_dataset(path: Optional[str] = None, columns: Optional[List[str]] = None, narrow: bool = True):
+    """
+    Whole dataset as a DataFrame. From the CSV the columns are parsed with
+    narrow dtypes (unless narrow=False); from a fresh columnar copy they keep
+    their stored dtype and are memory-mapped, not copied.
+    """
+    import pandas as pd
+    path = path or find_dataset_path()
+    cdir = columnar_source(path)
+    if cdir:
+        return _frame(load_columns(cdir, columns))
+    return pd.read_csv(path, usecols=columns, dtype=_dtypes_for(columns, narrow))
+
+
+def iter_chunks(path: Optional[str] = None,
+                chunksize: int = DEFAULT_CHUNKSIZE,
+                columns: Optional[List[str]] = None,
+                narrow: bool = True,
+                size: Optional[int] = None) -> Iterator:
+    """
+    Yield DataFrames of at most `chunksize` rows (zero-copy slices when columnar).
+    With `size`, only the CSV's first `size` bytes are read, and a columnar copy
+    only serves when it was made from exactly those.
+    """
+    import pandas as pd
+    path = path or find_dataset_path()
+    cdir = columnar_source(path)
+    if cdir and size is not None and read_schema(cdir).get("source", {}).get("size") != size:
+        cdir = None
+    if cdir:
+        arrays = load_columns(cdir, columns)
+        n_rows = len(next(iter(arrays.values()))) if arrays else 0
+        for start in range(0, n_rows, chunksize):
+            yield _frame(arrays, start, start + chunksize)
+        return
+    if size is not None:
+        with open_range(path, 0, size) as f:
+            with pd.read_csv(f, usecols=columns, dtype=_dtypes_for(columns, narrow), chunksize=chunksize) as reader:
+                yield from reader
+        return
+    reader = pd.read_csv(path, usecols=columns, dtype=_dtypes_for(columns, narrow), chunksize=chunksize)
+    with reader:
+        for chunk in reader:
+            yield chunk
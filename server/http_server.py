@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+Asyncio HTTP inference server.
+
+Serves the prediction functions of predict.py over HTTP/1.1 with keep-alive,
+so Node (or a load balancer in front of several instances) can proxy to it
+instead of spawning processes. Models are loaded once through the model
+registry; scoring and stats run on a thread pool so the event loop only
+parses and writes.
+
+With --batch-wait-ms, concurrent single-row predictions are micro-batched
+(batching.py): requests arriving within the window are scored as one matrix.
+Single rows are looked up in the prediction cache first when it is enabled
+(ML_PREDICTION_CACHE_SIZE, see prediction_cache.py).
+
+Endpoints (JSON in, JSON out):
+    GET  /health                 {"status": "ok", "models": <version>, "pid": ..., "batching": {...},
+                                  "prediction_cache": {...}}
+    POST /predict/temperature    {"humidity": .., "pressure": .., "wind_speed": .., "clouds": ..}
+                                 or {"rows": [...]} for a batch
+    POST /predict/weather        same, plus "temperature"
+                                 (either may add "station" for that station's models, station_models.py)
+    GET  /stats                  dataset statistics
+    GET  /metrics                cumulative counters and stage timings (instrumentation.py)
+    POST /ingest                 {"rows": [...]} appended to the observation store (observation_store.py)
+    POST /sweep                  {"kind": .., "axes": {..}, "fixed": {..}} what-if grid (sweep.py)
+
+Add "timings": true to a POST body (or set ML_TIMINGS) for a per-stage
+breakdown in the response under "timings"; micro-batched rows have none.
+
+Usage: http_server.py [--host 127.0.0.1] [--port 8001] [--threads N]
+                      [--batch-wait-ms MS] [--batch-max-size N]
+"""
+
+import os
+import json
+import asyncio
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import instrumentation
+from predict import _debug_print, get_registry
+from worker import OPS, TEMP_PARAMS, WEATHER_PARAMS, _float_params
+from batching import DEFAULT_MAX_BATCH_SIZE, temperature_batcher, weather_batcher
+from prediction_cache import get_prediction_cache, is_missing, model_version
+
+MAX_BODY = 16 * 1024 * 1024
+MAX_HEADER_LINES = 100
+KEEPALIVE_TIMEOUT = 30.0
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+class HttpError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def _health(params, models):
+    return {"status": "ok", "models": models.version(), "pid": os.getpid()}
+
+
+# path -> (prediction name, parameters) of the single-row request that may be micro-batched
+BATCHABLE = {
+    "/predict/temperature": ("predict_temperature", TEMP_PARAMS),
+    "/predict/weather": ("classify_weather", WEATHER_PARAMS),
+}
+
+
+def _predict(single_op: str, batch_op: str):
+    def handler(params, models):
+        op = batch_op if "rows" in params else single_op
+        return OPS[op](params, models)
+    return handler
+
+
+# path -> (method, handler(params, models))
+ROUTES = {
+    "/health": ("GET", _health),
+    "/predict/temperature": ("POST", _predict("predict_temperature", "predict_temperature_batch")),
+    "/predict/weather": ("POST", _predict("classify_weather", "classify_weather_batch")),
+    "/stats": ("GET", lambda params, models: OPS["stats"](params, models)),
+    "/metrics": ("GET", lambda params, models: OPS["metrics"](params, models)),
+    "/ingest": ("POST", lambda params, models: OPS["ingest"](params, models)),
+    "/sweep": ("POST", lambda params, models: OPS["sweep"](params, models)),
+}
+
+
+def _traced(handler, params, models):
+    force = bool(params.get("timings"))
+    with instrumentation.trace(force=force) as timings:
+        result = handler(params, models)
+    if timings is not None and isinstance(result, dict) and instrumentation.timings_in_response(force):
+        result = dict(result, timings=timings)
+    return result
+
+
+async def _read_request(reader: asyncio.StreamReader) -> Optional[Tuple[str, str, Dict[str, str], bytes]]:
+    """(method, path, headers, body), or None when the client closed the connection."""
+    line = await reader.readline()
+    if not line:
+        return None
+    try:
+        method, target, version = line.decode("latin-1").split()
+    except ValueError:
+        raise HttpError(400, "Malformed request line")
+    headers = {}
+    for _ in range(MAX_HEADER_LINES):
+        raw = await reader.readline()
+        if raw in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = raw.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    else:
+        raise HttpError(400, "Too many headers")
+    headers[":version"] = version
+    try:
+        length = int(headers.get("content-length") or 0)
+    except ValueError:
+        raise HttpError(400, "Invalid Content-Length")
+    if length < 0:
+        raise HttpError(400, "Invalid Content-Length")
+    if length > MAX_BODY:
+        raise HttpError(413, "Request body too large")
+    body = await reader.readexactly(length) if length else b""
+    return method.upper(), urlsplit(target).path, headers, body
+
+
+def _keep_alive(headers: Dict[str, str]) -> bool:
+    conn = headers.get("connection", "").lower()
+    if headers.get(":version") == "HTTP/1.0":
+        return conn == "keep-alive"
+    return conn != "close"
+
+
+def _response(status: int, payload: Any, keep_alive: bool) -> bytes:
+    body = json.dumps(payload).encode("utf-8")
+    head = ("HTTP/1.1 %d %s\r\n"
+            "Content-Type: application/json\r\n"
+            "Content-Length: %d\r\n"
+            "Connection: %s\r\n\r\n") % (status, REASONS.get(status, ""), len(body),
+                                         "keep-alive" if keep_alive else "close")
+    return head.encode("latin-1") + body
+
+
+class InferenceServer:
+    def __init__(self, models=None, threads: Optional[int] = None,
+                 batch_wait_ms: Optional[float] = None, batch_max_size: int = DEFAULT_MAX_BATCH_SIZE):
+        self.models = models or get_registry()
+        self.executor = ThreadPoolExecutor(max_workers=threads or min(8, (os.cpu_count() or 1) + 2),
+                                           thread_name_prefix="score")
+        self.batchers = {}
+        if batch_wait_ms is not None:
+            opts = {"max_batch_size": batch_max_size, "max_wait_ms": batch_wait_ms}
+            self.batchers = {
+                "/predict/temperature": temperature_batcher(self.models, **opts),
+                "/predict/weather": weather_batcher(self.models, **opts),
+            }
+
+    def batching_stats(self) -> Dict[str, Any]:
+        return {path: b.stats() for path, b in self.batchers.items()}
+
+    async def dispatch(self, method: str, path: str, body: bytes) -> Tuple[int, Any]:
+        path = path.rstrip("/") or "/"
+        route = ROUTES.get(path)
+        if route is None:
+            raise HttpError(404, "Unknown path: " + path)
+        allowed, handler = route
+        if method != allowed:
+            raise HttpError(405, "%s expects %s" % (path, allowed))
+        try:
+            params = json.loads(body) if body.strip() else {}
+        except ValueError as e:
+            raise HttpError(400, "Invalid JSON: " + str(e))
+        if not isinstance(params, dict):
+            raise HttpError(400, "Request body must be a JSON object")
+        loop = asyncio.get_running_loop()
+        instrumentation.count("http_requests")
+        try:
+            # per-station requests bypass the batchers, which score with the global models
+            if path in self.batchers and "rows" not in params and "station" not in params:
+                return 200, await self._batched(path, params)
+            result = await loop.run_in_executor(self.executor, _traced, handler, params, self.models)
+        except (ValueError, TypeError) as e:
+            raise HttpError(400, str(e))
+        if path == "/health":
+            if self.batchers:
+                result["batching"] = self.batching_stats()
+            cache = get_prediction_cache()
+            if cache is not None:
+                result["prediction_cache"] = cache.stats()
+        return 200, result
+
+    async def _batched(self, path: str, params: Dict[str, Any]) -> Any:
+        name, names = BATCHABLE[path]
+        row = _float_params(params, names)
+        cache = get_prediction_cache()
+        version = None
+        if cache is not None:
+            # the registry stats (and after a retrain reloads) under its lock: keep that off the loop
+            version = await asyncio.get_running_loop().run_in_executor(
+                self.executor, model_version, self.models, name)
+        if version is None:
+            return await asyncio.wrap_future(self.batchers[path].submit(row))
+        key, row = cache.key(name, row, version)
+        value = cache.get(key)
+        if is_missing(value):
+            value = await asyncio.wrap_future(self.batchers[path].submit(row))
+            cache.put(key, value)
+        return value
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                keep_alive = False
+                try:
+                    req = await asyncio.wait_for(_read_request(reader), KEEPALIVE_TIMEOUT)
+                    if req is None:
+                        break
+                    method, path, headers, body = req
+                    keep_alive = _keep_alive(headers)
+                    status, payload = await self.dispatch(method, path, body)
+                except HttpError as e:
+                    status, payload = e.status, {"error": str(e)}
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except Exception as e:
+                    _debug_print("Request failed: " + str(e))
+                    status, payload = 500, {"error": str(e)}
+                writer.write(_response(status, payload, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        finally:
+            writer.close()
+
+    async def serve(self, host: str, port: int):
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        _debug_print("HTTP server listening on %s:%d" % (host, port))
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        for b in self.batchers.values():
+            b.close()
+        self.executor.shutdown(wait=False)
+
+
+def _env_float(name: str) -> Optional[float]:
+    value = os.environ.get(name)
+    return float(value) if value else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Asyncio HTTP server for the weather models")
+    parser.add_argument("--host", default=os.environ.get("ML_HTTP_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("ML_HTTP_PORT", "8001")))
+    parser.add_argument("--threads", type=int, help="scoring threads (default: cpu count + 2, at most 8)")
+    parser.add_argument("--batch-wait-ms", type=float, default=_env_float("ML_BATCH_WAIT_MS"),
+                        help="micro-batch single-row predictions, waiting up to this long (default: off)")
+    parser.add_argument("--batch-max-size", type=int,
+                        default=int(os.environ.get("ML_BATCH_MAX_SIZE", DEFAULT_MAX_BATCH_SIZE)))
+    args = parser.parse_args(argv)
+
+    # warm every artifact up front; the registry reloads them if a retrain replaces them
+    models = get_registry()
+    models.load_all()
+    server = InferenceServer(models, args.threads, args.batch_wait_ms, args.batch_max_size)
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+
+if __name__ == "__main__":
+    main()
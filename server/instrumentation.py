@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Opt-in timing and counters for the prediction hot path.
+
+Stages (registry lookup, model-file resolution and loading, input
+construction, scoring, imports in the CLI scripts) are timed only when
+instrumentation is on, either globally via ML_TIMINGS or for one request
+inside trace(). Counters (model loads, prediction cache hits/misses,
+DataFrame-to-NumPy fallbacks, ...) are always kept; they are plain integer
+increments.
+
+ML_TIMINGS:
+    unset / 0   off (stage() is a shared no-op context manager)
+    1           timings collected; responses carry a "timings" field
+    stderr      timings collected and written as one JSON line per request to
+                stderr instead, leaving the responses unchanged
+
+snapshot() returns the cumulative counters and per-stage totals of the
+process; the worker exposes it as the "metrics" op and the HTTP server as
+GET /metrics.
+"""
+
+import os
+import sys
+import json
+import time
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+_MODE = os.environ.get("ML_TIMINGS", "").strip().lower()
+_enabled = _MODE not in ("", "0", "false", "off")
+_started = time.time()
+
+_lock = threading.Lock()
+_counters: Dict[str, int] = {}
+_stage_totals: Dict[str, list] = {}   # name -> [count, total ms]
+_local = threading.local()
+_active_traces = 0   # traces open in any thread; lets stage() skip the thread-local lookup
+
+
+class _NoopStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _NoopStage()
+
+
+class _Stage:
+    __slots__ = ("name", "trace", "start")
+
+    def __init__(self, name: str, trace: Optional[Dict[str, Any]]):
+        self.name = name
+        self.trace = trace
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        _add_stage(self.name, (time.perf_counter() - self.start) * 1000.0, self.trace)
+        return False
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def emit_to_stderr() -> bool:
+    return _MODE == "stderr"
+
+
+def timings_in_response(force: bool = False) -> bool:
+    """Whether a traced request should return its timings (always when the caller asked)."""
+    return force or (_enabled and not emit_to_stderr())
+
+
+def set_enabled(on: bool):
+    global _enabled
+    _enabled = bool(on)
+
+
+def _current_trace() -> Optional[Dict[str, Any]]:
+    return getattr(_local, "trace", None)
+
+
+def _add_stage(name: str, ms: float, trace: Optional[Dict[str, Any]]):
+    if trace is not None:
+        stages = trace["stages"]
+        stages[name] = stages.get(name, 0.0) + ms
+    with _lock:
+        total = _stage_totals.setdefault(name, [0, 0.0])
+        total[0] += 1
+        total[1] += ms
+
+
+def stage(name: str):
+    """Context manager timing one stage; a no-op unless instrumentation is on for this call."""
+    if not _enabled and not _active_traces:
+        return _NOOP
+    trace = _current_trace()
+    if trace is None and not _enabled:
+        return _NOOP
+    return _Stage(name, trace)
+
+
+def count(name: str, n: int = 1):
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+    trace = _current_trace() if _active_traces else None
+    if trace is not None:
+        counters = trace["counters"]
+        counters[name] = counters.get(name, 0) + n
+
+
+@contextmanager
+def trace(force: bool = False) -> Iterator[Optional[Dict[str, Any]]]:
+    """
+    Collect the stages and counters of one request into a dict
+    ({"stages": {name: ms}, "counters": {...}, "total_ms": ...}). Yields None
+    (and records nothing) when instrumentation is off and force is False.
+    """
+    if not (_enabled or force) or _current_trace() is not None:
+        yield _current_trace()
+        return
+    global _active_traces
+    t = {"stages": {}, "counters": {}}
+    _local.trace = t
+    with _lock:
+        _active_traces += 1
+    start = time.perf_counter()
+    try:
+        yield t
+    finally:
+        _local.trace = None
+        with _lock:
+            _active_traces -= 1
+        t["total_ms"] = (time.perf_counter() - start) * 1000.0
+        if emit_to_stderr():
+            print(json.dumps({"timings": t}), file=sys.stderr)
+
+
+def snapshot() -> Dict[str, Any]:
+    """Cumulative counters and stage totals of this process."""
+    with _lock:
+        return {
+            "pid": os.getpid(),
+            "uptime_s": time.time() - _started,
+            "timings_enabled": _enabled,
+            "counters": dict(_counters),
+            "stages": {name: {"count": c, "total_ms": ms, "mean_ms": ms / c if c else 0.0}
+                       for name, (c, ms) in _stage_totals.items()},
+        }
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _stage_totals.clear()
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Dataset Conversion Script
+Writes weather_dataset.csv to the columnar format read by dataset.py: one .npy
+file per column plus schema.json, in weather_dataset.columns/ next to the CSV.
+Training, get_dataset_stats() and the stats cache then memory-map the columns
+instead of parsing text, for as long as the CSV is unchanged (size + mtime).
+
+Usage: convert_dataset.py [--data PATH] [--out DIR] [--narrow]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+
+# --- make sure we can import dataset.py from the parent folder (server/) ---
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+# ---------------------------------------------------------------------------
+
+from dataset import DEFAULT_CHUNKSIZE, columnar_dir_for, find_dataset_path, write_columnar
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert the dataset CSV to memory-mappable .npy columns")
+    parser.add_argument("--data", help="dataset CSV (defaults to server/data/weather_dataset.csv)")
+    parser.add_argument("--out", help="output directory (defaults to <dataset>.columns next to the CSV)")
+    parser.add_argument("--narrow", action="store_true",
+                        help="store float32 features / int8 labels instead of the dtypes pandas infers")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    args = parser.parse_args()
+
+    try:
+        data_path = args.data or find_dataset_path()
+        start = time.perf_counter()
+        schema = write_columnar(data_path, args.out, args.narrow, args.chunksize)
+        print(json.dumps({
+            "path": args.out or columnar_dir_for(data_path),
+            "rows": schema["rows"],
+            "columns": schema["columns"],
+            "seconds": round(time.perf_counter() - start, 3)
+        }))
+    except Exception as e:
+        print(json.dumps({"error": str(e)}))
+        sys.exit(1)
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Streaming Evaluation
+Scores a labelled dataset of any size against the trained temperature, rain
+and cloudiness models in one pass and saves the results as their metrics.
+
+Rows are read in chunks (dataset.iter_chunks, or a time window of the
+observation store). Each chunk is scored with the compiled models — one
+matrix product for the temperature model, one for rain and cloud together —
+and reduced to an EvalStats: confusion counts per classifier and the running
+sums behind MSE / R². EvalStats merge, so memory stays at a few chunks
+whatever the dataset size.
+
+With --workers > 1 chunks are scored on a process pool; at most two chunks
+per worker are in flight, so reading never runs far ahead of scoring.
+
+Rows failing validation (validation.py) or with labels other than 0/1 are
+skipped and counted. The metrics are written back to the artifacts
+load_models() reads — linear_metrics, logistic_metrics / logistic_confusion
+(rain) and cloud_metrics / cloud_confusion — each with an "evaluation" block
+naming the source and row counts, and the compiled bundle is re-exported.
+Metrics without that block are the training scripts' holdout metrics.
+
+The models were fitted on the bundled dataset, so scoring it gives mostly
+in-sample numbers: without --data / --since / --until it is evaluated as a
+dry run (block "sample": "in_sample"), and writing its metrics is refused.
+--dry-run only prints the metrics.
+
+Usage: evaluate.py [--data PATH | --since TIME --until TIME] [--model-dir DIR]
+                   [--chunksize N] [--workers N] [--dry-run]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+# --- make sure we can import predict.py / dataset.py from the parent folder (server/) ---
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+# ---------------------------------------------------------------------------------------
+
+import numpy as np
+import joblib
+
+from dataset import TEMP_FEATURES, WEATHER_FEATURES, LABELS, DEFAULT_CHUNKSIZE, find_dataset_path, iter_chunks
+from compiled import FusedBinaryLogistic, compile_model
+from validation import WEATHER_SCHEMA, validate
+from predict import PICKLE_FILES
+from train_all import write_artifacts
+from train_streaming import CONFUSION_KEYS, metrics_from_confusion
+from export_compiled import default_model_dir, export_models
+
+# columns of every chunk matrix
+COLUMNS = WEATHER_FEATURES + LABELS
+TARGET_COL = COLUMNS.index("temperature")
+# classifier -> (label column, metrics artifact, confusion artifact)
+CLASSIFIERS = {
+    "rain": (COLUMNS.index("rain"), "logistic_metrics", "logistic_confusion"),
+    "cloud": (COLUMNS.index("cloudiness"), "cloud_metrics", "cloud_confusion"),
+}
+
+
+class EvalStats:
+    """
+    Mergeable evaluation sums: temperature count / mean / M2 (for R²) and the
+    squared error, plus [tn, fp, fn, tp] per classifier.
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self.skipped = 0
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.sse = 0.0
+        self.confusion = {name: np.zeros(4, dtype=np.int64) for name in CLASSIFIERS}
+
+    @classmethod
+    def from_chunk(cls, matrix: np.ndarray, linear, fused) -> "EvalStats":
+        stats = cls()
+        stats.rows = len(matrix)
+        valid = validate(matrix[:, :len(WEATHER_FEATURES)], WEATHER_SCHEMA).valid
+        for col, _, _ in CLASSIFIERS.values():
+            valid &= (matrix[:, col] == 0) | (matrix[:, col] == 1)
+        if not valid.all():
+            matrix = matrix[valid]
+        stats.skipped = stats.rows - len(matrix)
+        if not len(matrix):
+            return stats
+
+        y = matrix[:, TARGET_COL]
+        err = linear.predict(matrix[:, [COLUMNS.index(f) for f in linear.feature_names_in_]]) - y
+        stats.n = len(y)
+        stats.mean = float(y.mean())
+        stats.m2 = float(((y - stats.mean) ** 2).sum())
+        stats.sse = float(err @ err)
+
+        labels, _ = fused.predict_with_proba(matrix[:, :len(WEATHER_FEATURES)])
+        for i, (name, (col, _, _)) in enumerate(CLASSIFIERS.items()):
+            cell = 2 * matrix[:, col].astype(np.int64) + (labels[:, i] == 1)
+            stats.confusion[name] += np.bincount(cell, minlength=4)
+        return stats
+
+    def merge(self, other: "EvalStats") -> "EvalStats":
+        n = self.n + other.n
+        if other.n:
+            delta = other.mean - self.mean
+            self.mean += delta * other.n / n
+            self.m2 += other.m2 + delta * delta * self.n * other.n / n
+        self.n = n
+        self.sse += other.sse
+        self.rows += other.rows
+        self.skipped += other.skipped
+        for name in self.confusion:
+            self.confusion[name] += other.confusion[name]
+        return self
+
+    def linear_metrics(self):
+        mse = self.sse / self.n if self.n else float("nan")
+        return {
+            'mse': mse,
+            'rmse': float(np.sqrt(mse)),
+            'r2_score': 1.0 - self.sse / self.m2 if self.m2 else float("nan"),
+        }
+
+    def confusion_dict(self, name):
+        tn, fp, fn, tp = (int(v) for v in self.confusion[name])
+        return dict(zip(CONFUSION_KEYS, (tp, tn, fp, fn)))
+
+
+def load_scorers(model_dir):
+    """(compiled temperature model, fused rain+cloud classifier) from the pickles in model_dir."""
+    linear = compile_model(joblib.load(os.path.join(model_dir, PICKLE_FILES["linear"])), TEMP_FEATURES)
+    classifiers = [compile_model(joblib.load(os.path.join(model_dir, PICKLE_FILES[name])), WEATHER_FEATURES)
+                   for name in CLASSIFIERS]
+    return linear, FusedBinaryLogistic(classifiers, WEATHER_FEATURES)
+
+
+_scorers = None
+
+
+def _init_worker(linear, fused):
+    global _scorers
+    _scorers = (linear, fused)
+
+
+def _score_chunk(matrix):
+    return EvalStats.from_chunk(matrix, *_scorers)
+
+
+def iter_matrices(data_path=None, chunksize=DEFAULT_CHUNKSIZE, since=None, until=None):
+    """float64 (n, len(COLUMNS)) chunks of the dataset, or of the observation store's window."""
+    if since is not None or until is not None:
+        from observation_store import get_observation_store
+        chunks = get_observation_store().scan(COLUMNS, since, until, chunksize=chunksize)
+    else:
+        # full precision, and labels as floats so blank ones are skipped rather than fatal
+        chunks = iter_chunks(data_path, chunksize, columns=COLUMNS, narrow=False)
+    for chunk in chunks:
+        yield chunk[COLUMNS].to_numpy(dtype=np.float64)
+
+
+def evaluate_stream(matrices, linear, fused, workers=1) -> EvalStats:
+    """Merge the EvalStats of every chunk, scoring on `workers` processes."""
+    total = EvalStats()
+    if workers <= 1:
+        for matrix in matrices:
+            total.merge(EvalStats.from_chunk(matrix, linear, fused))
+        return total
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(linear, fused)) as pool:
+        pending = deque()
+        for matrix in matrices:
+            pending.append(pool.submit(_score_chunk, matrix))
+            if len(pending) >= 2 * workers:
+                total.merge(pending.popleft().result())
+        while pending:
+            total.merge(pending.popleft().result())
+    return total
+
+
+def evaluation_metrics(stats: EvalStats, source: str, in_sample: bool = False):
+    """{artifact key: metrics dict} in the shapes training writes."""
+    block = {"source": source, "sample": "in_sample" if in_sample else "external",
+             "rows": stats.rows, "skipped_rows": stats.skipped}
+    out = {"linear_metrics": dict(stats.linear_metrics(), evaluation=block)}
+    for name, (_, metrics_key, confusion_key) in CLASSIFIERS.items():
+        confusion = stats.confusion_dict(name)
+        out[metrics_key] = dict(metrics_from_confusion(confusion), evaluation=block)
+        out[confusion_key] = confusion
+    return out
+
+
+def _is_training_dataset(path):
+    try:
+        return os.path.samefile(path, find_dataset_path())
+    except (FileNotFoundError, OSError):
+        return False
+
+
+def evaluate(data_path=None, model_dir=None, chunksize=DEFAULT_CHUNKSIZE, workers=None,
+             since=None, until=None, write=True, verbose=True):
+    model_dir = model_dir or default_model_dir()
+    if model_dir is None:
+        raise FileNotFoundError("No trained models found")
+    workers = workers or os.cpu_count() or 1
+    wall_start = time.perf_counter()
+
+    in_sample = False
+    if since is not None or until is not None:
+        source = "observations [%s, %s)" % (since, until)
+    else:
+        data_path = data_path or find_dataset_path()
+        source = os.path.abspath(data_path)
+        in_sample = _is_training_dataset(source)
+    if write and in_sample:
+        raise ValueError("%s is the training dataset: its metrics are in-sample and would replace the "
+                         "holdout metrics. Pass --data / --since / --until, or --dry-run" % source)
+    linear, fused = load_scorers(model_dir)
+    stats = evaluate_stream(iter_matrices(data_path, chunksize, since, until), linear, fused, workers)
+    if not stats.n:
+        raise ValueError("No valid labelled rows in " + source)
+    results = evaluation_metrics(stats, source, in_sample)
+
+    if write:
+        write_artifacts({PICKLE_FILES[key]: value for key, value in results.items()}, model_dir)
+        # keep the compiled NumPy artifacts in sync with the new pickles
+        export_models(model_dir)
+
+    wall_seconds = time.perf_counter() - wall_start
+    if verbose:
+        lm, rm, cm = results["linear_metrics"], results["logistic_metrics"], results["cloud_metrics"]
+        print(f"Evaluated {stats.n} rows ({stats.skipped} skipped) from {source} "
+              f"on {workers} worker(s) in {wall_seconds*1000:.1f} ms")
+        print(f"Linear Regression - RMSE: {lm['rmse']:.2f}, R² Score: {lm['r2_score']:.3f}")
+        print(f"Rain Model - Accuracy: {rm['accuracy']*100:.1f}%, F1 Score: {rm['f1_score']:.3f}")
+        print(f"Cloud Model - Accuracy: {cm['accuracy']*100:.1f}%, F1 Score: {cm['f1_score']:.3f}")
+        if not write:
+            print("Dry run: metrics not saved")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evaluate all models on a labelled dataset in one streaming pass")
+    parser.add_argument("--data", help="labelled CSV (without it or --since/--until: a dry run on the training dataset)")
+    parser.add_argument("--since", help="evaluate on ingested observations from this time (observation_store.py)")
+    parser.add_argument("--until", help="evaluate on ingested observations before this time")
+    parser.add_argument("--model-dir", help="folder holding the trained pickles (defaults to the serving directory)")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument("--workers", type=int, help="scoring processes (default: cpu count)")
+    parser.add_argument("--dry-run", action="store_true", help="print the metrics without saving them")
+    parser.add_argument("--json", action="store_true", help="print the metrics as JSON")
+    args = parser.parse_args()
+    has_source = args.data is not None or args.since is not None or args.until is not None
+    try:
+        results = evaluate(args.data, args.model_dir, args.chunksize, args.workers, args.since, args.until,
+                           write=has_source and not args.dry_run, verbose=not args.json)
+    except (FileNotFoundError, ValueError) as e:
+        print(json.dumps({"error": str(e)}))
+        sys.exit(1)
+    if args.json:
+        print(json.dumps(results))
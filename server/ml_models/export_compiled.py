@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Export the trained models to the compiled NumPy format
+Writes .npz (models) and .json (metrics) next to the pickles, the single-file
+weather_models.bundle holding all of them, plus a manifest; predict.py then
+serves them without sklearn/pandas.
+"""
+
+import os
+import sys
+import json
+import argparse
+
+# --- make sure we can import predict.py from the parent folder (server/) ---
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+# ---------------------------------------------------------------------------
+
+from compiled import BUNDLE_NAME, export_dir
+from predict import PICKLE_FILES, MODEL_KEYS, _possible_model_dirs
+
+
+def default_model_dir():
+    """The first directory the registry would load the linear pickle from."""
+    for d in _possible_model_dirs():
+        if os.path.exists(os.path.join(d, PICKLE_FILES["linear"])):
+            return d
+    return None
+
+
+def export_models(model_dir):
+    return export_dir(model_dir, PICKLE_FILES, MODEL_KEYS)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export trained models to compiled NumPy artifacts")
+    parser.add_argument("--model-dir", action="append",
+                        help="directory holding the pickles (repeatable); defaults to the serving directory")
+    args = parser.parse_args()
+
+    dirs = args.model_dir or [default_model_dir()]
+    if dirs == [None]:
+        print(json.dumps({"error": "No trained models found", "searched_dirs": _possible_model_dirs()}))
+        sys.exit(1)
+    for d in dirs:
+        manifest = export_models(d)
+        exported = [name for name, entry in manifest.items() if "#" not in name and "source" in entry]
+        print(f"Exported {len(exported)} artifacts and {BUNDLE_NAME} to {d}")
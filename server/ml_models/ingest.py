@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Observation Store CLI
+Appends rows to the observation store (observation_store.py), compacts its
+log into date partitions and summarizes what it holds.
+Rows without an observed_at column are stamped with --observed-at, or the
+ingestion time when that is omitted.
+
+Usage: ingest.py append FILE [--format csv|jsonl] [--observed-at TIME]
+       ingest.py compact
+       ingest.py stats [--since TIME] [--until TIME]
+       ingest.py partitions [--since TIME] [--until TIME]
+"""
+
+import os
+import sys
+import json
+import argparse
+
+# --- make sure we can import observation_store.py from the parent folder (server/) ---
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+# ---------------------------------------------------------------------------
+
+from observation_store import ObservationStore, TIME_COLUMN, to_epoch
+from predict_batch import read_rows
+
+
+def respond(obj, exit_code=0):
+    print(json.dumps(obj))
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Observation store ingestion and compaction")
+    parser.add_argument("--store", help="store directory (defaults to ML_OBSERVATION_STORE or server/data/observations)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    append = sub.add_parser("append", help="append the rows of a CSV/JSONL file")
+    append.add_argument("file", help='CSV/JSONL file of rows, or "-" for stdin')
+    append.add_argument("--format", choices=["csv", "jsonl"], help="defaults to the file extension (csv otherwise)")
+    append.add_argument("--observed-at", help="time for rows without an observed_at column")
+    sub.add_parser("compact", help="fold the ingest log into date partitions")
+    for name in ("stats", "partitions"):
+        p = sub.add_parser(name)
+        p.add_argument("--since")
+        p.add_argument("--until")
+    args = parser.parse_args()
+
+    try:
+        store = ObservationStore(args.store)
+        if args.command == "append":
+            rows = read_rows(args.file, args.format)
+            if args.observed_at is not None and TIME_COLUMN not in rows.columns:
+                rows[TIME_COLUMN] = to_epoch(args.observed_at)
+            respond(store.append(rows, flush=True))
+        elif args.command == "compact":
+            respond(store.compact())
+        elif args.command == "stats":
+            respond(store.stats(args.since, args.until))
+        else:
+            # time ranges and row counts; the per-column statistics are what "stats" merges
+            respond({"partitions": [{k: v for k, v in entry.items() if k != "columns"}
+                                    for entry in store.partitions(args.since, args.until)]})
+    except Exception as e:
+        respond({"error": str(e)}, 1)
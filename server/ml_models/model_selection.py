@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""
+Model Selection
+k-fold cross-validation with a grid or random search over the model
+hyperparameters, replacing the single 80/20 split of the training scripts:
+
+    temperature   LinearRegression, Ridge or Lasso; alpha; feature scaling
+    rain / cloud  LogisticRegression; C; solver; feature scaling
+
+The dataset is parsed once and every fold is preprocessed once (raw and
+standardized with the fold's training statistics) into .npy files that the
+pool processes memory-map; all candidates evaluated on a fold share them.
+With --fold-cache DIR the folds are kept and reused by later runs on the
+same dataset, k and seed. Every (candidate, fold) fit is a separate task on a
+process pool.
+
+The winner of each model (lowest mean RMSE, highest mean F1) is refitted on
+all rows. Feature scaling is folded into its coefficients, so the saved model
+is a plain sklearn estimator the compiled/bundle export handles like any
+other. Its metrics artifact holds the mean CV metrics plus a "cv" block
+(folds, search, params, standard deviations); logistic_confusion and
+cloud_confusion are the classifier winners' confusion summed over the
+validation folds.
+
+Usage: model_selection.py [--data PATH] [--model-dir DIR] [--folds K]
+                          [--search grid|random] [--n-iter N] [--workers N]
+                          [--fold-cache DIR] [--seed N] [--report PATH]
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import argparse
+import itertools
+import tempfile
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
+
+# --- make sure we can import predict.py / dataset.py from the parent folder (server/) ---
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+# ---------------------------------------------------------------------------------------
+
+import numpy as np
+from sklearn.model_selection import KFold
+from sklearn.linear_model import LinearRegression, Ridge, Lasso, LogisticRegression
+
+from dataset import WEATHER_FEATURES, LABELS, find_dataset_path, read_dataset
+from predict import PICKLE_FILES
+from train_all import COLUMNS, MODEL_JOBS, write_artifacts
+from train_linear_regression import fit_linear_regression
+from train_logistic_regression import fit_logistic_classifier
+from export_compiled import export_models
+
+# model name -> {parameter: grid values}
+GRIDS = {
+    "linear": {
+        "estimator": ["ols", "ridge", "lasso"],
+        "alpha": [0.001, 0.01, 0.1, 1.0, 10.0, 100.0],
+        "scale": [False, True],
+    },
+    "rain": {
+        "C": [0.001, 0.01, 0.1, 1.0, 10.0, 100.0],
+        "solver": ["lbfgs", "liblinear", "newton-cg"],
+        "scale": [False, True],
+    },
+}
+GRIDS["cloud"] = GRIDS["rain"]
+
+# log-uniform ranges for the continuous parameters in random search
+LOG_RANGES = {"alpha": (1e-4, 1e3), "C": (1e-4, 1e3)}
+
+# model name -> (metric, higher is better)
+SELECTION_METRIC = {"linear": ("rmse", False), "rain": ("f1_score", True), "cloud": ("f1_score", True)}
+
+CONFUSION_KEYS = ("true_positive", "true_negative", "false_positive", "false_negative")
+
+
+def make_estimator(name, params):
+    """Unfitted estimator for one candidate (scaling is applied to the data, not here)."""
+    if name == "linear":
+        if params["estimator"] == "ridge":
+            return Ridge(alpha=params["alpha"])
+        if params["estimator"] == "lasso":
+            return Lasso(alpha=params["alpha"], max_iter=10000)
+        return LinearRegression()
+    return LogisticRegression(C=params["C"], solver=params["solver"], max_iter=1000, random_state=42)
+
+
+def _dedupe(candidates):
+    # alpha means nothing to plain least squares: keep one OLS candidate per scaling choice
+    seen, out = set(), []
+    for c in candidates:
+        if c.get("estimator") == "ols":
+            c = dict(c, alpha=None)
+        key = tuple(sorted(c.items()))
+        if key not in seen:
+            seen.add(key)
+            out.append(c)
+    return out
+
+
+def grid_candidates(name):
+    grid = GRIDS[name]
+    keys = sorted(grid)
+    return _dedupe([dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))])
+
+
+def random_candidates(name, n_iter, seed=42):
+    """n_iter candidates: log-uniform alpha / C, the other parameters drawn from the grid."""
+    rng = np.random.RandomState(seed)
+    grid = GRIDS[name]
+    out = []
+    for _ in range(n_iter):
+        c = {}
+        for key in sorted(grid):
+            if key in LOG_RANGES:
+                lo, hi = np.log10(LOG_RANGES[key])
+                c[key] = float(10 ** rng.uniform(lo, hi))
+            else:
+                c[key] = grid[key][rng.randint(len(grid[key]))]
+        out.append(c)
+    return _dedupe(out)
+
+
+# --- fold cache -------------------------------------------------------------
+
+def fold_cache_key(data_path, n_rows, folds, seed):
+    """Changes whenever the dataset file, the fold count or the shuffle seed does."""
+    st = os.stat(data_path)
+    # "float64": folds cached from the earlier float32 parse are not reused
+    raw = json.dumps([os.path.abspath(data_path), st.st_size, st.st_mtime_ns, n_rows, folds, seed, COLUMNS,
+                      "float64"])
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def _standardize(train, val):
+    """Scale the feature columns by the training fold's mean/std; labels stay untouched."""
+    cols = [COLUMNS.index(f) for f in WEATHER_FEATURES]
+    mean = train[:, cols].mean(axis=0)
+    std = train[:, cols].std(axis=0)
+    std[std == 0] = 1.0
+    train_s, val_s = train.copy(), val.copy()
+    train_s[:, cols] = (train[:, cols] - mean) / std
+    val_s[:, cols] = (val[:, cols] - mean) / std
+    return train_s, val_s
+
+
+def prepare_folds(data, cache_dir, folds, seed):
+    """Write fold{i}/{train,val}[_scaled].npy once; a complete cache is left as it is."""
+    done = os.path.join(cache_dir, "complete")
+    if os.path.exists(done):
+        return False
+    splitter = KFold(n_splits=folds, shuffle=True, random_state=seed)
+    for i, (train_idx, val_idx) in enumerate(splitter.split(data)):
+        fold_dir = os.path.join(cache_dir, "fold%d" % i)
+        os.makedirs(fold_dir, exist_ok=True)
+        train, val = data[train_idx], data[val_idx]
+        train_s, val_s = _standardize(train, val)
+        for fname, arr in (("train", train), ("val", val), ("train_scaled", train_s), ("val_scaled", val_s)):
+            np.save(os.path.join(fold_dir, fname + ".npy"), arr)
+    with open(done, "w") as f:
+        f.write(str(folds))
+    return True
+
+
+@lru_cache(maxsize=None)
+def _load_fold(cache_dir, fold, scaled):
+    # one read-only mapping per fold and process, shared by every candidate the process fits
+    suffix = "_scaled" if scaled else ""
+    fold_dir = os.path.join(cache_dir, "fold%d" % fold)
+    return (np.load(os.path.join(fold_dir, "train%s.npy" % suffix), mmap_mode="r"),
+            np.load(os.path.join(fold_dir, "val%s.npy" % suffix), mmap_mode="r"),
+            np.load(os.path.join(fold_dir, "train.npy"), mmap_mode="r"),
+            np.load(os.path.join(fold_dir, "val.npy"), mmap_mode="r"))
+
+
+def evaluate_fold(name, params, cache_dir, fold):
+    """Fit one candidate on one fold; returns its validation metrics (plus confusion counts)."""
+    _, features, target = MODEL_JOBS[name]
+    train, val, train_raw, val_raw = _load_fold(cache_dir, fold, bool(params["scale"]))
+    cols = [COLUMNS.index(f) for f in features]
+    y_col = COLUMNS.index(target)
+    # the target always comes from the unscaled matrix (temperature is both a feature and a target)
+    y_train, y_val = np.asarray(train_raw[:, y_col]), np.asarray(val_raw[:, y_col])
+    X_train, X_val = np.asarray(train[:, cols]), np.asarray(val[:, cols])
+    model = make_estimator(name, params)
+    if target in LABELS:
+        _, metrics, confusion = fit_logistic_classifier(X_train, y_train.astype(int), X_val, y_val.astype(int), model)
+        return dict(metrics, **confusion)
+    _, metrics = fit_linear_regression(X_train, y_train, X_val, y_val, model)
+    return metrics
+
+
+# --- search -------------------------------------------------------------------
+
+def summarize(params, fold_metrics):
+    """Mean and std of every metric over the folds; confusion counts are summed."""
+    keys = [k for k in fold_metrics[0] if k not in CONFUSION_KEYS]
+    mean = {k: float(np.mean([m[k] for m in fold_metrics])) for k in keys}
+    std = {k: float(np.std([m[k] for m in fold_metrics])) for k in keys}
+    out = {"params": params, "mean": mean, "std": std}
+    if CONFUSION_KEYS[0] in fold_metrics[0]:
+        out["confusion"] = {k: int(sum(m[k] for m in fold_metrics)) for k in CONFUSION_KEYS}
+    return out
+
+
+def best_candidate(name, results):
+    metric, higher = SELECTION_METRIC[name]
+    # first candidate wins ties, so the order of the grid decides between equals
+    return max(results, key=lambda r: r["mean"][metric]) if higher else min(results, key=lambda r: r["mean"][metric])
+
+
+def run_search(candidates, cache_dir, folds, workers):
+    """{name: [summary per candidate]} with every (candidate, fold) fitted on the pool."""
+    tasks = [(name, i, fold) for name, cands in candidates.items() for i in range(len(cands)) for fold in range(folds)]
+    fold_results = {}
+    if workers <= 1:
+        for name, i, fold in tasks:
+            fold_results[name, i, fold] = evaluate_fold(name, candidates[name][i], cache_dir, fold)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {(name, i, fold): pool.submit(evaluate_fold, name, candidates[name][i], cache_dir, fold)
+                       for name, i, fold in tasks}
+            fold_results = {key: f.result() for key, f in futures.items()}
+    return {name: [summarize(params, [fold_results[name, i, fold] for fold in range(folds)])
+                   for i, params in enumerate(cands)]
+            for name, cands in candidates.items()}
+
+
+def refit(name, params, data):
+    """Fit the winner on every row; standardization is folded into coef_/intercept_."""
+    import pandas as pd
+
+    _, features, target = MODEL_JOBS[name]
+    cols = [COLUMNS.index(f) for f in features]
+    X = data[:, cols]
+    y = data[:, COLUMNS.index(target)]
+    if target in LABELS:
+        y = y.astype(int)
+    mean, std = np.zeros(len(cols)), np.ones(len(cols))
+    if params["scale"]:
+        mean, std = X.mean(axis=0), X.std(axis=0)
+        std[std == 0] = 1.0
+    model = make_estimator(name, params)
+    model.fit(pd.DataFrame((X - mean) / std, columns=features), y)
+    # w·((x - mean) / std) + b  ==  (w / std)·x + (b - (w / std)·mean)
+    coef = model.coef_ / std
+    model.intercept_ = model.intercept_ - coef @ mean
+    model.coef_ = coef
+    return model
+
+
+def _cv_metrics(summary, folds, search):
+    return dict(summary["mean"], cv={
+        "folds": folds,
+        "search": search,
+        "params": summary["params"],
+        "std": summary["std"],
+    })
+
+
+def select_models(data_path=None, model_dir=None, folds=5, search="grid", n_iter=20,
+                  workers=None, fold_cache=None, seed=42, verbose=True):
+    model_dir = model_dir or os.path.dirname(os.path.abspath(__file__))
+    workers = workers or os.cpu_count() or 1
+    data_path = data_path or find_dataset_path()
+    wall_start = time.perf_counter()
+
+    data = read_dataset(data_path, COLUMNS, narrow=False).to_numpy(dtype=np.float64)
+    if search == "grid":
+        candidates = {name: grid_candidates(name) for name in MODEL_JOBS}
+    else:
+        candidates = {name: random_candidates(name, n_iter, seed + i) for i, name in enumerate(MODEL_JOBS)}
+
+    cache_root = fold_cache or tempfile.mkdtemp(prefix="weather-cv-")
+    cache_dir = os.path.join(cache_root, fold_cache_key(data_path, len(data), folds, seed))
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        prepared = prepare_folds(data, cache_dir, folds, seed)
+        results = run_search(candidates, cache_dir, folds, workers)
+    finally:
+        if fold_cache is None:
+            shutil.rmtree(cache_root, ignore_errors=True)
+
+    best = {name: best_candidate(name, rs) for name, rs in results.items()}
+    models = {name: refit(name, best[name]["params"], data) for name in MODEL_JOBS}
+    write_artifacts({
+        PICKLE_FILES["linear"]: models["linear"],
+        PICKLE_FILES["linear_metrics"]: _cv_metrics(best["linear"], folds, search),
+        PICKLE_FILES["rain"]: models["rain"],
+        PICKLE_FILES["cloud"]: models["cloud"],
+        PICKLE_FILES["logistic_metrics"]: _cv_metrics(best["rain"], folds, search),
+        PICKLE_FILES["logistic_confusion"]: best["rain"]["confusion"],
+        PICKLE_FILES["cloud_metrics"]: _cv_metrics(best["cloud"], folds, search),
+        PICKLE_FILES["cloud_confusion"]: best["cloud"]["confusion"],
+    }, model_dir)
+
+    # keep the compiled NumPy artifacts in sync with the new pickles
+    export_models(model_dir)
+
+    wall_seconds = time.perf_counter() - wall_start
+    fits = sum(len(c) for c in candidates.values()) * folds
+    if verbose:
+        print(f"{search.capitalize()} search: {fits} fits over {folds} folds of {len(data)} rows "
+              f"({workers} workers, folds {'prepared' if prepared else 'from cache'}, {wall_seconds:.1f} s)")
+        for name in MODEL_JOBS:
+            metric, _ = SELECTION_METRIC[name]
+            b = best[name]
+            print(f"  {name}: {b['params']}  {metric} {b['mean'][metric]:.4f} ± {b['std'][metric]:.4f}")
+
+    return {"best": best, "results": results, "folds": folds, "search": search,
+            "fits": fits, "wall_seconds": wall_seconds}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cross-validated hyperparameter search for all models")
+    parser.add_argument("--data", help="dataset CSV (defaults to server/data/weather_dataset.csv)")
+    parser.add_argument("--model-dir", help="where to write the artifacts (defaults to this folder)")
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--search", choices=["grid", "random"], default="grid")
+    parser.add_argument("--n-iter", type=int, default=20, help="candidates per model for --search random")
+    parser.add_argument("--workers", type=int, help="pool processes (default: cpu count)")
+    parser.add_argument("--fold-cache", help="keep the preprocessed folds here and reuse them on later runs")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--report", help="also write every candidate's CV results to this JSON file")
+    args = parser.parse_args()
+    if args.folds < 2:
+        parser.error("--folds must be at least 2")
+
+    report = select_models(args.data, args.model_dir, args.folds, args.search, args.n_iter,
+                           args.workers, args.fold_cache, args.seed)
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump({k: report[k] for k in ("folds", "search", "fits", "wall_seconds", "best", "results")}, f, indent=2)
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Batch predictions from a CSV or JSONL file of rows.
+Usage: predict_batch.py {temperature|weather} FILE [--format csv|jsonl]
+FILE may be "-" to read from stdin. Prints one JSON object whose
+prediction fields are lists aligned with the input rows; rows that fail
+validation (validation.py) get null predictions and are listed under "errors".
+"""
+
+import os
+import sys
+import json
+import argparse
+
+# --- make sure we can import predict.py from the parent folder (server/) ---
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+# ---------------------------------------------------------------------------
+
+import pandas as pd
+
+from predict import predict_temperature_batch, classify_weather_batch, batch_result_to_json
+
+
+def respond(obj, exit_code=0):
+    print(json.dumps(obj))
+    sys.exit(exit_code)
+
+
+def read_rows(path, fmt=None):
+    if fmt is None:
+        fmt = "jsonl" if path.lower().endswith((".jsonl", ".ndjson")) else "csv"
+    source = sys.stdin if path == "-" else path
+    if fmt == "jsonl":
+        return pd.read_json(source, lines=True)
+    return pd.read_csv(source)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Batch weather predictions")
+    parser.add_argument("kind", choices=["temperature", "weather"])
+    parser.add_argument("file", help='CSV/JSONL file of rows, or "-" for stdin')
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="defaults to the file extension (csv otherwise)")
+    args = parser.parse_args()
+
+    try:
+        rows = read_rows(args.file, args.format)
+        if args.kind == "temperature":
+            result = predict_temperature_batch(rows)
+        else:
+            result = classify_weather_batch(rows)
+        out = batch_result_to_json(result)
+        out["count"] = int(len(rows))
+        respond(out, 0)
+    except Exception as e:
+        respond({"error": str(e)}, 1)
@@ -42,8 +42,6 @@ if BASE_DIR not in sys.path:
     sys.path.insert(0, BASE_DIR)
 # ---------------------------------------------------------------------------
 
-from predict import predict_temperature
-
 
 if __name__ == "__main__":
     if len(sys.argv) != 5:
@@ -51,12 +49,18 @@ if __name__ == "__main__":
         sys.exit(1)
 
     try:
-        humidity = float(sys.argv[1])
-        pressure = float(sys.argv[2])
-        wind_speed = float(sys.argv[3])
-        clouds = float(sys.argv[4])
+        # ML_TIMINGS=1 adds a "timings" breakdown (imports included) to the output
+        import instrumentation
+        with instrumentation.trace() as timings:
+            # type, finiteness and range checks before the heavy import; the error lists every bad argument
+            from validation import TEMP_SCHEMA, validate_row
+            params = validate_row(dict(zip(TEMP_SCHEMA.features, sys.argv[1:5])), TEMP_SCHEMA)
 
-        result = predict_temperature(humidity, pressure, wind_speed, clouds)
+            with instrumentation.stage("import"):
+                from predict import predict_temperature
+            result = predict_temperature(**params)
+        if timings is not None and instrumentation.timings_in_response():
+            result["timings"] = timings
         print(json.dumps(result))
 
     except Exception as e:
@@ -98,8 +98,6 @@ Prints JSON with prediction and probability (if available).
 import os
 import sys
 import json
-import math
-import numpy as np
 
 # --- make sure we can import predict.py from the parent folder (server/) ---
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -107,8 +105,6 @@ if BASE_DIR not in sys.path:
     sys.path.insert(0, BASE_DIR)
 # ---------------------------------------------------------------------------
 
-from predict import classify_weather
-
 
 def respond(obj, exit_code=0):
     print(json.dumps(obj))
@@ -124,26 +120,31 @@ def parse_args(argv):
             },
             1,
         )
+    from validation import WEATHER_SCHEMA, validate_row
+    # type, finiteness and range checks; the error lists every bad argument
     try:
-        vals = [float(x) for x in argv[1:6]]
-    except ValueError:
-        respond({"error": "All five inputs must be numeric (float)."}, 1)
-    return vals
+        return validate_row(dict(zip(WEATHER_SCHEMA.features, argv[1:6])), WEATHER_SCHEMA)
+    except ValueError as e:
+        respond({"error": str(e)}, 1)
 
 
 if __name__ == "__main__":
     try:
-        temp, hum, pres, wind, clouds = parse_args(sys.argv)
-
-        # optional simple sanity checks
-        if any(math.isinf(v) or math.isnan(v) for v in (temp, hum, pres, wind, clouds)):
-            respond({"error": "Inputs must be finite numbers (no NaN/Inf)."}, 1)
+        # ML_TIMINGS=1 adds a "timings" breakdown (imports included) to the output
+        import instrumentation
+        with instrumentation.trace() as timings:
+            # bad arguments are rejected before the heavy import
+            params = parse_args(sys.argv)
 
-        # Call classify_weather; allow it to return dict or simple value
-        result = classify_weather(temp, hum, pres, wind, clouds)
+            with instrumentation.stage("import"):
+                from predict import classify_weather
+            # Call classify_weather; allow it to return dict or simple value
+            result = classify_weather(**params)
 
         # normalize result to JSON-able dict
         if isinstance(result, dict):
+            if timings is not None and instrumentation.timings_in_response():
+                result["timings"] = timings
             respond(result, 0)
         else:
             # if result is (label, prob) or label only
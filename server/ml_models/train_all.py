@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Training Orchestrator
+Parses the dataset once, computes one train/test index split and trains the
+temperature, rain and cloudiness models from that shared data, concurrently.
+Artifacts are written only after every model has been fitted, each through a
+temp file + os.replace, so readers never see a partial file.
+
+The split uses train_test_split(test_size=0.2, random_state=42) on the row
+indices, i.e. the same rows as the individual training scripts, and the CSV
+is parsed at full float64 precision as they do, so the fitted models match.
+
+--executor thread (default) fits the models on threads over the in-memory
+arrays. --executor process fits them on a process pool; the split data is
+written once to .npy files and every worker memory-maps them read-only
+instead of receiving a pickled copy. Per-model fit times are reported either way.
+
+--since / --until train on that time window of the ingested observations
+(observation_store.py) instead of the CSV.
+
+Usage: train_all.py [--data PATH] [--model-dir DIR] [--workers N] [--executor thread|process]
+                    [--since TIME] [--until TIME]
+"""
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+# --- make sure we can import predict.py / dataset.py from the parent folder (server/) ---
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+# ---------------------------------------------------------------------------------------
+
+import numpy as np
+import joblib
+from sklearn.model_selection import train_test_split
+
+from dataset import TEMP_FEATURES, WEATHER_FEATURES, LABELS, read_dataset
+from predict import PICKLE_FILES
+from train_linear_regression import fit_linear_regression
+from train_logistic_regression import fit_logistic_classifier
+from export_compiled import export_models
+
+
+def split_indices(n_rows, test_size=0.2, random_state=42):
+    """One train/test split of row indices shared by every model."""
+    return train_test_split(np.arange(n_rows), test_size=test_size, random_state=random_state)
+
+
+def write_artifacts(artifacts, model_dir):
+    """Dump {filename: object} to temp files first, then move them all into place."""
+    tmp_paths = {}
+    try:
+        for fname, obj in artifacts.items():
+            tmp = os.path.join(model_dir, ".%s.tmp-%d" % (fname, os.getpid()))
+            joblib.dump(obj, tmp)
+            tmp_paths[fname] = tmp
+        for fname, tmp in tmp_paths.items():
+            os.replace(tmp, os.path.join(model_dir, fname))
+    finally:
+        for tmp in tmp_paths.values():
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+
+
+# columns of the shared train/test matrices
+COLUMNS = WEATHER_FEATURES + LABELS
+
+# model name -> (fitter, features, target)
+MODEL_JOBS = {
+    "linear": (fit_linear_regression, TEMP_FEATURES, "temperature"),
+    "rain": (fit_logistic_classifier, WEATHER_FEATURES, "rain"),
+    "cloud": (fit_logistic_classifier, WEATHER_FEATURES, "cloudiness"),
+}
+
+
+def _fit_model(name, train, test):
+    """Fit one model from the shared (n, len(COLUMNS)) matrices; returns (result, fit seconds)."""
+    import pandas as pd
+
+    fitter, features, target = MODEL_JOBS[name]
+    cols = [COLUMNS.index(f) for f in features]
+    y_col = COLUMNS.index(target)
+    X_train = pd.DataFrame(train[:, cols], columns=features)
+    X_test = pd.DataFrame(test[:, cols], columns=features)
+    y_train, y_test = np.asarray(train[:, y_col]), np.asarray(test[:, y_col])
+    if target in LABELS:
+        y_train, y_test = y_train.astype(int), y_test.astype(int)
+
+    start = time.perf_counter()
+    result = fitter(X_train, y_train, X_test, y_test)
+    return result, time.perf_counter() - start
+
+
+def _fit_model_from_files(name, shared_dir):
+    # runs in a pool process: attach to the shared split read-only
+    train = np.load(os.path.join(shared_dir, "train.npy"), mmap_mode="r")
+    test = np.load(os.path.join(shared_dir, "test.npy"), mmap_mode="r")
+    return _fit_model(name, train, test)
+
+
+def fit_models(train, test, workers=3, executor="thread"):
+    """Fit every model in MODEL_JOBS concurrently; returns {name: (result, fit seconds)}."""
+    workers = max(1, min(workers, len(MODEL_JOBS)))
+    if executor == "thread":
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {name: pool.submit(_fit_model, name, train, test) for name in MODEL_JOBS}
+            return {name: f.result() for name, f in futures.items()}
+    if executor != "process":
+        raise ValueError("executor must be 'thread' or 'process'")
+
+    shared_dir = tempfile.mkdtemp(prefix="weather-train-")
+    try:
+        np.save(os.path.join(shared_dir, "train.npy"), np.ascontiguousarray(train))
+        np.save(os.path.join(shared_dir, "test.npy"), np.ascontiguousarray(test))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {name: pool.submit(_fit_model_from_files, name, shared_dir) for name in MODEL_JOBS}
+            return {name: f.result() for name, f in futures.items()}
+    finally:
+        shutil.rmtree(shared_dir, ignore_errors=True)
+
+
+def train_all(data_path=None, model_dir=None, workers=3, executor="thread", verbose=True,
+              since=None, until=None):
+    model_dir = model_dir or os.path.dirname(os.path.abspath(__file__))
+    wall_start = time.perf_counter()
+
+    # Load and split once
+    if since is not None or until is not None:
+        # a time window of the ingested observations instead of the CSV
+        from observation_store import get_observation_store
+        data = get_observation_store().read(COLUMNS, since, until).to_numpy(dtype=np.float64)
+        if len(data) == 0:
+            raise ValueError("No observations between %s and %s" % (since, until))
+    else:
+        data = read_dataset(data_path, COLUMNS, narrow=False).to_numpy(dtype=np.float64)
+    train_idx, test_idx = split_indices(len(data))
+    train, test = data[train_idx], data[test_idx]
+    del data
+
+    results = fit_models(train, test, workers, executor)
+
+    (linear_model, linear_metrics), _ = results["linear"]
+    (rain_model, rain_metrics, rain_confusion), _ = results["rain"]
+    (cloud_model, cloud_metrics, cloud_confusion), _ = results["cloud"]
+
+    write_artifacts({
+        PICKLE_FILES["linear"]: linear_model,
+        PICKLE_FILES["linear_metrics"]: linear_metrics,
+        PICKLE_FILES["rain"]: rain_model,
+        PICKLE_FILES["cloud"]: cloud_model,
+        PICKLE_FILES["logistic_metrics"]: rain_metrics,
+        PICKLE_FILES["logistic_confusion"]: rain_confusion,
+        PICKLE_FILES["cloud_metrics"]: cloud_metrics,
+        PICKLE_FILES["cloud_confusion"]: cloud_confusion,
+    }, model_dir)
+
+    # keep the compiled NumPy artifacts in sync with the new pickles
+    export_models(model_dir)
+
+    fit_seconds = {name: seconds for name, (_, seconds) in results.items()}
+    wall_seconds = time.perf_counter() - wall_start
+    if verbose:
+        print(f"All models trained on {len(train_idx)} rows, tested on {len(test_idx)} "
+              f"({executor} pool, {wall_seconds*1000:.1f} ms total)")
+        print(f"Linear Regression - RMSE: {linear_metrics['rmse']:.2f}, R² Score: {linear_metrics['r2_score']:.3f}")
+        print(f"Rain Model - Accuracy: {rain_metrics['accuracy']*100:.1f}%, F1 Score: {rain_metrics['f1_score']:.3f}")
+        print(f"Cloud Model - Accuracy: {cloud_metrics['accuracy']*100:.1f}%, F1 Score: {cloud_metrics['f1_score']:.3f}")
+        for name, seconds in fit_seconds.items():
+            print(f"  {name} fit time: {seconds*1000:.1f} ms")
+
+    return {
+        "linear": linear_model,
+        "rain": rain_model,
+        "cloud": cloud_model,
+        "linear_metrics": linear_metrics,
+        "logistic_metrics": rain_metrics,
+        "logistic_confusion": rain_confusion,
+        "cloud_metrics": cloud_metrics,
+        "cloud_confusion": cloud_confusion,
+        "fit_seconds": fit_seconds,
+        "wall_seconds": wall_seconds,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train all models from one parse and one split")
+    parser.add_argument("--data", help="dataset CSV (defaults to server/data/weather_dataset.csv)")
+    parser.add_argument("--model-dir", help="where to write the artifacts (defaults to this folder)")
+    parser.add_argument("--workers", type=int, default=min(3, os.cpu_count() or 1), help="models fitted concurrently")
+    parser.add_argument("--executor", choices=["thread", "process"], default="thread")
+    parser.add_argument("--since", help="train on ingested observations from this time (observation_store.py)")
+    parser.add_argument("--until", help="train on ingested observations before this time")
+    args = parser.parse_args()
+    train_all(args.data, args.model_dir, args.workers, args.executor, since=args.since, until=args.until)
@@ -11,22 +11,25 @@ from sklearn.linear_model import LinearRegression
 from sklearn.metrics import mean_squared_error, r2_score
 import joblib
 import os
+import sys
 
-def train_linear_regression():
-    # Load dataset
-    data_path = os.path.join(os.path.dirname(__file__), '..', 'data', 'weather_dataset.csv')
-    df = pd.read_csv(data_path)
-    
-    # Features and target
-    features = ['humidity', 'pressure', 'wind_speed', 'clouds']
-    X = df[features]
-    y = df['temperature']
-    
-    # Split data
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-    
+# --- make sure we can import dataset.py from the parent folder (server/) ---
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+# ---------------------------------------------------------------------------
+
+from dataset import read_dataset
+
+FEATURES = ['humidity', 'pressure', 'wind_speed', 'clouds']
+
+def fit_linear_regression(X_train, y_train, X_test, y_test, model=None):
+    """
+    Fit on the train split and score on the test split; returns (model, metrics).
+    `model` is an unfitted regressor to use instead of plain LinearRegression.
+    """
     # Train model
-    model = LinearRegression()
+    model = model if model is not None else LinearRegression()
     model.fit(X_train, y_train)
     
     # Make predictions
@@ -37,16 +40,37 @@ def train_linear_regression():
     rmse = np.sqrt(mse)
     r2 = r2_score(y_test, y_pred)
     
-    # Save model and metrics
-    model_dir = os.path.dirname(__file__)
-    joblib.dump(model, os.path.join(model_dir, 'linear_regression_model.pkl'))
-    
     metrics = {
         'mse': mse,
         'rmse': rmse,
         'r2_score': r2
     }
+    return model, metrics
+
+def train_linear_regression():
+    # Load dataset
+    data_path = os.path.join(os.path.dirname(__file__), '..', 'data', 'weather_dataset.csv')
+    # memory-mapped columns when convert_dataset.py has been run, the CSV otherwise
+    df = read_dataset(data_path, narrow=False)
+    
+    # Features and target
+    X = df[FEATURES]
+    y = df['temperature']
+    
+    # Split data
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    
+    model, metrics = fit_linear_regression(X_train, y_train, X_test, y_test)
+    rmse, mse, r2 = metrics['rmse'], metrics['mse'], metrics['r2_score']
+    
+    # Save model and metrics
+    model_dir = os.path.dirname(__file__)
+    joblib.dump(model, os.path.join(model_dir, 'linear_regression_model.pkl'))
     joblib.dump(metrics, os.path.join(model_dir, 'linear_regression_metrics.pkl'))
+
+    # keep the compiled NumPy artifacts in sync with the new pickles
+    from export_compiled import export_models
+    export_models(model_dir)
     
     print(f"Linear Regression Model Trained Successfully!")
     print(f"RMSE: {rmse:.2f}")
@@ -11,51 +11,69 @@ from sklearn.linear_model import LogisticRegression
 from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, confusion_matrix
 import joblib
 import os
+import sys
+
+# --- make sure we can import dataset.py from the parent folder (server/) ---
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+# ---------------------------------------------------------------------------
+
+from dataset import read_dataset
+
+FEATURES = ['temperature', 'humidity', 'pressure', 'wind_speed', 'clouds']
+
+def fit_logistic_classifier(X_train, y_train, X_test, y_test, model=None):
+    """
+    Fit one binary classifier and score it on the test split; returns (model, metrics, confusion).
+    `model` is an unfitted classifier to use instead of the default LogisticRegression.
+    """
+    model = model if model is not None else LogisticRegression(random_state=42, max_iter=1000)
+    model.fit(X_train, y_train)
+    y_pred = model.predict(X_test)
+    
+    metrics = {
+        'accuracy': accuracy_score(y_test, y_pred),
+        'precision': precision_score(y_test, y_pred, zero_division=0),
+        'recall': recall_score(y_test, y_pred, zero_division=0),
+        'f1_score': f1_score(y_test, y_pred, zero_division=0)
+    }
+    
+    cm = confusion_matrix(y_test, y_pred)
+    confusion = {
+        'true_positive': int(cm[1][1]) if cm.shape == (2, 2) else 0,
+        'true_negative': int(cm[0][0]) if cm.shape == (2, 2) else 0,
+        'false_positive': int(cm[0][1]) if cm.shape == (2, 2) else 0,
+        'false_negative': int(cm[1][0]) if cm.shape == (2, 2) else 0
+    }
+    return model, metrics, confusion
 
 def train_logistic_regression():
     # Load dataset
     data_path = os.path.join(os.path.dirname(__file__), '..', 'data', 'weather_dataset.csv')
-    df = pd.read_csv(data_path)
+    # memory-mapped columns when convert_dataset.py has been run, the CSV otherwise
+    df = read_dataset(data_path, narrow=False)
     
     # Features
-    features = ['temperature', 'humidity', 'pressure', 'wind_speed', 'clouds']
-    X = df[features]
+    X = df[FEATURES]
     
     # Train model for rain prediction
     y_rain = df['rain']
     X_train_rain, X_test_rain, y_train_rain, y_test_rain = train_test_split(
         X, y_rain, test_size=0.2, random_state=42
     )
-    
-    rain_model = LogisticRegression(random_state=42, max_iter=1000)
-    rain_model.fit(X_train_rain, y_train_rain)
-    y_pred_rain = rain_model.predict(X_test_rain)
+    rain_model, rain_metrics, rain_confusion = fit_logistic_classifier(
+        X_train_rain, y_train_rain, X_test_rain, y_test_rain
+    )
     
     # Train model for cloudiness prediction
     y_cloudiness = df['cloudiness']
     X_train_cloud, X_test_cloud, y_train_cloud, y_test_cloud = train_test_split(
         X, y_cloudiness, test_size=0.2, random_state=42
     )
-    
-    cloud_model = LogisticRegression(random_state=42, max_iter=1000)
-    cloud_model.fit(X_train_cloud, y_train_cloud)
-    y_pred_cloud = cloud_model.predict(X_test_cloud)
-    
-    # Calculate metrics for rain model
-    rain_metrics = {
-        'accuracy': accuracy_score(y_test_rain, y_pred_rain),
-        'precision': precision_score(y_test_rain, y_pred_rain, zero_division=0),
-        'recall': recall_score(y_test_rain, y_pred_rain, zero_division=0),
-        'f1_score': f1_score(y_test_rain, y_pred_rain, zero_division=0)
-    }
-    
-    rain_cm = confusion_matrix(y_test_rain, y_pred_rain)
-    rain_confusion = {
-        'true_positive': int(rain_cm[1][1]) if rain_cm.shape == (2, 2) else 0,
-        'true_negative': int(rain_cm[0][0]) if rain_cm.shape == (2, 2) else 0,
-        'false_positive': int(rain_cm[0][1]) if rain_cm.shape == (2, 2) else 0,
-        'false_negative': int(rain_cm[1][0]) if rain_cm.shape == (2, 2) else 0
-    }
+    cloud_model, cloud_metrics, cloud_confusion = fit_logistic_classifier(
+        X_train_cloud, y_train_cloud, X_test_cloud, y_test_cloud
+    )
     
     # Save models and metrics
     model_dir = os.path.dirname(__file__)
@@ -63,6 +81,12 @@ def train_logistic_regression():
     joblib.dump(cloud_model, os.path.join(model_dir, 'logistic_cloud_model.pkl'))
     joblib.dump(rain_metrics, os.path.join(model_dir, 'logistic_metrics.pkl'))
     joblib.dump(rain_confusion, os.path.join(model_dir, 'logistic_confusion.pkl'))
+    joblib.dump(cloud_metrics, os.path.join(model_dir, 'logistic_cloud_metrics.pkl'))
+    joblib.dump(cloud_confusion, os.path.join(model_dir, 'logistic_cloud_confusion.pkl'))
+
+    # keep the compiled NumPy artifacts in sync with the new pickles
+    from export_compiled import export_models
+    export_models(model_dir)
     
     print(f"Logistic Regression Models Trained Successfully!")
     print(f"Rain Model - Accuracy: {rain_metrics['accuracy']*100:.1f}%")
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Per-Station Training
+Fits the temperature, rain and cloudiness models separately for every station
+(or region) of a dataset with a station key column and writes them as the
+sharded bundles served by station_models.py.
+
+The dataset is parsed once and sorted by station, so each station's rows are
+one contiguous slice of a single matrix. That matrix is written to a .npy
+file which the pool processes memory-map; each task fits every station of one
+shard (same split and fitters as train_all.py) and writes that shard's
+bundle, so shards are built in parallel. Stations with fewer than --min-rows
+rows, and classifiers whose training rows hold a single class, get no models
+of their own and keep using the global ones.
+
+The new stations/ folder is built next to the old one and swapped in when
+complete.
+
+Usage: train_stations.py --data PATH [--key station] [--model-dir DIR]
+                         [--shards N] [--workers N] [--min-rows N]
+"""
+
+import os
+import sys
+import time
+import json
+import shutil
+import argparse
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+# --- make sure we can import predict.py / dataset.py from the parent folder (server/) ---
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+# ---------------------------------------------------------------------------------------
+
+import numpy as np
+
+from dataset import read_dataset
+from compiled import compile_model, save_bundle, save_json
+from station_models import DEFAULT_SHARDS, INDEX_NAME, STATIONS_DIR, member_name, shard_name, shard_of
+from train_all import COLUMNS, MODEL_JOBS, _fit_model, split_indices
+
+DEFAULT_MIN_ROWS = 20
+
+
+def load_sorted(data_path, key="station"):
+    """(stations, starts, counts, matrix): the COLUMNS matrix sorted by station, and each station's slice."""
+    try:
+        df = read_dataset(data_path, COLUMNS + [key], narrow=False)
+    except (KeyError, ValueError) as e:
+        raise ValueError("Dataset needs the columns %s plus a %r key column (%s)" % (COLUMNS, key, e))
+    keys = df[key].astype(str).to_numpy()
+    order = np.argsort(keys, kind="stable")
+    stations, starts, counts = np.unique(keys[order], return_index=True, return_counts=True)
+    matrix = df[COLUMNS].to_numpy(dtype=np.float64)[order]
+    return stations, starts, counts, matrix
+
+
+def fit_station(rows):
+    """{artifact key: compiled model or metrics dict} for one station's (n, len(COLUMNS)) rows."""
+    train_idx, test_idx = split_indices(len(rows))
+    train, test = rows[train_idx], rows[test_idx]
+    artifacts = {}
+    (model, metrics), _ = _fit_model("linear", train, test)
+    artifacts["linear"] = compile_model(model, MODEL_JOBS["linear"][1])
+    artifacts["linear_metrics"] = metrics
+    for name in ("rain", "cloud"):
+        try:
+            (model, metrics, confusion), _ = _fit_model(name, train, test)
+        except ValueError:
+            # one class only in this station's training rows
+            continue
+        artifacts[name] = compile_model(model, MODEL_JOBS[name][1])
+        prefix = "logistic" if name == "rain" else "cloud"
+        artifacts[prefix + "_metrics"] = metrics
+        artifacts[prefix + "_confusion"] = confusion
+    return artifacts
+
+
+def _fit_shard(shard, members, shared_dir, out_dir):
+    # runs in a pool process: attach to the sorted matrix read-only
+    data = np.load(os.path.join(shared_dir, "data.npy"), mmap_mode="r")
+    models, metrics, fitted = {}, {}, {}
+    for station, start, count in members:
+        artifacts = fit_station(np.asarray(data[start:start + count]))
+        for key, value in artifacts.items():
+            target = metrics if isinstance(value, dict) else models
+            target[member_name(station, key)] = value
+        fitted[station] = {"shard": shard, "rows": int(count),
+                           "models": [k for k, v in artifacts.items() if not isinstance(v, dict)]}
+    save_bundle(os.path.join(out_dir, shard_name(shard)), models, metrics)
+    return fitted
+
+
+def _swap_in(staging, target):
+    """Replace `target` with the finished `staging` folder."""
+    old = None
+    if os.path.exists(target):
+        old = target + ".old-%d" % os.getpid()
+        os.rename(target, old)
+    os.rename(staging, target)
+    if old:
+        shutil.rmtree(old, ignore_errors=True)
+
+
+def train_stations(data_path, key="station", model_dir=None, n_shards=DEFAULT_SHARDS,
+                   workers=None, min_rows=DEFAULT_MIN_ROWS, verbose=True):
+    model_dir = model_dir or os.path.dirname(os.path.abspath(__file__))
+    wall_start = time.perf_counter()
+
+    stations, starts, counts, matrix = load_sorted(data_path, key)
+    shards = {}
+    skipped = 0
+    for station, start, count in zip(stations.tolist(), starts.tolist(), counts.tolist()):
+        if count < min_rows:
+            skipped += 1
+            continue
+        shards.setdefault(shard_of(station, n_shards), []).append((station, start, count))
+
+    target = os.path.join(model_dir, STATIONS_DIR)
+    staging = tempfile.mkdtemp(prefix=".%s-" % STATIONS_DIR, dir=model_dir)
+    shared_dir = tempfile.mkdtemp(prefix="weather-stations-")
+    try:
+        np.save(os.path.join(shared_dir, "data.npy"), matrix)
+        del matrix
+        fitted = {}
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1) as pool:
+            futures = [pool.submit(_fit_shard, shard, members, shared_dir, staging)
+                       for shard, members in sorted(shards.items())]
+            for f in futures:
+                fitted.update(f.result())
+        save_json({"n_shards": n_shards, "key": key, "stations": fitted}, os.path.join(staging, INDEX_NAME))
+        _swap_in(staging, target)
+    finally:
+        shutil.rmtree(shared_dir, ignore_errors=True)
+        shutil.rmtree(staging, ignore_errors=True)
+
+    wall_seconds = time.perf_counter() - wall_start
+    summary = {
+        "stations": len(fitted),
+        "skipped_stations": skipped,
+        "shards": len(shards),
+        "wall_seconds": wall_seconds,
+        "path": target,
+    }
+    if verbose:
+        print(f"Trained {len(fitted)} stations into {len(shards)} shards "
+              f"({skipped} below {min_rows} rows use the global models, {wall_seconds*1000:.1f} ms total)")
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train per-station models into sharded bundles")
+    parser.add_argument("--data", required=True, help="dataset CSV with a station key column")
+    parser.add_argument("--key", default="station", help="station/region column (default: station)")
+    parser.add_argument("--model-dir", help="folder holding the global artifacts (defaults to this folder)")
+    parser.add_argument("--shards", type=int, default=DEFAULT_SHARDS, help="number of shard bundles")
+    parser.add_argument("--workers", type=int, help="shards trained concurrently (default: cpu count)")
+    parser.add_argument("--min-rows", type=int, default=DEFAULT_MIN_ROWS,
+                        help="stations with fewer rows keep the global models")
+    parser.add_argument("--json", action="store_true", help="print the summary as JSON")
+    args = parser.parse_args()
+    summary = train_stations(args.data, args.key, args.model_dir, args.shards, args.workers,
+                             args.min_rows, verbose=not args.json)
+    if args.json:
+        print(json.dumps(summary))
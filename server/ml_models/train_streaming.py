@@ -0,0 +1,469 @@
+#!/usr/bin/env python3
+"""
+Streaming Model Training Script
+Trains the temperature, rain and cloudiness models from the dataset in
+fixed-size chunks, so memory stays flat however large the CSV grows.
+
+- Linear regression: accumulates the sufficient statistics XᵀX and Xᵀy (with
+  an intercept column) and solves the normal equations once at the end. Test
+  MSE/R² come exactly from the test-split statistics, without a second pass.
+- Logistic regression: SGDClassifier(loss="log_loss") fitted with partial_fit
+  on standardised features (moments from the first pass), then folded back
+  into plain coef_/intercept_ on the raw features.
+
+Rows are assigned to the 20% test split by a seeded RNG, chunk by chunk.
+The resulting models are saved in the same pickle format as the in-memory
+training scripts, so predict.py serves them unchanged.
+
+Training also saves its reusable state next to the models
+(training_state.pkl): both sets of linear sufficient statistics, the
+classifiers' scaler and SGD state, the running test confusion counts, the
+split RNG position and a fingerprint of the dataset. `update` folds only the
+rows appended to the CSV since then into that state — the least-squares
+solution and its test metrics are exactly those of a full retrain, the
+classifiers continue their partial_fit on the new rows (the scaler stays
+fixed), and the confusion counts add the new test rows scored by the updated
+models. When the state doesn't match the dataset or the model artifacts
+(rewritten CSV, models retrained by another script, no state yet) update
+falls back to a full run.
+
+Usage: train_streaming.py [train|update] [--chunksize 200000] [--epochs 5] [--data PATH] [--model-dir DIR]
+"""
+
+import os
+import sys
+import argparse
+
+# --- make sure we can import dataset.py from the parent folder (server/) ---
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+# ---------------------------------------------------------------------------
+
+import numpy as np
+import joblib
+
+from dataset import (TEMP_FEATURES, WEATHER_FEATURES, LABELS, DEFAULT_CHUNKSIZE, _dtypes_for,
+                     find_dataset_path, iter_chunks)
+from compiled import file_sha256
+from stats_cache import _fingerprint, _is_append_of
+
+TEST_SIZE = 0.2
+RANDOM_STATE = 42
+
+STATE_NAME = "training_state.pkl"
+STATE_VERSION = 1
+
+ARTIFACTS = {
+    "linear": "linear_regression_model.pkl",
+    "linear_metrics": "linear_regression_metrics.pkl",
+    "rain": "logistic_rain_model.pkl",
+    "cloud": "logistic_cloud_model.pkl",
+    "logistic_metrics": "logistic_metrics.pkl",
+    "logistic_confusion": "logistic_confusion.pkl",
+    "cloud_metrics": "logistic_cloud_metrics.pkl",
+    "cloud_confusion": "logistic_cloud_confusion.pkl",
+}
+MODEL_ARTIFACTS = ("linear", "rain", "cloud")
+CONFUSION_KEYS = ('true_positive', 'true_negative', 'false_positive', 'false_negative')
+
+
+def _split_masks(n_rows, rng):
+    is_test = rng.random(n_rows) < TEST_SIZE
+    return ~is_test, is_test
+
+
+def _split_rng(state=None):
+    """The split RNG, fresh or resumed from a saved bit_generator.state."""
+    rng = np.random.default_rng(RANDOM_STATE)
+    if state is not None:
+        rng.bit_generator.state = state
+    return rng
+
+
+def _chunks_with_split(path, chunksize, rng=None):
+    """Yield (chunk, train_mask, test_mask) with the same split on every pass."""
+    rng = rng if rng is not None else _split_rng()
+    for chunk in iter_chunks(path, chunksize, WEATHER_FEATURES + LABELS, narrow=False):
+        train, test = _split_masks(len(chunk), rng)
+        yield chunk, train, test
+
+
+def _appended_chunks(path, offset, header, chunksize, rng):
+    """Like _chunks_with_split, for the rows after byte `offset` of the CSV (the split continues)."""
+    import pandas as pd
+    with open(path, "rb") as f:
+        f.seek(offset)
+        # float64, like full passes over the CSV or a full-precision columnar copy,
+        # so updated statistics match a full run
+        with pd.read_csv(f, header=None, names=header, usecols=WEATHER_FEATURES + LABELS,
+                         dtype=_dtypes_for(WEATHER_FEATURES + LABELS, narrow=False),
+                         chunksize=chunksize) as reader:
+            for chunk in reader:
+                train, test = _split_masks(len(chunk), rng)
+                yield chunk, train, test
+
+
+class LinearSufficientStats:
+    """Running XᵀX, Xᵀy, yᵀy and Σy for y ~ [1, X]."""
+
+    def __init__(self, n_features):
+        k = n_features + 1
+        self.xtx = np.zeros((k, k))
+        self.xty = np.zeros(k)
+        self.yty = 0.0
+        self.y_sum = 0.0
+        self.n = 0
+
+    def update(self, X, y):
+        X = np.asarray(X, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        A = np.column_stack((np.ones(len(X)), X))
+        self.xtx += A.T @ A
+        self.xty += A.T @ y
+        self.yty += float(y @ y)
+        self.y_sum += float(y.sum())
+        self.n += len(y)
+
+    def to_dict(self):
+        return {"xtx": self.xtx, "xty": self.xty, "yty": self.yty, "y_sum": self.y_sum, "n": self.n}
+
+    @classmethod
+    def from_dict(cls, d):
+        stats = cls(len(d["xty"]) - 1)
+        stats.xtx, stats.xty = np.array(d["xtx"]), np.array(d["xty"])
+        stats.yty, stats.y_sum, stats.n = d["yty"], d["y_sum"], d["n"]
+        return stats
+
+    def solve(self):
+        """(intercept, coef) of the least-squares fit."""
+        beta = np.linalg.lstsq(self.xtx, self.xty, rcond=None)[0]
+        return float(beta[0]), beta[1:]
+
+    def evaluate(self, intercept, coef):
+        """MSE and R² of the given fit on the rows these statistics describe."""
+        beta = np.concatenate(([intercept], coef))
+        sse = self.yty - 2.0 * beta @ self.xty + beta @ self.xtx @ beta
+        mse = max(float(sse), 0.0) / self.n
+        sst = self.yty - self.y_sum ** 2 / self.n
+        r2 = 1.0 - float(sse) / sst if sst > 0 else float("nan")
+        return mse, r2
+
+
+class RunningMoments:
+    """Column means/stds via Chan's parallel update (numerically stable)."""
+
+    def __init__(self, n_features):
+        self.n = 0
+        self.mean = np.zeros(n_features)
+        self.m2 = np.zeros(n_features)
+
+    def update(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        if len(X) == 0:
+            return
+        n_b = len(X)
+        mean_b = X.mean(axis=0)
+        m2_b = ((X - mean_b) ** 2).sum(axis=0)
+        n = self.n + n_b
+        delta = mean_b - self.mean
+        self.mean = self.mean + delta * n_b / n
+        self.m2 = self.m2 + m2_b + delta ** 2 * self.n * n_b / n
+        self.n = n
+
+    @property
+    def std(self):
+        std = np.sqrt(self.m2 / max(self.n, 1))
+        return np.where(std > 0, std, 1.0)
+
+
+def confusion_counts(y_true, y_pred):
+    y_true = np.asarray(y_true).astype(bool)
+    y_pred = np.asarray(y_pred).astype(bool)
+    return {
+        'true_positive': int(np.count_nonzero(y_true & y_pred)),
+        'true_negative': int(np.count_nonzero(~y_true & ~y_pred)),
+        'false_positive': int(np.count_nonzero(~y_true & y_pred)),
+        'false_negative': int(np.count_nonzero(y_true & ~y_pred))
+    }
+
+
+def metrics_from_confusion(cm):
+    tp, tn, fp, fn = cm['true_positive'], cm['true_negative'], cm['false_positive'], cm['false_negative']
+    total = tp + tn + fp + fn
+    precision = tp / (tp + fp) if tp + fp else 0.0
+    recall = tp / (tp + fn) if tp + fn else 0.0
+    return {
+        'accuracy': (tp + tn) / total if total else 0.0,
+        'precision': precision,
+        'recall': recall,
+        'f1_score': 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    }
+
+
+def make_linear_model(intercept, coef, features):
+    """A fitted-looking LinearRegression carrying the given parameters."""
+    from sklearn.linear_model import LinearRegression
+    model = LinearRegression()
+    model.coef_ = np.asarray(coef, dtype=np.float64)
+    model.intercept_ = float(intercept)
+    model.feature_names_in_ = np.asarray(features, dtype=object)
+    model.n_features_in_ = len(features)
+    return model
+
+
+def make_logistic_model(intercept, coef, features, classes=(0, 1)):
+    """A fitted-looking LogisticRegression carrying the given parameters."""
+    from sklearn.linear_model import LogisticRegression
+    model = LogisticRegression(random_state=RANDOM_STATE, max_iter=1000)
+    model.coef_ = np.asarray(coef, dtype=np.float64).reshape(1, -1)
+    model.intercept_ = np.asarray([intercept], dtype=np.float64)
+    model.classes_ = np.asarray(classes)
+    model.feature_names_in_ = np.asarray(features, dtype=object)
+    model.n_features_in_ = len(features)
+    return model
+
+
+def _unscale(clf, mean, std):
+    """Fold standardisation into the coefficients: w·(x-μ)/σ + b == (w/σ)·x + (b - Σ wμ/σ)."""
+    w = clf.coef_[0] / std
+    b = float(clf.intercept_[0] - np.sum(clf.coef_[0] * mean / std))
+    return b, w
+
+
+def _csv_header(path):
+    import pandas as pd
+    return list(pd.read_csv(path, nrows=0).columns)
+
+
+def _score_test_rows(confusion, chunk, test, logistic_models):
+    """Add the confusion counts of this chunk's test rows to `confusion` ({label: counts})."""
+    if not test.any():
+        return
+    X = chunk[WEATHER_FEATURES].to_numpy(dtype=np.float64)[test]
+    for label, model in logistic_models.items():
+        pred = (X @ model.coef_[0] + model.intercept_[0]) > 0
+        for k, v in confusion_counts(chunk[label].to_numpy()[test], pred).items():
+            confusion[label][k] += v
+
+
+def _fit_classifiers(classifiers, chunks, mean, std):
+    classes = np.array([0, 1])
+    for chunk, train, _test in chunks:
+        if not train.any():
+            continue
+        Xs = (chunk[WEATHER_FEATURES].to_numpy(dtype=np.float64)[train] - mean) / std
+        for label, clf in classifiers.items():
+            clf.partial_fit(Xs, chunk[label].to_numpy()[train], classes=classes)
+
+
+def _linear_outputs(lin_train, lin_test):
+    intercept, coef = lin_train.solve()
+    mse, r2 = lin_test.evaluate(intercept, coef)
+    return make_linear_model(intercept, coef, TEMP_FEATURES), {'mse': mse, 'rmse': float(np.sqrt(mse)), 'r2_score': r2}
+
+
+def _logistic_outputs(classifiers, mean, std):
+    models = {}
+    for label, clf in classifiers.items():
+        b, w = _unscale(clf, mean, std)
+        models[label] = make_logistic_model(b, w, WEATHER_FEATURES)
+    return models
+
+
+def _write_outputs(model_dir, linear_model, linear_metrics, logistic_models, confusion):
+    rain_metrics = metrics_from_confusion(confusion['rain'])
+    joblib.dump(linear_model, os.path.join(model_dir, ARTIFACTS['linear']))
+    joblib.dump(linear_metrics, os.path.join(model_dir, ARTIFACTS['linear_metrics']))
+    joblib.dump(logistic_models['rain'], os.path.join(model_dir, ARTIFACTS['rain']))
+    joblib.dump(logistic_models['cloudiness'], os.path.join(model_dir, ARTIFACTS['cloud']))
+    joblib.dump(rain_metrics, os.path.join(model_dir, ARTIFACTS['logistic_metrics']))
+    joblib.dump(confusion['rain'], os.path.join(model_dir, ARTIFACTS['logistic_confusion']))
+    joblib.dump(metrics_from_confusion(confusion['cloudiness']), os.path.join(model_dir, ARTIFACTS['cloud_metrics']))
+    joblib.dump(confusion['cloudiness'], os.path.join(model_dir, ARTIFACTS['cloud_confusion']))
+
+    # keep the compiled NumPy artifacts in sync with the new pickles
+    from export_compiled import export_models
+    export_models(model_dir)
+    return rain_metrics
+
+
+def _save_state(model_dir, data_path, header, split_state, lin_train, lin_test, mean, std, classifiers, confusion):
+    state = {
+        "version": STATE_VERSION,
+        "data_path": os.path.abspath(data_path),
+        "fingerprint": _fingerprint(data_path),
+        "header": header,
+        "split_rng": split_state,
+        "linear": {"train": lin_train.to_dict(), "test": lin_test.to_dict()},
+        "scaler": {"mean": mean, "std": std},
+        "classifiers": classifiers,
+        "confusion": confusion,
+        # which models this state produced: a retrain by another script invalidates it
+        # (metrics alone may be rewritten, e.g. by evaluate.py)
+        "artifacts": {name: file_sha256(os.path.join(model_dir, ARTIFACTS[name])) for name in MODEL_ARTIFACTS},
+    }
+    tmp = os.path.join(model_dir, ".%s.tmp-%d" % (STATE_NAME, os.getpid()))
+    joblib.dump(state, tmp)
+    os.replace(tmp, os.path.join(model_dir, STATE_NAME))
+
+
+def load_state(model_dir, data_path):
+    """(saved state, None) when update can use it, else (None, why not)."""
+    path = os.path.join(model_dir, STATE_NAME)
+    if not os.path.exists(path):
+        return None, "no saved training state"
+    try:
+        state = joblib.load(path)
+    except Exception as e:
+        return None, "unreadable training state (%s)" % e
+    if state.get("version") != STATE_VERSION:
+        return None, "training state has an old format"
+    if state["data_path"] != os.path.abspath(data_path):
+        return None, "training state belongs to " + state["data_path"]
+    for name, sha in state["artifacts"].items():
+        artifact = os.path.join(model_dir, ARTIFACTS[name])
+        if not os.path.exists(artifact) or file_sha256(artifact) != sha:
+            return None, "%s changed since the last streaming run" % ARTIFACTS[name]
+    return state, None
+
+
+def train_streaming(data_path=None, chunksize=DEFAULT_CHUNKSIZE, epochs=5, model_dir=None, verbose=True):
+    from sklearn.linear_model import SGDClassifier
+
+    model_dir = model_dir or os.path.dirname(os.path.abspath(__file__))
+    data_path = data_path or find_dataset_path()
+    fingerprint = _fingerprint(data_path)
+
+    # Pass 1: linear sufficient statistics + feature moments for the classifiers
+    lin_train = LinearSufficientStats(len(TEMP_FEATURES))
+    lin_test = LinearSufficientStats(len(TEMP_FEATURES))
+    moments = RunningMoments(len(WEATHER_FEATURES))
+    split_rng = _split_rng()
+    for chunk, train, test in _chunks_with_split(data_path, chunksize, split_rng):
+        X_lin = chunk[TEMP_FEATURES].to_numpy()
+        y_lin = chunk['temperature'].to_numpy()
+        lin_train.update(X_lin[train], y_lin[train])
+        lin_test.update(X_lin[test], y_lin[test])
+        moments.update(chunk[WEATHER_FEATURES].to_numpy()[train])
+
+    if lin_train.n == 0 or lin_test.n == 0:
+        raise ValueError("Not enough rows to build a train/test split")
+
+    linear_model, linear_metrics = _linear_outputs(lin_train, lin_test)
+
+    # Passes 2..epochs+1: incremental logistic fits on standardised features
+    mean, std = moments.mean, moments.std
+    classifiers = {
+        label: SGDClassifier(loss="log_loss", alpha=1e-4, random_state=RANDOM_STATE)
+        for label in LABELS
+    }
+    for _ in range(epochs):
+        _fit_classifiers(classifiers, _chunks_with_split(data_path, chunksize), mean, std)
+    logistic_models = _logistic_outputs(classifiers, mean, std)
+
+    # Final pass: confusion counts on the test rows
+    confusion = {label: dict.fromkeys(CONFUSION_KEYS, 0) for label in LABELS}
+    for chunk, _train, test in _chunks_with_split(data_path, chunksize):
+        _score_test_rows(confusion, chunk, test, logistic_models)
+
+    rain_metrics = _write_outputs(model_dir, linear_model, linear_metrics, logistic_models, confusion)
+    _save_state(model_dir, data_path, _csv_header(data_path), split_rng.bit_generator.state,
+                lin_train, lin_test, mean, std, classifiers, confusion)
+    if _fingerprint(data_path) != fingerprint:
+        # rows arrived mid-run; the state no longer describes a prefix we fully read
+        os.unlink(os.path.join(model_dir, STATE_NAME))
+
+    if verbose:
+        print(f"Streaming training finished on {lin_train.n + lin_test.n} rows")
+        print(f"Linear - RMSE: {linear_metrics['rmse']:.2f}, R² Score: {linear_metrics['r2_score']:.3f}")
+        print(f"Rain Model - Accuracy: {rain_metrics['accuracy']*100:.1f}%, F1 Score: {rain_metrics['f1_score']:.3f}")
+        cloud_metrics = metrics_from_confusion(confusion['cloudiness'])
+        print(f"Cloud Model - Accuracy: {cloud_metrics['accuracy']*100:.1f}%")
+
+    return linear_model, logistic_models['rain'], logistic_models['cloudiness'], linear_metrics, rain_metrics
+
+
+def update_streaming(data_path=None, chunksize=DEFAULT_CHUNKSIZE, epochs=5, model_dir=None, verbose=True):
+    """
+    Fold the rows appended since the last train/update into the saved state and
+    refresh the models and metrics; a full train_streaming() run when the state
+    can't be used. Returns what train_streaming() returns.
+    """
+    model_dir = model_dir or os.path.dirname(os.path.abspath(__file__))
+    data_path = data_path or find_dataset_path()
+    state, reason = load_state(model_dir, data_path)
+    size = os.stat(data_path).st_size
+    if state is not None:
+        old = state["fingerprint"]
+        if size == old["size"] and _fingerprint(data_path) == old:
+            reason = "up to date"
+        elif not _is_append_of(data_path, old, size):
+            state, reason = None, "the dataset was rewritten, not appended to"
+    if state is None:
+        if verbose:
+            print(f"Full training run: {reason}")
+        return train_streaming(data_path, chunksize, epochs, model_dir, verbose)
+
+    offset = state["fingerprint"]["size"]
+    fingerprint = _fingerprint(data_path)
+    lin_train = LinearSufficientStats.from_dict(state["linear"]["train"])
+    lin_test = LinearSufficientStats.from_dict(state["linear"]["test"])
+    mean, std = state["scaler"]["mean"], state["scaler"]["std"]
+    classifiers, confusion = state["classifiers"], state["confusion"]
+    if reason == "up to date":
+        linear_model, linear_metrics = _linear_outputs(lin_train, lin_test)
+        logistic_models = _logistic_outputs(classifiers, mean, std)
+        if verbose:
+            print("Models are up to date with the dataset")
+        return (linear_model, logistic_models['rain'], logistic_models['cloudiness'],
+                linear_metrics, metrics_from_confusion(confusion['rain']))
+
+    # only the appended bytes are read, once per pass; every pass resumes the
+    # split RNG where the last run stopped, so the rows split as in a full run
+    header, start = state["header"], state["split_rng"]
+
+    def appended():
+        return _appended_chunks(data_path, offset, header, chunksize, _split_rng(start))
+
+    split_rng = _split_rng(start)
+    new_rows = 0
+    for chunk, train, test in _appended_chunks(data_path, offset, header, chunksize, split_rng):
+        X_lin = chunk[TEMP_FEATURES].to_numpy()
+        y_lin = chunk['temperature'].to_numpy()
+        lin_train.update(X_lin[train], y_lin[train])
+        lin_test.update(X_lin[test], y_lin[test])
+        new_rows += len(chunk)
+    linear_model, linear_metrics = _linear_outputs(lin_train, lin_test)
+
+    for _ in range(epochs):
+        _fit_classifiers(classifiers, appended(), mean, std)
+    logistic_models = _logistic_outputs(classifiers, mean, std)
+    for chunk, _train, test in appended():
+        _score_test_rows(confusion, chunk, test, logistic_models)
+
+    rain_metrics = _write_outputs(model_dir, linear_model, linear_metrics, logistic_models, confusion)
+    _save_state(model_dir, data_path, header, split_rng.bit_generator.state,
+                lin_train, lin_test, mean, std, classifiers, confusion)
+    if _fingerprint(data_path) != fingerprint:
+        os.unlink(os.path.join(model_dir, STATE_NAME))
+
+    if verbose:
+        print(f"Updated with {new_rows} new rows ({lin_train.n + lin_test.n} in total)")
+        print(f"Linear - RMSE: {linear_metrics['rmse']:.2f}, R² Score: {linear_metrics['r2_score']:.3f}")
+        print(f"Rain Model - Accuracy: {rain_metrics['accuracy']*100:.1f}%, F1 Score: {rain_metrics['f1_score']:.3f}")
+
+    return linear_model, logistic_models['rain'], logistic_models['cloudiness'], linear_metrics, rain_metrics
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Chunked, constant-memory training of all three models")
+    parser.add_argument("command", nargs="?", choices=["train", "update"], default="train",
+                        help="update folds only the rows appended since the last run into the saved state")
+    parser.add_argument("--data", help="dataset CSV (defaults to server/data/weather_dataset.csv)")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument("--epochs", type=int, default=5, help="passes of partial_fit for the classifiers")
+    parser.add_argument("--model-dir", help="where to write the artifacts (defaults to this folder)")
+    args = parser.parse_args()
+    run = update_streaming if args.command == "update" else train_streaming
+    run(args.data, args.chunksize, args.epochs, args.model_dir)
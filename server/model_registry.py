@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""
+In-process registry of model/metric artifacts.
+
+Each artifact is unpickled lazily on first use and kept in memory. Later
+accesses only stat() the file; the artifact is reloaded when its mtime/size
+changes *and* its content hash differs, so a retrain can swap models without
+restarting long-running processes.
+
+An artifact may list several candidate files (e.g. a compiled .npz before its
+.pkl). A derived candidate is only used while the registry manifest in its
+directory says it was exported from the current bytes of the last (source)
+candidate; otherwise the registry falls back to the source file. The manifest
+is parsed once per change, and a source whose size and mtime still match the
+ones recorded at export isn't read at all (otherwise its hash is computed
+once per stat signature).
+
+A candidate "file#member" names one member of a multi-artifact file (the
+model bundle): the file is loaded once for all its members and the loaded
+object is indexed with the member name.
+
+Keys listed as `optional` may be absent: load_all() skips them and
+version() counts them as missing instead of failing.
+"""
+
+import os
+import json
+import hashlib
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple, Union
+
+import instrumentation
+
+
+def _file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _split_member(name: str) -> Tuple[str, Optional[str]]:
+    path, sep, member = name.partition("#")
+    return path, (member if sep else None)
+
+
+def _stat_sig(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+class _Entry:
+    __slots__ = ("path", "deps", "sha256", "value", "checked_at")
+
+    def __init__(self, path: str, deps: Dict[str, Optional[Tuple[int, int]]], sha256: str, value: Any):
+        self.path = path
+        # stat signatures of every file that influenced the choice of `path`
+        self.deps = deps
+        self.sha256 = sha256
+        self.value = value
+        self.checked_at = time.monotonic()
+
+    def unchanged(self) -> bool:
+        return all(_stat_sig(p) == sig for p, sig in self.deps.items())
+
+
+class ModelRegistry:
+    """
+    Lazy, mtime-aware cache of model/metric artifacts.
+
+    Behaves like a read-only mapping (``registry['linear']``,
+    ``registry.get('linear_metrics', {})``) so it can be passed wherever the
+    dict returned by ``load_models()`` was used.
+    """
+
+    def __init__(self,
+                 files: Dict[str, Union[str, Tuple[str, ...]]],
+                 search_dirs: Callable[[], Iterable[str]],
+                 loader: Optional[Callable[[str], Any]] = None,
+                 check_interval: float = 0.0,
+                 log: Optional[Callable[[str], None]] = None,
+                 loaders: Optional[Dict[str, Callable[[str], Any]]] = None,
+                 manifest_name: Optional[str] = None,
+                 optional: Iterable[str] = ()):
+        self.files = {k: (v,) if isinstance(v, str) else tuple(v) for k, v in files.items()}
+        self.optional = frozenset(optional)
+        self._search_dirs_fn = search_dirs
+        self._search_dirs: Optional[list] = None
+        self._loader = loader
+        # per-extension loaders, e.g. {".npz": compiled.load_model}
+        self._loaders = dict(loaders or {})
+        self.manifest_name = manifest_name
+        self.check_interval = check_interval
+        self._log = log
+        self._entries: Dict[str, _Entry] = {}
+        # multi-member files: path -> (stat signature, sha256, loaded object)
+        self._shared: Dict[str, Tuple[Optional[Tuple[int, int]], str, Any]] = {}
+        # absent optional keys: key -> (search dir signatures when last looked for, error)
+        self._missing: Dict[str, Tuple[Dict[str, Any], str]] = {}
+        # path -> (stat signature, parsed manifest / sha256), so unchanged files aren't read again
+        self._manifests: Dict[str, Tuple[Optional[Tuple[int, int]], Dict[str, Any]]] = {}
+        self._hashes: Dict[str, Tuple[Optional[Tuple[int, int]], str]] = {}
+        self._lock = threading.RLock()
+
+    # -- path resolution -------------------------------------------------
+    def search_dirs(self) -> list:
+        if self._search_dirs is None:
+            self._search_dirs = list(self._search_dirs_fn())
+        return self._search_dirs
+
+    def _read_manifest(self, d: str, deps: Dict[str, Any]) -> Dict[str, Any]:
+        if not self.manifest_name:
+            return {}
+        path = os.path.join(d, self.manifest_name)
+        sig = _stat_sig(path)
+        deps[path] = sig
+        cached = self._manifests.get(path)
+        if cached is not None and cached[0] == sig:
+            return cached[1]
+        try:
+            with open(path) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            manifest = {}
+        self._manifests[path] = (sig, manifest)
+        return manifest
+
+    def _sha256(self, path: str, sig: Optional[Tuple[int, int]] = None) -> str:
+        sig = _stat_sig(path) if sig is None else sig
+        cached = self._hashes.get(path)
+        if cached is not None and cached[0] == sig:
+            return cached[1]
+        sha = _file_sha256(path)
+        self._hashes[path] = (sig, sha)
+        return sha
+
+    def _exported_from(self, record: Dict[str, Any], source_path: str, source_sig: Tuple[int, int]) -> bool:
+        """Whether the manifest record matches the source file's current bytes."""
+        recorded = record.get("source_sha256")
+        if not recorded:
+            return False
+        if (record.get("source_mtime_ns"), record.get("source_size")) == source_sig:
+            return True
+        return recorded == self._sha256(source_path, source_sig)
+
+    def _choose_in_dir(self, d: str, names: Tuple[str, ...]) -> Optional[Tuple[str, Dict[str, Any]]]:
+        deps = {}
+        for n in names:
+            p = os.path.join(d, _split_member(n)[0])
+            if p not in deps:
+                deps[p] = _stat_sig(p)
+        existing = [n for n in names if deps[os.path.join(d, _split_member(n)[0])] is not None]
+        if not existing:
+            return None
+        deps = {p: sig for p, sig in deps.items() if sig is not None}
+        source = names[-1]
+        source_path = os.path.join(d, source)
+        source_sig = deps.get(source_path)
+        manifest = None
+        for n in existing:
+            member = _split_member(n)[1] is not None
+            if manifest is None and (member or (n != source and source_sig is not None)):
+                manifest = self._read_manifest(d, deps)
+            if member and n not in manifest:
+                # the file was written before this member existed
+                continue
+            if n == source or source_sig is None:
+                return os.path.join(d, n), deps
+            if self._exported_from(manifest.get(n, {}), source_path, source_sig):
+                return os.path.join(d, n), deps
+            if self._log:
+                self._log("Ignoring stale %s (does not match %s)" % (n, source))
+        return None
+
+    def _resolve(self, key: str) -> Tuple[str, Dict[str, Any]]:
+        with instrumentation.stage("resolve"):
+            return self._resolve_uninstrumented(key)
+
+    def _resolve_uninstrumented(self, key: str) -> Tuple[str, Dict[str, Any]]:
+        names = self.files[key]
+        for _ in range(2):
+            for d in self.search_dirs():
+                found = self._choose_in_dir(d, names)
+                if found:
+                    return found
+            # directories may have been created since the first probe
+            self._search_dirs = None
+        err = {"error": "Missing model/metric files", "missing_files": [names[-1]], "searched_dirs": self.search_dirs()}
+        raise FileNotFoundError(json.dumps(err))
+
+    # -- loading ---------------------------------------------------------
+    def _load_file(self, path: str) -> Any:
+        ext = os.path.splitext(path)[1]
+        if ext in self._loaders:
+            return self._loaders[ext](path)
+        if self._loader is None:
+            import joblib
+            self._loader = joblib.load
+        return self._loader(path)
+
+    def _content_sha256(self, path: str) -> str:
+        """The sha256 _load() would record for `path` (a member's comes from its loaded file)."""
+        file_path, member = _split_member(path)
+        return self._sha256(path) if member is None else self._load_shared(file_path)[0]
+
+    def _load_shared(self, path: str) -> Tuple[str, Any]:
+        sig = _stat_sig(path)
+        cached = self._shared.get(path)
+        if cached is not None and cached[0] == sig:
+            return cached[1], cached[2]
+        value = self._load_file(path)
+        # loaders that already hashed the bytes they read save a second read
+        sha = getattr(value, "content_sha256", None) or _file_sha256(path)
+        self._shared[path] = (sig, sha, value)
+        return sha, value
+
+    def _load(self, key: str, path: str, deps: Dict[str, Any]) -> _Entry:
+        file_path, member = _split_member(path)
+        with instrumentation.stage("load"):
+            if member is None:
+                sha = self._sha256(path)
+                value = self._load_file(path)
+            else:
+                sha, bundle = self._load_shared(file_path)
+                value = bundle[member]
+        instrumentation.count("model_loads")
+        if self._log:
+            self._log("Loaded %s from %s" % (os.path.basename(path), os.path.dirname(path)))
+        return _Entry(path, deps, sha, value)
+
+    def _fresh_entry(self, key: str) -> _Entry:
+        entry = self._entries.get(key)
+        if entry is not None:
+            now = time.monotonic()
+            if self.check_interval and now - entry.checked_at < self.check_interval:
+                return entry
+            entry.checked_at = now
+            if entry.unchanged():
+                return entry
+            path, deps = self._resolve(key)
+            # touched: only reload if the bytes actually changed
+            if path == entry.path and self._content_sha256(path) == entry.sha256:
+                entry.deps = deps
+                return entry
+        elif key in self.optional:
+            path, deps = self._resolve_optional(key)
+        else:
+            path, deps = self._resolve(key)
+        entry = self._load(key, path, deps)
+        self._entries[key] = entry
+        return entry
+
+    def _resolve_optional(self, key: str) -> Tuple[str, Dict[str, Any]]:
+        # an absent optional artifact is looked for again only once a search
+        # directory changes (a new file changes its mtime), not on every access
+        missing = self._missing.get(key)
+        if missing is not None and all(_stat_sig(d) == sig for d, sig in missing[0].items()):
+            raise FileNotFoundError(missing[1])
+        dir_sigs = {d: _stat_sig(d) for d in self.search_dirs()}
+        try:
+            found = self._resolve(key)
+        except FileNotFoundError as e:
+            self._missing[key] = (dir_sigs, str(e))
+            raise
+        self._missing.pop(key, None)
+        return found
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self.files:
+            raise KeyError(key)
+        with self._lock:
+            return self._fresh_entry(key).value
+
+    def get(self, key: str, default: Any = None) -> Any:
+        try:
+            return self[key]
+        except (KeyError, FileNotFoundError):
+            return default
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.files
+
+    def keys(self):
+        return self.files.keys()
+
+    def load_all(self) -> Dict[str, Any]:
+        """Load (or refresh) every artifact; raises listing all missing (non-optional) files."""
+        missing = []
+        out = {}
+        with self._lock:
+            for key in self.files:
+                try:
+                    out[key] = self._fresh_entry(key).value
+                except FileNotFoundError:
+                    if key not in self.optional:
+                        missing.append(self.files[key][-1])
+        if missing:
+            err = {"error": "Missing model/metric files", "missing_files": missing, "searched_dirs": self.search_dirs()}
+            raise FileNotFoundError(json.dumps(err))
+        return out
+
+    def source(self, key: str) -> str:
+        """Path of the file currently backing `key`."""
+        with self._lock:
+            return self._fresh_entry(key).path
+
+    def version(self, keys: Optional[Iterable[str]] = None) -> str:
+        """Short digest of the content hashes of the given (default: all) artifacts."""
+        keys = list(self.files) if keys is None else list(keys)
+        hashes = []
+        with self._lock:
+            for k in keys:
+                try:
+                    hashes.append(self._fresh_entry(k).sha256)
+                except FileNotFoundError:
+                    if k not in self.optional:
+                        raise
+                    hashes.append("missing")
+        return hashlib.sha256("|".join(hashes).encode("ascii")).hexdigest()[:16]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._shared.clear()
+            self._missing.clear()
+            self._manifests.clear()
+            self._hashes.clear()
+            self._search_dirs = None
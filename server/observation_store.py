@@ -0,0 +1,511 @@
+#!/usr/bin/env python3
+"""
+Append-only store of timestamped weather observations.
+
+New rows go through three stages:
+
+1. append() validates them (validation.py, labels must be 0/1) and buffers
+   the valid ones in memory; the buffer is written out by flush() as one
+   append to the ingest log (ingest.log, CSV without header) once it holds
+   flush_rows rows or its oldest row is flush_interval seconds old.
+2. compact() moves the log aside and folds its rows into date partitions:
+   partitions/date=YYYY-MM-DD.<generation>/ holds one .npy per column
+   (dataset.py's columnar layout, memory-mapped on read) sorted by time. A
+   day that already has a partition is rewritten as one new generation. Flush
+   triggers it once the log exceeds compact_bytes.
+3. catalog.json lists every live partition with its time range, row count and
+   per-column running statistics (stats_cache.ColumnStats: min/max, moments,
+   quantile sketch). It is replaced atomically and is the source of truth;
+   partition directories it doesn't list (replaced generations, leftovers of
+   an interrupted compaction) are deleted by the next compaction that finds
+   no reader active.
+
+Readers prune with the catalog: scan() / read() open only the partitions
+whose time range and column min/max can match, and stats() merges whole
+partitions' stored statistics without reading their rows at all; only
+partitions cut by the requested range, and the not-yet-compacted rows (the
+log plus moved-aside logs the catalog doesn't list yet), are scanned.
+Readers take the catalog and those rows together under a shared compaction
+lock and hold a shared readers lock while they read, so a compaction never
+hides rows from them or deletes a partition they are reading.
+
+Times are Unix seconds (UTC); since/until accept those, "YYYY-MM-DD" or ISO
+8601 strings, and select since <= observed_at < until.
+
+Appends and compactions from several processes (the worker pool) are
+serialized with flock on files in the store directory.
+"""
+
+import os
+import io
+import json
+import time
+import atexit
+import fcntl
+import shutil
+import threading
+from contextlib import ExitStack, contextmanager
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+
+from dataset import WEATHER_FEATURES, LABELS, SCHEMA_NAME, DEFAULT_CHUNKSIZE, load_columns
+from stats_cache import ColumnStats, SAMPLE_ROWS
+from validation import WEATHER_SCHEMA, validate
+
+TIME_COLUMN = "observed_at"
+DATA_COLUMNS = WEATHER_FEATURES + LABELS
+STORE_COLUMNS = [TIME_COLUMN] + DATA_COLUMNS
+
+LOG_NAME = "ingest.log"
+CATALOG_NAME = "catalog.json"
+PARTITIONS_DIR = "partitions"
+CATALOG_VERSION = 1
+DAY = 86400
+
+TimeLike = Union[None, int, float, str]
+
+
+def _debug_print(msg: str):
+    import sys
+    print("[observation_store.py] " + msg, file=sys.stderr)
+
+
+def default_store_dir() -> str:
+    return os.environ.get("ML_OBSERVATION_STORE") or \
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "observations")
+
+
+def to_epoch(value: TimeLike) -> Optional[float]:
+    """Unix seconds from a number, "YYYY-MM-DD" or an ISO 8601 string (naive = UTC)."""
+    if value is None or isinstance(value, (int, float, np.number)):
+        return None if value is None else float(value)
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    dt = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+def day_of(t: float) -> str:
+    return datetime.fromtimestamp(t, timezone.utc).strftime("%Y-%m-%d")
+
+
+def _overlaps(entry: Dict[str, Any], start: Optional[float], end: Optional[float],
+              where: Optional[Dict[str, Tuple[float, float]]]) -> bool:
+    if start is not None and entry["max_time"] < start:
+        return False
+    if end is not None and entry["min_time"] >= end:
+        return False
+    for col, (lo, hi) in (where or {}).items():
+        stats = entry["columns"][col]
+        if stats["max"] < lo or stats["min"] > hi:
+            return False
+    return True
+
+
+def _covers(entry: Dict[str, Any], start: Optional[float], end: Optional[float],
+            where: Optional[Dict[str, Tuple[float, float]]]) -> bool:
+    """Whether every row of the partition satisfies the range (no row filter needed)."""
+    if start is not None and entry["min_time"] < start:
+        return False
+    if end is not None and entry["max_time"] >= end:
+        return False
+    for col, (lo, hi) in (where or {}).items():
+        stats = entry["columns"][col]
+        if stats["min"] < lo or stats["max"] > hi:
+            return False
+    return True
+
+
+def _row_mask(arrays: Dict[str, np.ndarray], start, end, where) -> np.ndarray:
+    t = arrays[TIME_COLUMN]
+    mask = np.ones(len(t), dtype=bool)
+    if start is not None:
+        mask &= t >= start
+    if end is not None:
+        mask &= t < end
+    for col, (lo, hi) in (where or {}).items():
+        mask &= (arrays[col] >= lo) & (arrays[col] <= hi)
+    return mask
+
+
+class ObservationStore:
+    def __init__(self, root: Optional[str] = None, flush_rows: int = 1000, flush_interval: float = 1.0,
+                 compact_bytes: int = 8 * 1024 * 1024, clock=time.time):
+        self.root = root or default_store_dir()
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.compact_bytes = compact_bytes
+        self.clock = clock
+        os.makedirs(os.path.join(self.root, PARTITIONS_DIR), exist_ok=True)
+        self._buffer: List[np.ndarray] = []
+        self._buffered = 0
+        self._oldest: Optional[float] = None
+        self._timer: Optional[threading.Timer] = None
+        self._lock = threading.RLock()
+        atexit.register(self.flush)
+
+    # -- paths and locks -------------------------------------------------
+    @property
+    def log_path(self) -> str:
+        return os.path.join(self.root, LOG_NAME)
+
+    @property
+    def catalog_path(self) -> str:
+        return os.path.join(self.root, CATALOG_NAME)
+
+    @contextmanager
+    def _file_lock(self, name: str, mode: int = fcntl.LOCK_EX):
+        with open(os.path.join(self.root, name), "a") as f:
+            fcntl.flock(f, mode)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    # -- ingestion -------------------------------------------------------
+    def _coerce(self, rows) -> Tuple[np.ndarray, Dict[int, List[str]]]:
+        """(n, len(STORE_COLUMNS)) float64 matrix of the valid rows, {row: errors} for the rest."""
+        import pandas as pd
+
+        df = rows if hasattr(rows, "columns") else pd.DataFrame(list(rows))
+        if len(df) == 0:
+            return np.empty((0, len(STORE_COLUMNS))), {}
+        checked = validate(df, WEATHER_SCHEMA)
+        errors = checked.errors()
+        labels = []
+        for label in LABELS:
+            if label not in df.columns:
+                raise ValueError("Missing feature columns: " + label)
+            values = pd.to_numeric(df[label], errors="coerce").to_numpy(dtype=np.float64)
+            bad = ~np.isin(values, (0.0, 1.0))
+            for i in np.flatnonzero(bad):
+                errors.setdefault(int(i), []).append("%s must be 0 or 1" % label)
+            labels.append(values)
+        now = self.clock()
+        times = np.full(len(df), now)
+        if TIME_COLUMN in df.columns and pd.api.types.is_numeric_dtype(df[TIME_COLUMN]):
+            given = df[TIME_COLUMN].to_numpy(dtype=np.float64)
+            times = np.where(np.isnan(given), now, given)
+        elif TIME_COLUMN in df.columns:
+            for i, v in enumerate(df[TIME_COLUMN].tolist()):
+                if v is None or (isinstance(v, float) and np.isnan(v)):
+                    continue
+                try:
+                    times[i] = to_epoch(v)
+                except (TypeError, ValueError):
+                    errors.setdefault(i, []).append("%s is not a timestamp" % TIME_COLUMN)
+        matrix = np.column_stack([times, checked.X] + labels)
+        keep = np.ones(len(df), dtype=bool)
+        keep[list(errors)] = False
+        return matrix[keep], {i: errors[i] for i in sorted(errors)}
+
+    def append(self, rows, flush: bool = False) -> Dict[str, Any]:
+        """
+        Validate and buffer rows (list of dicts or DataFrame with the weather
+        features, rain, cloudiness and optionally observed_at, default now).
+        Invalid rows are skipped and reported; returns {"accepted", "rejected", "buffered"}.
+        """
+        matrix, errors = self._coerce(rows)
+        with self._lock:
+            if len(matrix):
+                self._buffer.append(matrix)
+                self._buffered += len(matrix)
+                if self._oldest is None:
+                    self._oldest = self.clock()
+            due = self._buffered >= self.flush_rows or \
+                (self._oldest is not None and self.clock() - self._oldest >= self.flush_interval)
+            if flush or due:
+                self.flush()
+            elif self._buffered and self._timer is None:
+                # make sure a quiet period still gets the rows onto disk
+                self._timer = threading.Timer(self.flush_interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+            buffered = self._buffered
+        return {"accepted": int(len(matrix)), "rejected": errors, "buffered": buffered}
+
+    def flush(self) -> int:
+        """Write the buffered rows to the ingest log in one append; returns the row count."""
+        written, log_size = self._write_buffer()
+        if log_size >= self.compact_bytes:
+            self.compact()
+        return written
+
+    def _write_buffer(self) -> Tuple[int, int]:
+        """(rows written, log size afterwards)."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._buffer:
+                return 0, 0
+            matrix = np.vstack(self._buffer)
+            out = io.StringIO()
+            np.savetxt(out, matrix, fmt="%.17g", delimiter=",")
+            data = out.getvalue().encode("ascii")
+            with self._file_lock(".append.lock"):
+                fd = os.open(self.log_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+                try:
+                    os.write(fd, data)
+                finally:
+                    os.close(fd)
+                log_size = os.path.getsize(self.log_path)
+            self._buffer, self._buffered, self._oldest = [], 0, None
+        return len(matrix), log_size
+
+    # -- compaction ------------------------------------------------------
+    def catalog(self) -> Dict[str, Any]:
+        try:
+            with open(self.catalog_path) as f:
+                catalog = json.load(f)
+        except (OSError, ValueError):
+            return {"version": CATALOG_VERSION, "partitions": {}, "compacted_logs": [], "generation": 0}
+        if catalog.get("version") != CATALOG_VERSION:
+            raise ValueError("Unsupported observation catalog version %r" % catalog.get("version"))
+        return catalog
+
+    def _write_catalog(self, catalog: Dict[str, Any]):
+        tmp = "%s.tmp-%d" % (self.catalog_path, os.getpid())
+        with open(tmp, "w") as f:
+            json.dump(catalog, f, indent=1)
+        os.replace(tmp, self.catalog_path)
+
+    @staticmethod
+    def _read_log(path: str) -> np.ndarray:
+        if os.path.getsize(path) == 0:
+            return np.empty((0, len(STORE_COLUMNS)))
+        return np.loadtxt(path, delimiter=",", ndmin=2, dtype=np.float64)
+
+    def _write_partition(self, day: str, generation: int, matrix: np.ndarray) -> Dict[str, Any]:
+        """Sorted columnar partition for one day; returns its catalog entry."""
+        matrix = matrix[np.argsort(matrix[:, 0], kind="stable")]
+        name = "date=%s.%d" % (day, generation)
+        final = os.path.join(self.root, PARTITIONS_DIR, name)
+        # left by a compaction that crashed before its catalog write; no catalog
+        # ever listed this generation, so no reader can be using it
+        shutil.rmtree(final, ignore_errors=True)
+        tmp = final + ".tmp-%d" % os.getpid()
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        columns, stats = [], {}
+        for j, col in enumerate(STORE_COLUMNS):
+            values = matrix[:, j].astype(np.int8) if col in LABELS else matrix[:, j]
+            np.save(os.path.join(tmp, col + ".npy"), values)
+            columns.append({"name": col, "dtype": values.dtype.str})
+            if col != TIME_COLUMN:
+                cs = ColumnStats()
+                cs.update(values)
+                stats[col] = cs.to_dict()
+        schema = {"version": 1, "rows": int(len(matrix)), "columns": columns, "date": day}
+        with open(os.path.join(tmp, SCHEMA_NAME), "w") as f:
+            json.dump(schema, f)
+        os.rename(tmp, final)
+        return {
+            "path": os.path.join(PARTITIONS_DIR, name),
+            "rows": int(len(matrix)),
+            "min_time": float(matrix[0, 0]),
+            "max_time": float(matrix[-1, 0]),
+            "columns": stats,
+        }
+
+    def _partition_matrix(self, entry: Dict[str, Any]) -> np.ndarray:
+        arrays = load_columns(os.path.join(self.root, entry["path"]), STORE_COLUMNS)
+        return np.column_stack([np.asarray(arrays[c], dtype=np.float64) for c in STORE_COLUMNS])
+
+    def compact(self) -> Dict[str, Any]:
+        """
+        Fold the ingest log (and logs left by an interrupted compaction) into the
+        date partitions. Returns {"rows": compacted rows, "partitions": days rewritten}.
+        """
+        self._write_buffer()
+        with self._file_lock(".compact.lock"):
+            catalog = self.catalog()
+            self._remove_unlisted(catalog)
+            with self._file_lock(".append.lock"):
+                if os.path.exists(self.log_path) and os.path.getsize(self.log_path) > 0:
+                    os.rename(self.log_path, os.path.join(
+                        self.root, "%s.%d.compacting" % (LOG_NAME, time.time_ns())))
+            logs = sorted(f for f in os.listdir(self.root) if f.endswith(".compacting"))
+            done = set(catalog["compacted_logs"])
+            pending = [f for f in logs if f not in done]
+            if not pending:
+                self._remove_logs(logs)
+                return {"rows": 0, "partitions": []}
+
+            matrix = np.vstack([self._read_log(os.path.join(self.root, f)) for f in pending])
+            day_index = np.floor(matrix[:, 0] / DAY).astype(np.int64)
+            days = []
+            generation = catalog["generation"] + 1
+            for d in np.unique(day_index):
+                day = day_of(float(d) * DAY)
+                days.append(day)
+                rows = matrix[day_index == d]
+                old = catalog["partitions"].get(day)
+                if old is not None:
+                    rows = np.vstack((self._partition_matrix(old), rows))
+                catalog["partitions"][day] = self._write_partition(day, generation, rows)
+            catalog["generation"] = generation
+            # logs are deleted after the catalog names them, so a crash in between can't double-count
+            catalog["compacted_logs"] = sorted(done | set(pending))
+            self._write_catalog(catalog)
+            self._remove_logs(logs)
+            catalog["compacted_logs"] = []
+            self._write_catalog(catalog)
+            self._remove_unlisted(catalog)
+        _debug_print("Compacted %d rows into %d partitions" % (len(matrix), len(days)))
+        return {"rows": int(len(matrix)), "partitions": days}
+
+    def _remove_logs(self, logs: List[str]):
+        # readers only open moved-aside logs under the compaction lock, which the caller holds
+        for f in logs:
+            try:
+                os.unlink(os.path.join(self.root, f))
+            except FileNotFoundError:
+                pass
+
+    def _remove_unlisted(self, catalog: Dict[str, Any]):
+        """Delete partition directories the catalog doesn't list, unless a reader may still use one."""
+        with open(os.path.join(self.root, ".readers.lock"), "a") as f:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                # a reader's catalog snapshot may list them; the next compaction retries
+                return
+            try:
+                listed = {os.path.basename(e["path"]) for e in catalog["partitions"].values()}
+                base = os.path.join(self.root, PARTITIONS_DIR)
+                for name in os.listdir(base):
+                    if name not in listed:
+                        shutil.rmtree(os.path.join(base, name), ignore_errors=True)
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    # -- reading ---------------------------------------------------------
+    def partitions(self, since: TimeLike = None, until: TimeLike = None,
+                   where: Optional[Dict[str, Tuple[float, float]]] = None,
+                   catalog: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Catalog entries (oldest first) that may hold matching rows."""
+        start, end = to_epoch(since), to_epoch(until)
+        catalog = self.catalog() if catalog is None else catalog
+        entries = [e for _, e in sorted(catalog["partitions"].items())]
+        return [e for e in entries if _overlaps(e, start, end, where)]
+
+    @contextmanager
+    def _reading(self) -> Iterator[Tuple[Dict[str, Any], Dict[str, np.ndarray]]]:
+        """
+        (catalog, {column: uncompacted rows}) as one consistent snapshot: the
+        live log plus moved-aside logs the catalog doesn't list yet. The catalog's
+        partitions stay on disk until the block exits.
+        """
+        with ExitStack() as stack:
+            with self._file_lock(".compact.lock", fcntl.LOCK_SH):
+                stack.enter_context(self._file_lock(".readers.lock", fcntl.LOCK_SH))
+                catalog = self.catalog()
+                done = set(catalog["compacted_logs"])
+                with self._file_lock(".append.lock"):
+                    names = sorted(f for f in os.listdir(self.root)
+                                   if f.endswith(".compacting") and f not in done)
+                    if os.path.exists(self.log_path):
+                        names.append(LOG_NAME)
+                    matrix = np.vstack([np.empty((0, len(STORE_COLUMNS)))] +
+                                       [self._read_log(os.path.join(self.root, f)) for f in names])
+            yield catalog, {c: matrix[:, j] for j, c in enumerate(STORE_COLUMNS)}
+
+    def scan(self, columns: Optional[List[str]] = None, since: TimeLike = None, until: TimeLike = None,
+             where: Optional[Dict[str, Tuple[float, float]]] = None, include_log: bool = True,
+             chunksize: int = DEFAULT_CHUNKSIZE) -> Iterator:
+        """
+        DataFrames of the matching rows, partition by partition (memory-mapped, no
+        copy when a partition matches entirely), then the uncompacted log.
+        `where` is {column: (min, max)}, both inclusive.
+        """
+        import pandas as pd
+
+        columns = list(columns) if columns is not None else STORE_COLUMNS
+        start, end = to_epoch(since), to_epoch(until)
+        with self._reading() as (catalog, log_arrays):
+            sources = [(e, None) for e in self.partitions(start, end, where, catalog)]
+            if include_log:
+                sources.append((None, log_arrays))
+            for entry, arrays in sources:
+                if arrays is None:
+                    arrays = load_columns(os.path.join(self.root, entry["path"]), STORE_COLUMNS)
+                if entry is None or not _covers(entry, start, end, where):
+                    mask = _row_mask(arrays, start, end, where)
+                    if not mask.any():
+                        continue
+                    if not mask.all():
+                        arrays = {c: a[mask] for c, a in arrays.items()}
+                n = len(arrays[TIME_COLUMN])
+                for lo in range(0, n, chunksize):
+                    yield pd.DataFrame({c: arrays[c][lo:lo + chunksize] for c in columns}, copy=False)
+
+    def read(self, columns: Optional[List[str]] = None, since: TimeLike = None, until: TimeLike = None,
+             where: Optional[Dict[str, Tuple[float, float]]] = None):
+        import pandas as pd
+        frames = list(self.scan(columns, since, until, where))
+        if not frames:
+            return pd.DataFrame({c: np.empty(0) for c in (columns or STORE_COLUMNS)})
+        return pd.concat(frames, ignore_index=True)
+
+    def stats(self, since: TimeLike = None, until: TimeLike = None) -> Dict[str, Any]:
+        """
+        get_dataset_stats()-shaped summary of the observations in [since, until).
+        Partitions inside the range contribute their stored statistics; only
+        partitions cut by the range and the uncompacted log are read.
+        """
+        start, end = to_epoch(since), to_epoch(until)
+        merged = {c: ColumnStats() for c in DATA_COLUMNS}
+        total, sample, scanned = 0, [], 0
+        with self._reading() as (catalog, log_arrays):
+            for entry in self.partitions(start, end, catalog=catalog):
+                if _covers(entry, start, end, None):
+                    for c in DATA_COLUMNS:
+                        merged[c].merge(ColumnStats.from_dict(entry["columns"][c]))
+                    total += entry["rows"]
+                    if len(sample) < SAMPLE_ROWS:
+                        arrays = load_columns(os.path.join(self.root, entry["path"]), DATA_COLUMNS)
+                        sample.extend(self._records(arrays, SAMPLE_ROWS - len(sample)))
+                    continue
+                scanned += 1
+                arrays = load_columns(os.path.join(self.root, entry["path"]), STORE_COLUMNS)
+                total += self._fold(merged, arrays, start, end, sample)
+            total += self._fold(merged, log_arrays, start, end, sample)
+        return {
+            'total_records': int(total),
+            'features': list(DATA_COLUMNS),
+            'statistics': {c: merged[c].summary() for c in DATA_COLUMNS},
+            'sample_data': sample,
+            'partitions_scanned': scanned,
+        }
+
+    @staticmethod
+    def _records(arrays: Dict[str, np.ndarray], limit: int) -> List[Dict[str, Any]]:
+        return [{c: (int(arrays[c][i]) if c in LABELS else float(arrays[c][i])) for c in DATA_COLUMNS}
+                for i in range(min(limit, len(arrays[DATA_COLUMNS[0]])))]
+
+    def _fold(self, merged, arrays, start, end, sample) -> int:
+        mask = _row_mask(arrays, start, end, None)
+        rows = {c: np.asarray(arrays[c])[mask] for c in DATA_COLUMNS}
+        for c in DATA_COLUMNS:
+            merged[c].update(rows[c])
+        if len(sample) < SAMPLE_ROWS:
+            sample.extend(self._records(rows, SAMPLE_ROWS - len(sample)))
+        return int(mask.sum())
+
+
+_store: Optional[ObservationStore] = None
+
+
+def get_observation_store() -> ObservationStore:
+    """Process-wide store in default_store_dir() (ML_OBSERVATION_STORE)."""
+    global _store
+    if _store is None:
+        _store = ObservationStore()
+    return _store
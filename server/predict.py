@@ -149,15 +149,25 @@
 Robust ML prediction helpers for weather project.
 
 Drop-in replacement for your current predict.py / ML module.
+
+pandas and joblib/sklearn are imported lazily: serving compiled models only
+needs NumPy, which keeps the cold start of the CLI scripts short.
 """
 
 import os
-import joblib
 import json
+import threading
 import numpy as np
-import pandas as pd
+from collections import OrderedDict
 from typing import Optional, Dict, Any
 
+import instrumentation
+from model_registry import ModelRegistry
+from dataset import TEMP_FEATURES, WEATHER_FEATURES, find_dataset_path, read_dataset
+from compiled import (CompiledModel, FusedBinaryLogistic, MANIFEST_NAME,
+                      bundle_member, compile_model, compiled_name, load_bundle, load_model, load_json)
+from validation import FeatureSchema, TEMP_SCHEMA, WEATHER_SCHEMA, validate as validate_batch
+
 def _debug_print(msg: str):
     # prints to stderr so CLI JSON outputs are unaffected
     import sys
@@ -191,63 +201,138 @@ def _find_file_in_dirs(filename: str) -> Optional[str]:
             return path
     return None
 
+PICKLE_FILES = {
+    "linear": "linear_regression_model.pkl",
+    "linear_metrics": "linear_regression_metrics.pkl",
+    "rain": "logistic_rain_model.pkl",
+    "cloud": "logistic_cloud_model.pkl",
+    "logistic_metrics": "logistic_metrics.pkl",
+    "logistic_confusion": "logistic_confusion.pkl",
+    "cloud_metrics": "logistic_cloud_metrics.pkl",
+    "cloud_confusion": "logistic_cloud_confusion.pkl"
+}
+MODEL_KEYS = ("linear", "rain", "cloud")
+# written by newer training runs and ml_models/evaluate.py; older model dirs lack them
+OPTIONAL_KEYS = ("cloud_metrics", "cloud_confusion")
+
+# preference: the single-file bundle, then the per-artifact NumPy/JSON exports
+# (both from ml_models/export_compiled.py), then the pickles
+MODEL_FILES = {
+    key: (bundle_member(key), compiled_name(fname, key in MODEL_KEYS), fname)
+    for key, fname in PICKLE_FILES.items()
+}
+
+_registry: Optional[ModelRegistry] = None
+
+def shared_models_enabled() -> bool:
+    """
+    ML_MODEL_MMAP=1: map the bundle read-only instead of reading it into this
+    process, so every worker on the host serves the same page-cache copy of
+    the coefficients (worker_pool.py sets it for its workers).
+    """
+    return os.environ.get("ML_MODEL_MMAP", "").strip().lower() not in ("", "0", "false", "off")
+
+def _bundle_loader():
+    if shared_models_enabled():
+        return lambda path: load_bundle(path, mmap=True)
+    return load_bundle
+
+def new_registry(log=_debug_print) -> ModelRegistry:
+    """A registry over the serving artifacts with nothing loaded yet."""
+    return ModelRegistry(
+        MODEL_FILES, _possible_model_dirs,
+        loaders={".bundle": _bundle_loader(), ".npz": load_model, ".json": load_json},
+        manifest_name=MANIFEST_NAME,
+        log=log,
+        optional=OPTIONAL_KEYS,
+    )
+
+def get_registry() -> ModelRegistry:
+    """Process-wide registry; artifacts load lazily and reload when changed on disk."""
+    global _registry
+    if _registry is None:
+        _registry = new_registry()
+    return _registry
+
+_station_registry = None
+
+def get_station_registry():
+    """
+    Process-wide per-station registry (station_models.py) over the stations/
+    folder of the model dirs; stations without their own models use get_registry().
+    ML_STATION_SHARDS caps how many shards stay loaded (default 32).
+    """
+    global _station_registry
+    if _station_registry is None:
+        from station_models import DEFAULT_CAPACITY, STATIONS_DIR, StationRegistry
+        _station_registry = StationRegistry(
+            lambda: [os.path.join(d, STATIONS_DIR) for d in _possible_model_dirs()],
+            get_registry(),
+            capacity=int(os.environ.get("ML_STATION_SHARDS") or DEFAULT_CAPACITY),
+            loader=_bundle_loader(),
+            log=_debug_print,
+        )
+    return _station_registry
+
+def _models_for(models, station):
+    # a station key selects its shard; `models` (default: the shared registry) is the fallback
+    if station is not None:
+        return get_station_registry().models_for(station, fallback=models)
+    return models if models is not None else get_registry()
+
 def load_models(verbose: bool=True) -> Optional[Dict[str, Any]]:
     """
     Attempt to load model and metric files from likely locations.
     Returns a dict with models and metrics or raises FileNotFoundError with details.
+    Artifacts come from the shared registry, so repeated calls don't unpickle again.
     """
-    files_to_find = {
-        "linear": "linear_regression_model.pkl",
-        "linear_metrics": "linear_regression_metrics.pkl",
-        "rain": "logistic_rain_model.pkl",
-        "cloud": "logistic_cloud_model.pkl",
-        "logistic_metrics": "logistic_metrics.pkl",
-        "logistic_confusion": "logistic_confusion.pkl"
-    }
-
-    found_paths = {}
-    missing = []
-    for key, fname in files_to_find.items():
-        p = _find_file_in_dirs(fname)
-        if p:
-            found_paths[key] = p
-        else:
-            missing.append(fname)
-
-    if missing:
-        # helpful diagnostic for the user
-        err = {"error": "Missing model/metric files", "missing_files": missing, "searched_dirs": _possible_model_dirs()}
-        if verbose:
-            _debug_print("Missing files: " + ", ".join(missing))
-            _debug_print("Searched dirs: " + repr(_possible_model_dirs()))
-        raise FileNotFoundError(json.dumps(err))
-
-    # load each file, but do it individually to surface specific errors
+    registry = get_registry()
     try:
-        linear_model = joblib.load(found_paths["linear"])
-        linear_metrics = joblib.load(found_paths["linear_metrics"])
-
-        rain_model = joblib.load(found_paths["rain"])
-        cloud_model = joblib.load(found_paths["cloud"])
-        logistic_metrics = joblib.load(found_paths["logistic_metrics"])
-        logistic_confusion = joblib.load(found_paths["logistic_confusion"])
+        return registry.load_all()
+    except FileNotFoundError as e:
+        if verbose:
+            _debug_print("Missing files: " + ", ".join(json.loads(str(e))["missing_files"]))
+            _debug_print("Searched dirs: " + repr(registry.search_dirs()))
+        raise
     except Exception as e:
         _debug_print("Error loading a model/metric: " + str(e))
         raise
 
-    if verbose:
-        _debug_print("Loaded models from: " + ", ".join(set(os.path.dirname(p) for p in found_paths.values())))
+def _linear_metrics(models) -> Dict[str, float]:
+    metrics = models.get('linear_metrics', {})
+    return {
+        'rmse': float(metrics.get('rmse', float("nan"))),
+        'mse': float(metrics.get('mse', float("nan"))),
+        'r2_score': float(metrics.get('r2_score', float("nan")))
+    }
 
+def _logistic_metrics(models, key: str = 'logistic_metrics') -> Dict[str, float]:
+    lm = models.get(key, {})
     return {
-        "linear": linear_model,
-        "linear_metrics": linear_metrics,
-        "rain": rain_model,
-        "cloud": cloud_model,
-        "logistic_metrics": logistic_metrics,
-        "logistic_confusion": logistic_confusion
+        'accuracy': float(lm.get('accuracy', float("nan"))),
+        'precision': float(lm.get('precision', float("nan"))),
+        'recall': float(lm.get('recall', float("nan"))),
+        'f1_score': float(lm.get('f1_score', float("nan")))
     }
 
+def _logistic_confusion(models, key: str = 'logistic_confusion') -> Dict[str, int]:
+    lc = models.get(key, {})
+    return {
+        'true_positive': int(lc.get('true_positive', 0)),
+        'true_negative': int(lc.get('true_negative', 0)),
+        'false_positive': int(lc.get('false_positive', 0)),
+        'false_negative': int(lc.get('false_negative', 0))
+    }
+
+def _with_cloud_metrics(result: Dict[str, Any], models) -> Dict[str, Any]:
+    # the cloud model's metrics are only present once a training or evaluation run saved them
+    if models.get('cloud_metrics') is not None:
+        result['cloudiness_metrics'] = _logistic_metrics(models, 'cloud_metrics')
+        result['cloudiness_confusion_matrix'] = _logistic_confusion(models, 'cloud_confusion')
+    return result
+
 def _make_input_df(temperature=None, humidity=None, pressure=None, wind_speed=None, clouds=None, *, for_temp=False):
+    import pandas as pd
     if for_temp:
         return pd.DataFrame({
             'humidity': [humidity],
@@ -264,40 +349,49 @@ def _make_input_df(temperature=None, humidity=None, pressure=None, wind_speed=No
             'clouds': [clouds]
         })
 
-def predict_temperature(humidity, pressure, wind_speed, clouds):
-    models = load_models()
+def predict_temperature(humidity, pressure, wind_speed, clouds, models=None, station=None):
+    # models may be a registry or the dict from load_models(); default is the shared registry.
+    # station picks that station's models (station_models.py), falling back to the global ones
+    models = _models_for(models, station)
     if not models:
         raise Exception("Models not available")
 
-    input_data = _make_input_df(humidity=humidity, pressure=pressure, wind_speed=wind_speed, clouds=clouds, for_temp=True)
+    with instrumentation.stage("models"):
+        model = models['linear']
+    if isinstance(model, CompiledModel):
+        # NumPy-only path: no DataFrame, no sklearn validation
+        with instrumentation.stage("score"):
+            pred = model.predict(np.array([[humidity, pressure, wind_speed, clouds]], dtype=float))
+        return {
+            'predicted_temperature': float(pred[0]),
+            'metrics': _linear_metrics(models)
+        }
+
+    with instrumentation.stage("input"):
+        input_data = _make_input_df(humidity=humidity, pressure=pressure, wind_speed=wind_speed, clouds=clouds, for_temp=True)
 
     # Some scikit pipelines require the exact feature order or a numpy array — coerce to same type used for training if known.
-    try:
-        pred = models['linear'].predict(input_data)
-    except Exception as e:
-        # try using numpy array (fallback)
-        _debug_print("Linear model predict failed with DataFrame; trying numpy array fallback: " + str(e))
-        arr = input_data.values
-        pred = models['linear'].predict(arr)
+    with instrumentation.stage("score"):
+        try:
+            pred = model.predict(input_data)
+        except Exception as e:
+            # try using numpy array (fallback)
+            _debug_print("Linear model predict failed with DataFrame; trying numpy array fallback: " + str(e))
+            instrumentation.count("numpy_fallbacks")
+            arr = input_data.values
+            pred = model.predict(arr)
 
     prediction = float(pred[0])
-    metrics = models.get('linear_metrics', {})
     return {
         'predicted_temperature': prediction,
-        'metrics': {
-            'rmse': float(metrics.get('rmse', float("nan"))),
-            'mse': float(metrics.get('mse', float("nan"))),
-            'r2_score': float(metrics.get('r2_score', float("nan")))
-        }
+        'metrics': _linear_metrics(models)
     }
 
-def classify_weather(temperature, humidity, pressure, wind_speed, clouds):
-    models = load_models()
+def classify_weather(temperature, humidity, pressure, wind_speed, clouds, models=None, station=None):
+    models = _models_for(models, station)
     if not models:
         raise Exception("Models not available")
 
-    input_data = _make_input_df(temperature=temperature, humidity=humidity, pressure=pressure, wind_speed=wind_speed, clouds=clouds, for_temp=False)
-
     def _predict_label_and_prob(clf, X):
         # try DataFrame first
         try:
@@ -317,6 +411,7 @@ def classify_weather(temperature, humidity, pressure, wind_speed, clouds):
                 return int(pred), None
         except Exception as e:
             _debug_print("Classifier predict failed on DataFrame: " + str(e))
+            instrumentation.count("numpy_fallbacks")
             # try as numpy
             arr = X.values
             pred = clf.predict(arr)[0]
@@ -329,47 +424,226 @@ def classify_weather(temperature, humidity, pressure, wind_speed, clouds):
                     prob = float(proba_arr[int(pred)])
             return int(pred), prob
 
-    rain_pred, rain_prob = _predict_label_and_prob(models['rain'], input_data)
-    cloud_pred, cloud_prob = _predict_label_and_prob(models['cloud'], input_data)
-
-    lm = models.get('logistic_metrics', {})
-    lc = models.get('logistic_confusion', {})
-
-    return {
+    with instrumentation.stage("models"):
+        fused = _fused_classifier(models)
+    if fused is not None:
+        # one matrix multiply scores rain and cloud; no DataFrame, no sklearn validation
+        with instrumentation.stage("score"):
+            X = np.array([[temperature, humidity, pressure, wind_speed, clouds]], dtype=float)
+            labels, probs = fused.predict_with_proba(X)
+        rain_pred, rain_prob = int(labels[0, 0]), float(probs[0, 0])
+        cloud_pred, cloud_prob = int(labels[0, 1]), float(probs[0, 1])
+    else:
+        rain, cloud = models['rain'], models['cloud']
+        with instrumentation.stage("input"):
+            input_data = _make_input_df(temperature=temperature, humidity=humidity, pressure=pressure, wind_speed=wind_speed, clouds=clouds, for_temp=False)
+        with instrumentation.stage("score"):
+            rain_pred, rain_prob = _predict_label_and_prob(rain, input_data)
+            cloud_pred, cloud_prob = _predict_label_and_prob(cloud, input_data)
+
+    return _with_cloud_metrics({
         'rain_prediction': 'Rain' if rain_pred == 1 else 'No Rain',
         'rain_probability': float(rain_prob) if rain_prob is not None else None,
         'cloudiness_prediction': 'Cloudy' if cloud_pred == 1 else 'Clear',
         'cloudiness_probability': float(cloud_prob) if cloud_prob is not None else None,
-        'metrics': {
-            'accuracy': float(lm.get('accuracy', float("nan"))),
-            'precision': float(lm.get('precision', float("nan"))),
-            'recall': float(lm.get('recall', float("nan"))),
-            'f1_score': float(lm.get('f1_score', float("nan")))
-        },
-        'confusion_matrix': {
-            'true_positive': int(lc.get('true_positive', 0)),
-            'true_negative': int(lc.get('true_negative', 0)),
-            'false_positive': int(lc.get('false_positive', 0)),
-            'false_negative': int(lc.get('false_negative', 0))
-        }
-    }
+        'metrics': _logistic_metrics(models),
+        'confusion_matrix': _logistic_confusion(models)
+    }, models)
 
-def get_dataset_stats():
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    # try a few data locations
-    possible = [
-        os.path.join(script_dir, "..", "data", "weather_dataset.csv"),
-        os.path.join(script_dir, "data", "weather_dataset.csv"),
-        os.path.join(script_dir, "..", "..", "data", "weather_dataset.csv")
-    ]
-    data_path = None
-    for p in possible:
-        if os.path.exists(p):
-            data_path = p
-            break
-    if not data_path:
-        raise FileNotFoundError("Could not find weather_dataset.csv in expected locations: " + ", ".join(possible))
-    df = pd.read_csv(data_path)
+def _as_feature_matrix(rows, features) -> np.ndarray:
+    """
+    Coerce a batch into a float (n, len(features)) array in `features` order.
+    Accepts a DataFrame, a 2-D array-like (columns already in feature order),
+    a list of dicts, or a dict of column arrays.
+    """
+    if hasattr(rows, "columns"):
+        missing = [f for f in features if f not in rows.columns]
+        if missing:
+            raise ValueError("Missing feature columns: " + ", ".join(missing))
+        return rows[features].to_numpy(dtype=float)
+    if isinstance(rows, dict):
+        missing = [f for f in features if f not in rows]
+        if missing:
+            raise ValueError("Missing feature columns: " + ", ".join(missing))
+        return np.column_stack([np.asarray(rows[f], dtype=float).reshape(-1) for f in features])
+    if isinstance(rows, (list, tuple)) and rows and isinstance(rows[0], dict):
+        try:
+            return np.array([[r[f] for f in features] for r in rows], dtype=float)
+        except KeyError as e:
+            raise ValueError("Missing feature columns: " + str(e))
+    arr = np.asarray(rows, dtype=float)
+    if arr.ndim == 1 and arr.size == len(features):
+        arr = arr.reshape(1, -1)
+    if arr.ndim != 2 or arr.shape[1] != len(features):
+        raise ValueError("Expected an array of shape (n, %d) ordered as %s" % (len(features), features))
+    return arr
+
+def _model_input(model, X: np.ndarray, features):
+    # compiled models take the raw matrix; sklearn models were fitted on named columns
+    if isinstance(model, CompiledModel):
+        return X
+    import pandas as pd
+    return pd.DataFrame(X, columns=features)
+
+def _call_with_fallback(fn, X):
+    # same DataFrame-then-ndarray fallback as the scalar paths
+    try:
+        return fn(X)
+    except Exception as e:
+        if not hasattr(X, "values"):
+            raise
+        _debug_print("Model call failed with DataFrame; trying numpy array fallback: " + str(e))
+        instrumentation.count("numpy_fallbacks")
+        return fn(X.values)
+
+def _labels_and_probs(clf, X):
+    """One predict_proba call per classifier; labels are the arg-max classes."""
+    proba = np.asarray(_call_with_fallback(clf.predict_proba, X))
+    idx = proba.argmax(axis=1)
+    classes = np.asarray(getattr(clf, "classes_", np.arange(proba.shape[1])))
+    return classes[idx].astype(int), proba[np.arange(len(idx)), idx]
+
+FUSED_CACHE_SIZE = 256
+# (id(rain), id(cloud)) -> (rain, cloud, fused), least recently used first: one entry for
+# the global models and one per hot station. Holding the models keeps their ids unique.
+_fused_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+_fused_lock = threading.Lock()
+
+def _fused_classifier(models) -> Optional[FusedBinaryLogistic]:
+    """
+    Rain and cloud classifiers stacked into one coefficient matrix, or None when
+    they can't be fused (e.g. not binary linear models). Built once per pair of
+    model objects the registry (or a station shard) hands out.
+    """
+    rain, cloud = models['rain'], models['cloud']
+    key = (id(rain), id(cloud))
+    with _fused_lock:
+        cached = _fused_cache.get(key)
+        if cached is not None:
+            _fused_cache.move_to_end(key)
+            return cached[2]
+    try:
+        parts = [m if isinstance(m, CompiledModel) else compile_model(m, WEATHER_FEATURES) for m in (rain, cloud)]
+        fused = FusedBinaryLogistic(parts, WEATHER_FEATURES)
+    except (AttributeError, ValueError) as e:
+        _debug_print("Fused classifier unavailable, scoring models separately: " + str(e))
+        instrumentation.count("fused_classifier_unavailable")
+        fused = None
+    with _fused_lock:
+        _fused_cache[key] = (rain, cloud, fused)
+        while len(_fused_cache) > FUSED_CACHE_SIZE:
+            _fused_cache.popitem(last=False)
+    return fused
+
+def _checked_input(rows, schema: FeatureSchema, validate: bool):
+    """(float matrix of the rows to score, validation result or None)."""
+    if not validate:
+        return _as_feature_matrix(rows, schema.features), None
+    checked = validate_batch(rows, schema)
+    if not checked.all_valid:
+        instrumentation.count("invalid_rows", int((~checked.valid).sum()))
+        return checked.X[checked.valid], checked
+    return checked.X, checked
+
+def _scatter(values: np.ndarray, checked, fill=np.nan) -> np.ndarray:
+    """Spread results for the valid rows back to batch positions; invalid rows get `fill`."""
+    if checked is None or checked.all_valid:
+        return values
+    out = np.full(len(checked.valid), fill, dtype=float if fill is not None else object)
+    out[checked.valid] = values
+    return out
+
+def _with_validation(result: Dict[str, Any], checked) -> Dict[str, Any]:
+    if checked is not None:
+        result['valid'] = checked.valid
+        result['errors'] = checked.errors()
+    return result
+
+def predict_temperature_batch(rows, models=None, validate: bool = True, station=None) -> Dict[str, Any]:
+    """
+    Vectorized predict_temperature: one model call for the whole batch.
+    With validate (the default) rows are checked against TEMP_SCHEMA first;
+    invalid rows get a NaN prediction and are listed under 'errors' instead of
+    failing the batch, and 'valid' is the per-row mask. station scores the
+    whole batch with that station's models.
+    """
+    models = _models_for(models, station)
+    model = models['linear']
+    with instrumentation.stage("input"):
+        X, checked = _checked_input(rows, TEMP_SCHEMA, validate)
+    pred = np.empty(0)
+    if len(X):
+        pred = np.asarray(_call_with_fallback(model.predict, _model_input(model, X, TEMP_FEATURES)), dtype=float)
+    return _with_validation({
+        'predicted_temperature': _scatter(pred, checked),
+        'metrics': _linear_metrics(models)
+    }, checked)
+
+def classify_weather_batch(rows, models=None, validate: bool = True, station=None) -> Dict[str, Any]:
+    """
+    Vectorized classify_weather: one predict_proba call per classifier for the
+    whole batch. Validation and station as in predict_temperature_batch;
+    invalid rows get None labels and NaN probabilities.
+    """
+    models = _models_for(models, station)
+    with instrumentation.stage("input"):
+        X, checked = _checked_input(rows, WEATHER_SCHEMA, validate)
+    rain_pred = cloud_pred = np.empty(0, dtype=int)
+    rain_prob = cloud_prob = np.empty(0)
+    fused = _fused_classifier(models) if len(X) else None
+    if fused is not None:
+        labels, probs = fused.predict_with_proba(X)
+        rain_pred, rain_prob = labels[:, 0].astype(int), probs[:, 0]
+        cloud_pred, cloud_prob = labels[:, 1].astype(int), probs[:, 1]
+    elif len(X):
+        rain, cloud = models['rain'], models['cloud']
+        rain_pred, rain_prob = _labels_and_probs(rain, _model_input(rain, X, WEATHER_FEATURES))
+        cloud_pred, cloud_prob = _labels_and_probs(cloud, _model_input(cloud, X, WEATHER_FEATURES))
+    return _with_validation(_with_cloud_metrics({
+        'rain_prediction': _scatter(np.where(rain_pred == 1, 'Rain', 'No Rain'), checked, None),
+        'rain_probability': _scatter(rain_prob, checked),
+        'cloudiness_prediction': _scatter(np.where(cloud_pred == 1, 'Cloudy', 'Clear'), checked, None),
+        'cloudiness_probability': _scatter(cloud_prob, checked),
+        'metrics': _logistic_metrics(models),
+        'confusion_matrix': _logistic_confusion(models)
+    }, models), checked)
+
+def batch_result_to_json(result: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Turn the numpy arrays of a *_batch result into JSON-serialisable lists;
+    NaN results of invalid rows become null.
+    """
+    partial = 'valid' in result and not result['valid'].all()
+    out = {}
+    for k, v in result.items():
+        if isinstance(v, np.ndarray):
+            if partial and v.dtype.kind == 'f':
+                v = np.where(np.isnan(v), None, v)
+            v = v.tolist()
+        out[k] = v
+    return out
+
+def get_dataset_stats(use_cache: bool = True, data_path: Optional[str] = None,
+                      since=None, until=None):
+    """
+    Dataset summary for the dashboard. By default served from the sidecar
+    cache in stats_cache.py (updated incrementally when rows are appended);
+    use_cache=False always recomputes from the full dataset (memory-mapped
+    columns when a fresh columnar copy exists, the CSV otherwise).
+    data_path overrides the dataset location (benchmarks use synthetic files).
+    With since and/or until the summary covers the ingested observations in
+    that time range instead (observation_store.py; only the partitions cut
+    by the range are read).
+    """
+    if since is not None or until is not None:
+        from observation_store import get_observation_store
+        return get_observation_store().stats(since, until)
+    data_path = data_path or find_dataset_path()
+    if use_cache:
+        from stats_cache import cached_dataset_stats
+        return cached_dataset_stats(data_path)
+    import pandas as pd
+    df = read_dataset(data_path, narrow=False)
     features = list(df.columns)
     statistics = {}
     for feature in features:
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Memoization of single-row predictions.
+
+Clients keep asking for the same rounded readings, so results of
+predict_temperature / classify_weather can be reused. Keys are
+(function, quantized input tuple, model version): the version is the model
+registry's content digest of the artifacts the function reads, so a retrain
+that replaces them makes every old entry unreachable — no explicit
+invalidation needed. Stale entries age out through the LRU bound.
+
+Inputs are quantized before scoring (value rounded to the nearest multiple of
+the step), so every reading in a bucket gets the same, reproducible answer.
+
+Disabled by default; the worker and HTTP server enable it when
+ML_PREDICTION_CACHE_SIZE is set (ML_PREDICTION_CACHE_TTL seconds,
+ML_PREDICTION_CACHE_QUANTUM step).
+"""
+
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple, Union
+
+import instrumentation
+
+# registry keys each prediction depends on
+VERSION_KEYS = {
+    "predict_temperature": ("linear", "linear_metrics"),
+    "classify_weather": ("rain", "cloud", "logistic_metrics", "logistic_confusion", "cloud_metrics", "cloud_confusion"),
+}
+
+_MISSING = object()
+
+
+class PredictionCache:
+    """
+    Thread-safe LRU cache with an optional TTL. `quantize` is None (exact
+    inputs), one step for every feature, or {feature: step}. Cached results
+    are shared between callers; treat them as read-only. Lookups are counted
+    in the instrumentation counters <counter_prefix>_hits / _misses.
+    """
+
+    def __init__(self, maxsize: int = 4096, ttl: Optional[float] = None,
+                 quantize: Union[None, float, Dict[str, float]] = None,
+                 clock: Callable[[], float] = time.monotonic,
+                 counter_prefix: str = "prediction_cache"):
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        self.maxsize = maxsize
+        self._hit_counter = counter_prefix + "_hits"
+        self._miss_counter = counter_prefix + "_misses"
+        self.ttl = ttl if ttl and ttl > 0 else None
+        self.quantize = quantize
+        self.clock = clock
+        self._data: "OrderedDict[tuple, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _step(self, feature: str) -> Optional[float]:
+        if isinstance(self.quantize, dict):
+            return self.quantize.get(feature)
+        return self.quantize
+
+    def quantized(self, row: Dict[str, float]) -> Dict[str, float]:
+        out = {}
+        for f, v in row.items():
+            step = self._step(f)
+            # round(), not floor: 69.6 and 70.4 both land on 70 with step 1
+            out[f] = float(round(v / step) * step) if step else float(v)
+        return out
+
+    def key(self, name: str, row: Dict[str, float], version: str) -> Tuple[tuple, Dict[str, float]]:
+        """(cache key, the quantized row to score on a miss)."""
+        q = self.quantized(row)
+        return (name, tuple(sorted(q.items())), version), q
+
+    def get(self, key: tuple) -> Any:
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is not _MISSING:
+                stored_at, value = item
+                if self.ttl is not None and self.clock() - stored_at > self.ttl:
+                    del self._data[key]
+                    self.expirations += 1
+                else:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    instrumentation.count(self._hit_counter)
+                    return value
+            self.misses += 1
+        instrumentation.count(self._miss_counter)
+        return _MISSING
+
+    def put(self, key: tuple, value: Any):
+        with self._lock:
+            self._data[key] = (self.clock(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def call(self, name: str, row: Dict[str, float], version: str, compute: Callable[[Dict[str, float]], Any]) -> Any:
+        """Cached compute(quantized_row)."""
+        key, q = self.key(name, row, version)
+        value = self.get(key)
+        if value is _MISSING:
+            value = compute(q)
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+def is_missing(value: Any) -> bool:
+    return value is _MISSING
+
+
+def model_version(models, name: str) -> Optional[str]:
+    """Registry digest of the artifacts `name` reads, or None for plain model dicts (no caching)."""
+    version = getattr(models, "version", None)
+    return version(VERSION_KEYS[name]) if callable(version) else None
+
+
+def cache_from_env(environ=None) -> Optional[PredictionCache]:
+    env = os.environ if environ is None else environ
+    size = env.get("ML_PREDICTION_CACHE_SIZE")
+    if not size or int(size) <= 0:
+        return None
+    ttl = env.get("ML_PREDICTION_CACHE_TTL")
+    quantum = env.get("ML_PREDICTION_CACHE_QUANTUM")
+    return PredictionCache(int(size), float(ttl) if ttl else None, float(quantum) if quantum else None)
+
+
+_cache: Optional[PredictionCache] = None
+_configured = False
+
+
+def get_prediction_cache() -> Optional[PredictionCache]:
+    """Process-wide cache configured from the environment, or None when disabled."""
+    global _cache, _configured
+    if not _configured:
+        _cache = cache_from_env()
+        _configured = True
+    return _cache
+
+
+def set_prediction_cache(cache: Optional[PredictionCache]):
+    global _cache, _configured
+    _cache, _configured = cache, True
@@ -1,6 +1,6 @@
 import type { Express } from "express";
 import { createServer, type Server } from "http";
-import { spawn } from "child_process";
+import { spawn, type ChildProcess } from "child_process";
 import path from "path";
 import { fileURLToPath } from "url";
 
@@ -14,44 +14,87 @@ export async function registerRoutes(app: Express): Promise<Server> {
     console.error("Warning: OPENWEATHER_API_KEY not set");
   }
 
-  // Helper function to call Python ML scripts
-  async function callPythonScript(scriptName: string, args: string[] = []): Promise<any> {
-    return new Promise((resolve, reject) => {
-      const pythonPath = "python";
-      const scriptPath = path.join(__dirname, "ml_models", scriptName);
-      
-      const pythonProcess = spawn(pythonPath, [scriptPath, ...args]);
-      
-      let stdout = "";
-      let stderr = "";
+  // Persistent pool of warm Python prediction workers (server/worker_pool.py).
+  // Requests and responses are newline-delimited JSON matched by id, so the
+  // models are loaded once instead of on every request.
+  let mlPool: ChildProcess | null = null;
+  let nextRequestId = 1;
+  const pendingRequests = new Map<number, {
+    resolve: (value: any) => void;
+    reject: (error: Error) => void;
+    timer: NodeJS.Timeout;
+  }>();
+  // a request with no answer by then is rejected (ML_WORKER_TIMEOUT_MS, default 30 s)
+  const PYTHON_WORKER_TIMEOUT_MS = Number(process.env.ML_WORKER_TIMEOUT_MS) || 30000;
 
-      pythonProcess.stdout.on("data", (data) => {
-        stdout += data.toString();
-      });
+  function takePending(id: unknown) {
+    const pending = pendingRequests.get(id as number);
+    if (pending) {
+      pendingRequests.delete(id as number);
+      clearTimeout(pending.timer);
+    }
+    return pending;
+  }
 
-      pythonProcess.stderr.on("data", (data) => {
-        stderr += data.toString();
-      });
+  function getMlPool(): ChildProcess {
+    if (mlPool) {
+      return mlPool;
+    }
 
-      pythonProcess.on("close", (code) => {
-        if (code !== 0) {
-          reject(new Error(`Python script failed: ${stderr}`));
-          return;
-        }
-        
+    const poolScript = path.join(__dirname, "worker_pool.py");
+    const proc = spawn("python", [poolScript], { stdio: ["pipe", "pipe", "inherit"] });
+
+    let buffer = "";
+    proc.stdout!.on("data", (data) => {
+      buffer += data.toString();
+      let newline: number;
+      while ((newline = buffer.indexOf("\n")) >= 0) {
+        const line = buffer.slice(0, newline);
+        buffer = buffer.slice(newline + 1);
+        if (!line.trim()) continue;
+
+        let message: any;
         try {
-          // Find JSON in output
-          const jsonMatch = stdout.match(/\{[\s\S]*\}/);
-          if (jsonMatch) {
-            const result = JSON.parse(jsonMatch[0]);
-            resolve(result);
-          } else {
-            reject(new Error("No JSON output from Python script"));
-          }
+          message = JSON.parse(line);
         } catch (error) {
-          reject(new Error(`Failed to parse Python output: ${error}`));
+          console.error("Failed to parse Python worker output:", line);
+          // responses start with their id, so the caller can still be failed
+          const match = /^\{"id": (\d+)/.exec(line);
+          const pending = match ? takePending(Number(match[1])) : undefined;
+          pending?.reject(new Error("Python worker sent an unreadable response"));
+          continue;
+        }
+        const pending = takePending(message.id);
+        if (!pending) continue;
+        if (message.error) {
+          pending.reject(new Error(`Python worker failed: ${message.error}`));
+        } else {
+          pending.resolve(message.result);
         }
+      }
+    });
+
+    proc.on("exit", (code) => {
+      mlPool = null;
+      pendingRequests.forEach((pending) => {
+        clearTimeout(pending.timer);
+        pending.reject(new Error(`Python worker pool exited with code ${code}`));
       });
+      pendingRequests.clear();
+    });
+
+    mlPool = proc;
+    return proc;
+  }
+
+  function callPythonWorker(op: string, params: Record<string, unknown> = {}): Promise<any> {
+    return new Promise((resolve, reject) => {
+      const id = nextRequestId++;
+      const timer = setTimeout(() => {
+        takePending(id)?.reject(new Error(`Python worker timed out after ${PYTHON_WORKER_TIMEOUT_MS} ms`));
+      }, PYTHON_WORKER_TIMEOUT_MS);
+      pendingRequests.set(id, { resolve, reject, timer });
+      getMlPool().stdin!.write(JSON.stringify({ id, op, params }) + "\n");
     });
   }
 
@@ -156,13 +199,13 @@ export async function registerRoutes(app: Express): Promise<Server> {
         });
       }
 
-      // Call Python prediction script
-      const result = await callPythonScript("predict_linear.py", [
-        humidity.toString(),
-        pressure.toString(),
-        wind_speed.toString(),
-        clouds.toString(),
-      ]);
+      // Call warm Python prediction worker
+      const result = await callPythonWorker("predict_temperature", {
+        humidity,
+        pressure,
+        wind_speed,
+        clouds,
+      });
 
       res.json(result);
     } catch (error) {
@@ -190,14 +233,14 @@ export async function registerRoutes(app: Express): Promise<Server> {
         });
       }
 
-      // Call Python classification script
-      const result = await callPythonScript("predict_logistic.py", [
-        temperature.toString(),
-        humidity.toString(),
-        pressure.toString(),
-        wind_speed.toString(),
-        clouds.toString(),
-      ]);
+      // Call warm Python classification worker
+      const result = await callPythonWorker("classify_weather", {
+        temperature,
+        humidity,
+        pressure,
+        wind_speed,
+        clouds,
+      });
 
       res.json(result);
     } catch (error) {
@@ -208,10 +251,35 @@ export async function registerRoutes(app: Express): Promise<Server> {
     }
   });
 
+  // What-if grid sweep: one vectorized call for a whole heatmap (server/sweep.py)
+  app.post("/api/ml/sweep", async (req, res) => {
+    try {
+      const { kind, axes, fixed, decimals } = req.body;
+
+      if (
+        (kind !== undefined && kind !== "temperature" && kind !== "weather") ||
+        typeof axes !== "object" || axes === null ||
+        (fixed !== undefined && (typeof fixed !== "object" || fixed === null))
+      ) {
+        return res.status(400).json({ 
+          error: "Invalid sweep request" 
+        });
+      }
+
+      const result = await callPythonWorker("sweep", { kind, axes, fixed, decimals });
+      res.json(result);
+    } catch (error) {
+      console.error("Sweep error:", error);
+      res.status(500).json({ 
+        error: "Failed to compute sweep" 
+      });
+    }
+  });
+
   // Dataset Statistics
   app.get("/api/ml/dataset-stats", async (req, res) => {
     try {
-      const result = await callPythonScript("get_stats.py");
+      const result = await callPythonWorker("stats");
       res.json(result);
     } catch (error) {
       console.error("Dataset stats error:", error);
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Per-station model shards.
+
+A station (or region — any string key) can have its own temperature, rain and
+cloud models. ml_models/train_stations.py fits them and writes a stations/
+folder next to the global artifacts:
+
+    stations/index.json         {"n_shards": N, "stations": {station: {"shard": i, "rows": n, "models": [...]}}}
+    stations/shard-0000.bundle  model bundle (compiled.save_bundle) holding the
+    stations/shard-0001.bundle  artifacts of every station hashed to that shard,
+    ...                         as members named "<station>/<key>"
+
+StationRegistry loads a shard the first time one of its stations is asked
+for and keeps at most `capacity` shards in an LRU, so thousands of stations
+cost only the memory of the hot ones. A shard whose file changed on disk is
+reloaded on its next use. models_for(station) returns a mapping over that
+station's artifacts that falls back to the global registry for stations —
+or individual artifacts — without a shard entry; it can be passed as
+`models` to every predict function.
+"""
+
+import os
+import json
+import zlib
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+import instrumentation
+from compiled import load_bundle
+
+STATIONS_DIR = "stations"
+INDEX_NAME = "index.json"
+DEFAULT_SHARDS = 64
+DEFAULT_CAPACITY = 32
+
+
+def shard_of(station: str, n_shards: int) -> int:
+    """Stable shard number of a station (crc32, so every process agrees)."""
+    return zlib.crc32(str(station).encode("utf-8")) % n_shards
+
+
+def shard_name(shard: int) -> str:
+    return "shard-%04d.bundle" % shard
+
+
+def member_name(station: str, key: str) -> str:
+    return "%s/%s" % (station, key)
+
+
+def _stat_sig(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+class StationModels:
+    """
+    Read-only mapping over one station's artifacts. Keys missing from the
+    station's shard (or every key, for an unknown station) come from `fallback`.
+    """
+
+    def __init__(self, station: str, bundle, fallback):
+        self.station = station
+        self._bundle = bundle
+        self._fallback = fallback
+
+    @property
+    def scope(self) -> str:
+        """Either "station" (the station has its own models) or "global"."""
+        return "station" if self._bundle is not None else "global"
+
+    def _own(self, key: str) -> bool:
+        return self._bundle is not None and member_name(self.station, key) in self._bundle.members
+
+    def __getitem__(self, key: str) -> Any:
+        if self._own(key):
+            return self._bundle[member_name(self.station, key)]
+        return self._fallback[key]
+
+    def get(self, key: str, default: Any = None) -> Any:
+        try:
+            return self[key]
+        except (KeyError, FileNotFoundError):
+            return default
+
+    def __contains__(self, key: str) -> bool:
+        return self._own(key) or key in self._fallback
+
+    def keys(self):
+        return self._fallback.keys()
+
+    def version(self, keys: Optional[Iterable[str]] = None) -> str:
+        """Digest of the artifacts behind `keys`, like ModelRegistry.version()."""
+        keys = list(self.keys()) if keys is None else list(keys)
+        if not any(self._own(key) for key in keys):
+            # same digest as the fallback, so cached global predictions are shared
+            return self._fallback.version(keys)
+        parts = []
+        for key in keys:
+            if self._own(key):
+                parts.append("%s@%s" % (member_name(self.station, key), self._bundle.content_sha256))
+            else:
+                parts.append(self._fallback.version([key]))
+        return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()[:16]
+
+
+class StationRegistry:
+    """
+    Station -> StationModels, loading shard bundles on demand into a bounded LRU.
+
+    `search_dirs` lists candidate stations/ folders (the first holding an
+    index.json wins); `fallback` serves stations without their own models.
+    """
+
+    def __init__(self, search_dirs: Callable[[], Iterable[str]], fallback,
+                 capacity: int = DEFAULT_CAPACITY,
+                 loader: Callable[[str], Any] = load_bundle,
+                 log: Optional[Callable[[str], None]] = None):
+        self._search_dirs_fn = search_dirs
+        self.fallback = fallback
+        self.capacity = max(1, int(capacity))
+        self._loader = loader
+        self._log = log
+        self._root: Optional[str] = None
+        self._index: Dict[str, Any] = {}
+        self._index_sig: Optional[Tuple[int, int]] = None
+        # shard number -> (stat signature, bundle), least recently used first
+        self._shards: "OrderedDict[int, Tuple[Optional[Tuple[int, int]], Any]]" = OrderedDict()
+        self._hits = self._misses = self._evictions = 0
+        self._lock = threading.RLock()
+
+    # -- index -----------------------------------------------------------
+    def _find_root(self) -> Optional[str]:
+        for d in self._search_dirs_fn():
+            if os.path.exists(os.path.join(d, INDEX_NAME)):
+                return d
+        return None
+
+    def _refresh_index(self):
+        if self._root is None:
+            self._root = self._find_root()
+            if self._root is None:
+                return
+        path = os.path.join(self._root, INDEX_NAME)
+        sig = _stat_sig(path)
+        if sig == self._index_sig:
+            return
+        if sig is None:
+            # stations removed (or moved): look again next time
+            self._root, self._index, self._index_sig = None, {}, None
+            self._shards.clear()
+            return
+        with open(path) as f:
+            self._index = json.load(f)
+        self._index_sig = sig
+        # a retrain may have re-hashed stations into a different shard count
+        self._shards.clear()
+        if self._log:
+            self._log("Loaded station index (%d stations) from %s"
+                      % (len(self._index.get("stations", {})), self._root))
+
+    def stations(self) -> Dict[str, Dict[str, Any]]:
+        """{station: {"shard", "rows"}} of every station with its own models."""
+        with self._lock:
+            self._refresh_index()
+            return dict(self._index.get("stations", {}))
+
+    # -- shards ----------------------------------------------------------
+    def _shard(self, shard: int):
+        path = os.path.join(self._root, shard_name(shard))
+        sig = _stat_sig(path)
+        cached = self._shards.get(shard)
+        if cached is not None and cached[0] == sig:
+            self._shards.move_to_end(shard)
+            self._hits += 1
+            return cached[1]
+        self._misses += 1
+        with instrumentation.stage("load"):
+            bundle = self._loader(path)
+        instrumentation.count("station_shard_loads")
+        self._shards[shard] = (sig, bundle)
+        self._shards.move_to_end(shard)
+        while len(self._shards) > self.capacity:
+            self._shards.popitem(last=False)
+            self._evictions += 1
+        return bundle
+
+    def models_for(self, station, fallback=None) -> StationModels:
+        """The station's models; an unknown station gets the global ones."""
+        station = str(station)
+        fallback = self.fallback if fallback is None else fallback
+        with self._lock:
+            self._refresh_index()
+            entry = self._index.get("stations", {}).get(station)
+            if entry is None:
+                instrumentation.count("station_fallbacks")
+                return StationModels(station, None, fallback)
+            return StationModels(station, self._shard(int(entry["shard"])), fallback)
+
+    def cache_info(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "capacity": self.capacity,
+                "loaded": len(self._shards),
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "stations": len(self._index.get("stations", {})),
+            }
+
+    def clear(self):
+        with self._lock:
+            self._root, self._index, self._index_sig = None, {}, None
+            self._shards.clear()
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+Cached dataset statistics with incremental recomputation.
+
+get_dataset_stats() used to re-read the whole CSV on every call. This module
+keeps a small JSON sidecar next to the dataset (<dataset>.stats.json) holding
+the per-column running state, keyed by the file's size, mtime and sampled
+content hashes:
+
+- unchanged file (same size and mtime): the stats are a file read;
+- rows only appended (file grew, head/old-tail hashes still match): only the
+  new bytes are parsed, and the running state is updated — Chan/Welford
+  moments for mean/std, min/max, and a centroid quantile sketch for the median;
+- anything else: a full, chunked rescan.
+
+Medians come from the sketch: exact while a column has at most
+SKETCH_CAPACITY distinct values, approximate (equal-weight centroids) beyond.
+"""
+
+import os
+import json
+import hashlib
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+CACHE_VERSION = 1
+CACHE_SUFFIX = ".stats.json"
+SKETCH_CAPACITY = 2048
+HASH_WINDOW = 64 * 1024
+SAMPLE_ROWS = 10
+CHUNKSIZE = 200_000
+
+
+def _debug_print(msg: str):
+    import sys
+    print("[stats_cache.py] " + msg, file=sys.stderr)
+
+
+# -- quantile sketch ---------------------------------------------------------
+
+class QuantileSketch:
+    """Sorted (value, count) centroids, compressed to at most `capacity` entries."""
+
+    def __init__(self, capacity: int = SKETCH_CAPACITY, centroids=None):
+        self.capacity = capacity
+        cents = np.asarray(centroids if centroids is not None else np.empty((0, 2)), dtype=np.float64)
+        self.values = cents[:, 0].copy() if len(cents) else np.empty(0)
+        self.counts = cents[:, 1].copy() if len(cents) else np.empty(0)
+
+    def update(self, x: np.ndarray):
+        if len(x) == 0:
+            return
+        vals, counts = np.unique(np.asarray(x, dtype=np.float64), return_counts=True)
+        self._add(vals, counts.astype(np.float64))
+
+    def merge(self, other: "QuantileSketch"):
+        if len(other.values):
+            self._add(other.values, other.counts)
+
+    def _add(self, vals: np.ndarray, counts: np.ndarray):
+        values = np.concatenate((self.values, vals))
+        weights = np.concatenate((self.counts, counts))
+        # sort and fold identical values together
+        uniq, inverse = np.unique(values, return_inverse=True)
+        merged = np.bincount(inverse, weights=weights)
+        self.values, self.counts = uniq, merged
+        if len(self.values) > self.capacity:
+            self._compress()
+
+    def _compress(self):
+        total = self.counts.sum()
+        before = np.cumsum(self.counts) - self.counts
+        bins = np.minimum((before / total * self.capacity).astype(int), self.capacity - 1)
+        counts = np.bincount(bins, weights=self.counts)
+        sums = np.bincount(bins, weights=self.values * self.counts)
+        keep = counts > 0
+        self.values = sums[keep] / counts[keep]
+        self.counts = counts[keep]
+
+    def quantile(self, q: float) -> float:
+        """Linear-interpolated quantile, matching pandas when the sketch is exact."""
+        total = self.counts.sum()
+        if total == 0:
+            return float("nan")
+        rank = q * (total - 1)
+        lo, hi = int(np.floor(rank)), int(np.ceil(rank))
+        # index of the centroid holding each 0-based rank
+        cum = np.cumsum(self.counts)
+        v_lo = self.values[np.searchsorted(cum, lo, side="right")]
+        v_hi = self.values[np.searchsorted(cum, hi, side="right")]
+        return float(v_lo + (v_hi - v_lo) * (rank - lo))
+
+    def to_list(self) -> List[List[float]]:
+        return np.column_stack((self.values, self.counts)).tolist()
+
+
+# -- running column state ----------------------------------------------------
+
+class ColumnStats:
+    def __init__(self, n=0, mean=0.0, m2=0.0, min=float("inf"), max=float("-inf"), sketch=None):
+        self.n = n
+        self.mean = mean
+        self.m2 = m2
+        self.min = min
+        self.max = max
+        self.sketch = QuantileSketch(centroids=sketch)
+
+    def update(self, x: np.ndarray):
+        x = np.asarray(x, dtype=np.float64)
+        x = x[~np.isnan(x)]
+        if len(x) == 0:
+            return
+        n_b = len(x)
+        mean_b = float(x.mean())
+        m2_b = float(((x - mean_b) ** 2).sum())
+        n = self.n + n_b
+        delta = mean_b - self.mean
+        self.mean += delta * n_b / n
+        self.m2 += m2_b + delta * delta * self.n * n_b / n
+        self.n = n
+        self.min = min(self.min, float(x.min()))
+        self.max = max(self.max, float(x.max()))
+        self.sketch.update(x)
+
+    def merge(self, other: "ColumnStats"):
+        """Fold in the state of another slice of the same column (Chan's parallel update)."""
+        if other.n == 0:
+            return
+        n = self.n + other.n
+        delta = other.mean - self.mean
+        self.mean += delta * other.n / n
+        self.m2 += other.m2 + delta * delta * self.n * other.n / n
+        self.n = n
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.sketch.merge(other.sketch)
+
+    def summary(self) -> Dict[str, float]:
+        nan = float("nan")
+        return {
+            'mean': float(self.mean) if self.n else nan,
+            'median': self.sketch.quantile(0.5),
+            'std': float(np.sqrt(self.m2 / (self.n - 1))) if self.n > 1 else nan,
+            'min': float(self.min) if self.n else nan,
+            'max': float(self.max) if self.n else nan
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"n": self.n, "mean": self.mean, "m2": self.m2, "min": self.min, "max": self.max,
+                "sketch": self.sketch.to_list()}
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "ColumnStats":
+        return cls(d["n"], d["mean"], d["m2"], d["min"], d["max"], d["sketch"])
+
+
+# -- file fingerprints -------------------------------------------------------
+
+def _window_sha256(path: str, start: int, end: int) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        f.seek(start)
+        h.update(f.read(max(0, end - start)))
+    return h.hexdigest()
+
+
+def _fingerprint(path: str) -> Dict[str, Any]:
+    """Taken before a scan: the scan reads only the first `size` bytes, so rows
+    appended meanwhile are left for the next incremental update."""
+    st = os.stat(path)
+    size = st.st_size
+    return {
+        "size": size,
+        "mtime_ns": st.st_mtime_ns,
+        "head_sha256": _window_sha256(path, 0, min(size, HASH_WINDOW)),
+        "tail_sha256": _window_sha256(path, max(0, size - HASH_WINDOW), size),
+    }
+
+
+def _is_append_of(path: str, old: Dict[str, Any], size: int) -> bool:
+    old_size = old["size"]
+    if size <= old_size:
+        return False
+    if _window_sha256(path, 0, min(old_size, HASH_WINDOW)) != old["head_sha256"]:
+        return False
+    if _window_sha256(path, max(0, old_size - HASH_WINDOW), old_size) != old["tail_sha256"]:
+        return False
+    # the old data must end on a row boundary
+    with open(path, "rb") as f:
+        f.seek(old_size - 1)
+        return f.read(1) == b"\n"
+
+
+# -- computing ---------------------------------------------------------------
+
+def _scan(state: Dict[str, Any], reader):
+    """Fold every chunk of `reader` into `state` (columns, total_records, sample_data)."""
+    import pandas as pd
+
+    columns = {k: ColumnStats.from_dict(v) for k, v in state["columns"].items()}
+    for chunk in reader:
+        if state["features"] is None:
+            state["features"] = list(chunk.columns)
+            state["numeric"] = [c for c in chunk.columns if pd.api.types.is_numeric_dtype(chunk[c])]
+            columns = {c: ColumnStats() for c in state["numeric"]}
+        for c in state["numeric"]:
+            if not pd.api.types.is_numeric_dtype(chunk[c]):
+                raise ValueError("Column %s is no longer numeric" % c)
+            columns[c].update(chunk[c].to_numpy(dtype=np.float64, na_value=np.nan))
+        if len(state["sample_data"]) < SAMPLE_ROWS:
+            need = SAMPLE_ROWS - len(state["sample_data"])
+            state["sample_data"].extend(chunk.head(need).to_dict('records'))
+        state["total_records"] += int(len(chunk))
+    state["columns"] = {k: v.to_dict() for k, v in columns.items()}
+    return state
+
+
+def _full_state(path: str, size: int) -> Dict[str, Any]:
+    from dataset import iter_chunks
+    state = {"features": None, "numeric": [], "columns": {}, "sample_data": [], "total_records": 0}
+    # memory-mapped columns when a fresh columnar copy exists, CSV chunks otherwise
+    return _scan(state, iter_chunks(path, CHUNKSIZE, narrow=False, size=size))
+
+
+def _append_state(path: str, state: Dict[str, Any], offset: int, size: int) -> Dict[str, Any]:
+    import pandas as pd
+    from dataset import open_range
+    with open_range(path, offset, size) as f:
+        with pd.read_csv(f, header=None, names=state["features"], chunksize=CHUNKSIZE) as reader:
+            return _scan(state, reader)
+
+
+def _result(state: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        'total_records': int(state["total_records"]),
+        'features': list(state["features"] or []),
+        'statistics': {c: ColumnStats.from_dict(state["columns"][c]).summary() for c in state["numeric"]},
+        'sample_data': state["sample_data"]
+    }
+
+
+def cache_path_for(path: str) -> str:
+    return path + CACHE_SUFFIX
+
+
+def _read_cache(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(cache_path_for(path)) as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return cache if cache.get("version") == CACHE_VERSION else None
+
+
+def _write_cache(path: str, cache: Dict[str, Any]):
+    target = cache_path_for(path)
+    tmp = "%s.tmp-%d" % (target, os.getpid())
+    try:
+        with open(tmp, "w") as f:
+            json.dump(cache, f)
+        os.replace(tmp, target)
+    except OSError as e:
+        _debug_print("Could not write stats cache: " + str(e))
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+
+
+def cached_dataset_stats(path: str) -> Dict[str, Any]:
+    """Stats in the get_dataset_stats() format, served from / maintained in the sidecar cache."""
+    cache = _read_cache(path)
+    st = os.stat(path)
+    if cache is not None:
+        fp = cache["fingerprint"]
+        if fp["size"] == st.st_size and fp["mtime_ns"] == st.st_mtime_ns:
+            return cache["result"]
+
+    fingerprint = _fingerprint(path)
+    size = fingerprint["size"]
+    state = None
+    if cache is not None and _is_append_of(path, cache["fingerprint"], size):
+        try:
+            state = _append_state(path, cache["state"], cache["fingerprint"]["size"], size)
+        except Exception as e:
+            _debug_print("Incremental stats update failed, rescanning: " + str(e))
+            state = None
+    if state is None:
+        state = _full_state(path, size)
+
+    result = _result(state)
+    _write_cache(path, {
+        "version": CACHE_VERSION,
+        "fingerprint": fingerprint,
+        "state": state,
+        "result": result,
+    })
+    return result
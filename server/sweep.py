@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+What-if grid sweeps for the dashboard heatmaps.
+
+A sweep varies some features over ranges, holds the others fixed and scores
+the whole Cartesian grid at once:
+
+    {"kind": "temperature",
+     "axes": {"pressure": {"start": 980, "stop": 1040, "num": 61},
+              "humidity": {"start": 0, "stop": 100, "step": 5}},
+     "fixed": {"wind_speed": 5, "clouds": 50}}
+
+An axis is {"start", "stop", "num"} (inclusive, like np.linspace),
+{"start", "stop", "step"} (stop included when it falls on a step) or an
+explicit list of values. Every model here is linear in its features, so the
+grid's scores are intercept + coef . fixed plus one broadcast 1-D term per
+axis: no (cells x features) matrix is built. Models without coefficients
+fall back to scoring the expanded grid with the batch functions.
+
+The result keeps the grid compact: axis values, the grid shape and one flat
+row-major (C order) list per output, rounded to `decimals`. "weather" sweeps
+give P(rain) and P(cloudy) per cell (the label is the class with p > 0.5).
+Results are cached per model version, so repeating a sweep costs a lookup
+and a retrain invalidates it (ML_SWEEP_CACHE_SIZE entries, default 64).
+"""
+
+import os
+import json
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+import instrumentation
+from compiled import CompiledModel, compile_model
+from prediction_cache import PredictionCache, is_missing, model_version
+from predict import _models_for, predict_temperature_batch, classify_weather_batch
+from validation import NOT_FINITE, OUT_OF_RANGE, FeatureSchema, TEMP_SCHEMA, WEATHER_SCHEMA
+
+MAX_CELLS = 1_000_000
+DEFAULT_DECIMALS = 4
+
+# kind -> (schema, prediction name whose artifacts it reads, {output: model key})
+KINDS = {
+    "temperature": (TEMP_SCHEMA, "predict_temperature", {"predicted_temperature": "linear"}),
+    "weather": (WEATHER_SCHEMA, "classify_weather", {"rain_probability": "rain", "cloudiness_probability": "cloud"}),
+}
+
+
+def _axis_values(feature: str, spec, schema: FeatureSchema) -> np.ndarray:
+    if isinstance(spec, dict):
+        try:
+            start, stop = float(spec["start"]), float(spec["stop"])
+        except (KeyError, TypeError, ValueError):
+            raise ValueError("Axis %s needs numeric 'start' and 'stop'" % feature)
+        if "num" in spec:
+            values = np.linspace(start, stop, int(spec["num"]))
+        elif "step" in spec:
+            step = float(spec["step"])
+            if not step > 0:
+                raise ValueError("Axis %s step must be positive" % feature)
+            # a little slack so float error doesn't drop an end point that is on a step
+            values = start + step * np.arange(int(np.floor((stop - start) / step + 1e-9)) + 1)
+        else:
+            raise ValueError("Axis %s needs 'num' or 'step'" % feature)
+    elif isinstance(spec, (list, tuple)):
+        try:
+            values = np.asarray(spec, dtype=np.float64)
+        except (TypeError, ValueError):
+            raise ValueError("Axis %s values must be numbers" % feature)
+    else:
+        raise ValueError("Axis %s must be a range object or a list of values" % feature)
+    if values.ndim != 1 or len(values) == 0:
+        raise ValueError("Axis %s is empty" % feature)
+    lo, hi = schema.ranges[feature]
+    if not np.isfinite(values).all():
+        raise ValueError(schema.describe(feature, NOT_FINITE))
+    if values.min() < lo or values.max() > hi:
+        raise ValueError(schema.describe(feature, OUT_OF_RANGE))
+    return values
+
+
+def parse_spec(spec: Dict[str, Any]) -> Tuple[str, FeatureSchema, Dict[str, np.ndarray], Dict[str, float]]:
+    """(kind, schema, {feature: axis values} in request order, {feature: fixed value}); ValueError on bad specs."""
+    kind = spec.get("kind", "temperature")
+    if kind not in KINDS:
+        raise ValueError("Sweep kind must be one of %s" % sorted(KINDS))
+    schema = KINDS[kind][0]
+    axes_spec = spec.get("axes") or {}
+    fixed_spec = spec.get("fixed") or {}
+    if not isinstance(axes_spec, dict) or not axes_spec:
+        raise ValueError("A sweep needs at least one axis")
+    unknown = [f for f in list(axes_spec) + list(fixed_spec) if f not in schema.ranges]
+    if unknown:
+        raise ValueError("Unknown %s features: %s" % (kind, ", ".join(unknown)))
+    both = [f for f in axes_spec if f in fixed_spec]
+    if both:
+        raise ValueError("Features both swept and fixed: " + ", ".join(both))
+    missing = [f for f in schema.features if f not in axes_spec and f not in fixed_spec]
+    if missing:
+        raise ValueError("Missing fixed values for: " + ", ".join(missing))
+
+    axes = {f: _axis_values(f, s, schema) for f, s in axes_spec.items()}
+    cells = int(np.prod([len(v) for v in axes.values()]))
+    if cells > MAX_CELLS:
+        raise ValueError("Sweep of %d cells exceeds the limit of %d" % (cells, MAX_CELLS))
+    fixed = {}
+    for f, v in fixed_spec.items():
+        if isinstance(v, (list, tuple, dict)):
+            raise ValueError("Fixed feature %s takes a single value" % f)
+        fixed[f] = float(_axis_values(f, [v], schema)[0])
+    return kind, schema, axes, fixed
+
+
+def linear_grid(model: CompiledModel, axes: Dict[str, np.ndarray], fixed: Dict[str, float]) -> np.ndarray:
+    """Scores of a one-output linear model over the grid, shape (len(axis) for each axis)."""
+    names = [str(n) for n in model.feature_names_in_]
+    coef = model.coef_[0]
+    base = float(model.intercept_[0]) + sum(coef[names.index(f)] * v for f, v in fixed.items())
+    shape = tuple(len(v) for v in axes.values())
+    grid = np.full(shape, base)
+    for i, (f, values) in enumerate(axes.items()):
+        view = [1] * len(shape)
+        view[i] = len(values)
+        grid += coef[names.index(f)] * values.reshape(view)
+    return grid
+
+
+def _compiled(model, features) -> Optional[CompiledModel]:
+    if isinstance(model, CompiledModel):
+        return model
+    try:
+        return compile_model(model, features)
+    except (AttributeError, ValueError):
+        return None
+
+
+def _expanded_grid(schema: FeatureSchema, axes: Dict[str, np.ndarray], fixed: Dict[str, float]) -> np.ndarray:
+    """(cells, features) matrix of every grid point, for models that can't be broadcast."""
+    mesh = np.meshgrid(*axes.values(), indexing="ij")
+    cols = {f: m.reshape(-1) for f, m in zip(axes, mesh)}
+    n = len(next(iter(cols.values())))
+    return np.column_stack([cols[f] if f in cols else np.full(n, fixed[f]) for f in schema.features])
+
+
+def evaluate(kind: str, schema: FeatureSchema, axes: Dict[str, np.ndarray], fixed: Dict[str, float],
+             models) -> Dict[str, np.ndarray]:
+    """{output: grid} for the parsed sweep."""
+    outputs = KINDS[kind][2]
+    shape = tuple(len(v) for v in axes.values())
+    compiled = {out: _compiled(models[key], schema.features) for out, key in outputs.items()}
+    if all(m is not None and m.coef_.shape[0] == 1 for m in compiled.values()):
+        grids = {}
+        for out, model in compiled.items():
+            scores = linear_grid(model, axes, fixed)
+            if kind == "temperature":
+                grids[out] = scores
+            else:
+                with np.errstate(over="ignore"):
+                    pos = 1.0 / (1.0 + np.exp(-scores))
+                # probability of classes_[1] (rain / cloudy)
+                grids[out] = pos if int(model.classes_[1]) == 1 else 1.0 - pos
+        return grids
+
+    instrumentation.count("sweep_expanded")
+    X = _expanded_grid(schema, axes, fixed)
+    if kind == "temperature":
+        result = predict_temperature_batch(X, models=models, validate=False)
+        return {"predicted_temperature": result["predicted_temperature"].reshape(shape)}
+    result = classify_weather_batch(X, models=models, validate=False)
+    grids = {}
+    for out, label_key, positive in (("rain_probability", "rain_prediction", "Rain"),
+                                     ("cloudiness_probability", "cloudiness_prediction", "Cloudy")):
+        prob = np.asarray(result[out], dtype=float)
+        grids[out] = np.where(result[label_key] == positive, prob, 1.0 - prob).reshape(shape)
+    return grids
+
+
+_cache: Optional[PredictionCache] = None
+
+
+def get_sweep_cache() -> PredictionCache:
+    global _cache
+    if _cache is None:
+        # own counters, so grid lookups don't skew the serving cache's hit rate
+        _cache = PredictionCache(int(os.environ.get("ML_SWEEP_CACHE_SIZE") or 64), counter_prefix="sweep_cache")
+    return _cache
+
+
+def sweep(spec: Dict[str, Any], models=None, station=None) -> Dict[str, Any]:
+    """
+    Score the grid described by `spec` (module docstring); JSON-ready result
+    {"kind", "axes", "fixed", "shape", "cells", "values": {output: flat list}}.
+    """
+    kind, schema, axes, fixed = parse_spec(spec)
+    decimals = int(spec.get("decimals", DEFAULT_DECIMALS))
+    models = _models_for(models, station if station is not None else spec.get("station"))
+    version = model_version(models, KINDS[kind][1])
+    axis_lists = {f: v.tolist() for f, v in axes.items()}
+    # the cache holds the rounded flat arrays (8 bytes a cell), not the much larger lists
+    cache, key, values = get_sweep_cache(), None, None
+    if version is not None:
+        key = ("sweep", kind, json.dumps([axis_lists, fixed, decimals]), version)
+        values = cache.get(key)
+    if values is None or is_missing(values):
+        with instrumentation.stage("score"):
+            grids = evaluate(kind, schema, axes, fixed, models)
+            values = {out: np.round(g, decimals).reshape(-1) for out, g in grids.items()}
+        if key is not None:
+            cache.put(key, values)
+    shape = [len(v) for v in axes.values()]
+    return {
+        "kind": kind,
+        "axes": axis_lists,
+        "fixed": fixed,
+        "shape": shape,
+        "cells": int(np.prod(shape)),
+        "values": {out: v.tolist() for out, v in values.items()},
+    }
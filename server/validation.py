@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Schema-driven validation of model inputs.
+
+Each feature set (TEMP_SCHEMA for the temperature model, WEATHER_SCHEMA for
+the classifiers) lists its features with a physical range. validate() coerces
+a whole batch to a float64 matrix and checks type, finiteness and range in
+one vectorized pass per column, returning a per-row validity mask and a
+per-cell error code array instead of raising, so a few bad rows don't fail
+the batch. validate_row() is the scalar equivalent for single requests.
+"""
+
+import math
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from dataset import TEMP_FEATURES, WEATHER_FEATURES
+
+# per-cell error codes
+OK = 0
+MISSING = 1
+NOT_NUMERIC = 2
+NOT_FINITE = 3
+OUT_OF_RANGE = 4
+
+ERROR_NAMES = {
+    MISSING: "missing",
+    NOT_NUMERIC: "not a number",
+    NOT_FINITE: "not finite",
+    OUT_OF_RANGE: "out of range",
+}
+
+# plausible surface observations (pressure in hPa, wind in m/s)
+RANGES = {
+    'temperature': (-90.0, 60.0),
+    'humidity': (0.0, 100.0),
+    'pressure': (850.0, 1090.0),
+    'wind_speed': (0.0, 120.0),
+    'clouds': (0.0, 100.0),
+}
+
+
+class FeatureSchema:
+    def __init__(self, name: str, features: List[str], ranges: Dict[str, Tuple[float, float]]):
+        self.name = name
+        self.features = list(features)
+        self.ranges = {f: ranges[f] for f in self.features}
+        self.lo = np.array([self.ranges[f][0] for f in self.features])
+        self.hi = np.array([self.ranges[f][1] for f in self.features])
+
+    def describe(self, feature: str, code: int) -> str:
+        if code == OUT_OF_RANGE:
+            lo, hi = self.ranges[feature]
+            return "%s out of range [%g, %g]" % (feature, lo, hi)
+        return "%s %s" % (feature, ERROR_NAMES[code])
+
+
+TEMP_SCHEMA = FeatureSchema("temperature", TEMP_FEATURES, RANGES)
+WEATHER_SCHEMA = FeatureSchema("weather", WEATHER_FEATURES, RANGES)
+
+
+class ValidationResult:
+    """
+    X: (n, k) float64 in schema order; invalid cells are NaN.
+    codes: (n, k) int8 error code per cell; valid: (n,) bool, True when a row has no errors.
+    """
+
+    def __init__(self, schema: FeatureSchema, X: np.ndarray, codes: np.ndarray, valid: Optional[np.ndarray] = None):
+        self.schema = schema
+        self.X = X
+        self.codes = codes
+        self.valid = ~codes.any(axis=1) if valid is None else valid
+
+    @property
+    def all_valid(self) -> bool:
+        return bool(self.valid.all())
+
+    def row_errors(self, i: int) -> List[str]:
+        return [self.schema.describe(f, int(c)) for f, c in zip(self.schema.features, self.codes[i]) if c]
+
+    def errors(self) -> Dict[int, List[str]]:
+        """{row index: messages} for the invalid rows only."""
+        return {int(i): self.row_errors(i) for i in np.flatnonzero(~self.valid)}
+
+
+def _coerce_column(values) -> Tuple[np.ndarray, np.ndarray]:
+    """float64 column plus per-cell MISSING / NOT_NUMERIC codes."""
+    if isinstance(values, np.ndarray) and values.dtype == object:
+        values = values.tolist()
+    # np.asarray would turn None into NaN; keep "missing" distinct from "not finite"
+    if not isinstance(values, list) or values.count(None) == 0:
+        try:
+            col = np.asarray(values, dtype=np.float64)
+            if col.ndim == 1:
+                return col, np.zeros(len(col), dtype=np.int8)
+        except (TypeError, ValueError):
+            pass
+    # slow path, only for columns holding something np.asarray can't convert
+    values = list(values)
+    col = np.full(len(values), np.nan)
+    codes = np.zeros(len(values), dtype=np.int8)
+    for i, v in enumerate(values):
+        if v is None:
+            codes[i] = MISSING
+            continue
+        if isinstance(v, bool):
+            codes[i] = NOT_NUMERIC
+            continue
+        try:
+            col[i] = float(v)
+        except (TypeError, ValueError):
+            codes[i] = NOT_NUMERIC
+    return col, codes
+
+
+def _columns(rows, features) -> List[Any]:
+    if hasattr(rows, "columns"):
+        missing = [f for f in features if f not in rows.columns]
+        if missing:
+            raise ValueError("Missing feature columns: " + ", ".join(missing))
+        return [rows[f].to_numpy() for f in features]
+    if isinstance(rows, dict):
+        missing = [f for f in features if f not in rows]
+        if missing:
+            raise ValueError("Missing feature columns: " + ", ".join(missing))
+        return [np.asarray(rows[f]).reshape(-1) for f in features]
+    if isinstance(rows, (list, tuple)) and rows and isinstance(rows[0], dict):
+        return [[r.get(f) if isinstance(r, dict) else None for r in rows] for f in features]
+    arr = np.asarray(rows)
+    if arr.ndim == 1 and arr.size == len(features):
+        arr = arr.reshape(1, -1)
+    if arr.ndim != 2 or arr.shape[1] != len(features):
+        raise ValueError("Expected an array of shape (n, %d) ordered as %s" % (len(features), features))
+    return [arr[:, j] for j in range(len(features))]
+
+
+def validate(rows, schema: FeatureSchema) -> ValidationResult:
+    """
+    Coerce and check a batch (DataFrame, dict of columns, list of dicts or a
+    2-D array in schema order). Only structural problems — a missing column,
+    a wrongly shaped array — raise ValueError; bad values are reported per row.
+    """
+    k = len(schema.features)
+    if isinstance(rows, np.ndarray) and rows.dtype.kind in "iuf" and rows.ndim == 2 and rows.shape[1] == k:
+        # already numeric and in schema order: no per-column coercion, no copy unless something is bad
+        X = np.asarray(rows, dtype=np.float64)
+        codes = np.zeros(X.shape, dtype=np.int8)
+        coerced_ok = True
+    else:
+        cols = _columns(rows, schema.features)
+        X = np.empty((len(cols[0]), k))
+        codes = np.zeros(X.shape, dtype=np.int8)
+        for j, values in enumerate(cols):
+            X[:, j], codes[:, j] = _coerce_column(values)
+        coerced_ok = not codes.any()
+    # column by column is several times faster than broadcasting over (n, k);
+    # NaN and +-inf fail the range test too, so this one pass finds every bad row
+    valid = np.ones(len(X), dtype=bool)
+    with np.errstate(invalid="ignore"):
+        for j in range(k):
+            col = X[:, j]
+            valid &= col >= schema.lo[j]
+            valid &= col <= schema.hi[j]
+    if not coerced_ok:
+        valid &= ~codes.any(axis=1)
+    if not valid.all():
+        # per-cell codes only for the bad rows
+        bad_rows = np.flatnonzero(~valid)
+        sub, sub_codes = X[bad_rows], codes[bad_rows]
+        with np.errstate(invalid="ignore"):
+            in_range = (sub >= schema.lo) & (sub <= schema.hi)
+        unchecked = sub_codes == OK
+        sub_codes[unchecked & ~np.isfinite(sub)] = NOT_FINITE
+        sub_codes[unchecked & np.isfinite(sub) & ~in_range] = OUT_OF_RANGE
+        sub[sub_codes != OK] = np.nan
+        X = X.copy() if X is rows else X
+        X[bad_rows], codes[bad_rows] = sub, sub_codes
+    return ValidationResult(schema, X, codes, valid)
+
+
+def validate_row(params: Dict[str, Any], schema: FeatureSchema) -> Dict[str, float]:
+    """Single-row check without NumPy; raises ValueError listing every problem."""
+    out, problems = {}, []
+    for f in schema.features:
+        v = params.get(f)
+        if v is None:
+            problems.append(schema.describe(f, MISSING))
+            continue
+        try:
+            if isinstance(v, bool):
+                raise TypeError
+            x = float(v)
+        except (TypeError, ValueError):
+            problems.append(schema.describe(f, NOT_NUMERIC))
+            continue
+        lo, hi = schema.ranges[f]
+        if not math.isfinite(x):
+            problems.append(schema.describe(f, NOT_FINITE))
+        elif not lo <= x <= hi:
+            problems.append(schema.describe(f, OUT_OF_RANGE))
+        out[f] = x
+    if problems:
+        raise ValueError("Invalid input: " + "; ".join(problems))
+    return out
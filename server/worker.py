@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""
+Long-lived prediction worker.
+
+Loads the models once (via the model registry) and then answers
+newline-delimited JSON requests, either over stdin/stdout (default) or over a
+Unix socket (--socket PATH).
+
+Request:   {"id": 1, "op": "predict_temperature", "params": {"humidity": 70, ...}}
+Response:  {"id": 1, "result": {...}}   or   {"id": 1, "error": "..."}
+
+Supported ops: ping, predict_temperature, classify_weather,
+predict_temperature_batch, classify_weather_batch (params: {"rows": [...]}),
+stats (optional "since"/"until"), cache_stats, metrics (cumulative counters
+and stage timings), ingest ({"rows": [...], "flush": false}) and compact
+(observation_store.py), sweep (what-if grids, see sweep.py), and coalesced
+(single-row requests micro-batched by worker_pool.py: {"op": "predict_temperature"
+or "classify_weather", "requests": [params, ...]} -> {"responses": [{"result": ...}
+or {"error": ...}, ...]}).
+
+Inputs are checked against the feature schemas in validation.py: a bad
+single-row request fails with every problem listed, while a batch is scored
+for its valid rows and reports the rest under "errors" ({row index: [...]}).
+
+Prediction params may name a "station": its own models are used when
+ml_models/train_stations.py built them (station_models.py), the global ones
+otherwise.
+
+Single-row predictions go through the prediction cache (prediction_cache.py)
+when ML_PREDICTION_CACHE_SIZE is set. With "timings": true in a request (or
+ML_TIMINGS set, see instrumentation.py) the response carries a "timings"
+breakdown of that request.
+"""
+
+import os
+import sys
+import json
+import math
+import argparse
+import socketserver
+from typing import Dict, Any, Callable
+
+from predict import (
+    _debug_print,
+    get_registry,
+    predict_temperature,
+    classify_weather,
+    predict_temperature_batch,
+    classify_weather_batch,
+    batch_result_to_json,
+    get_dataset_stats,
+    get_station_registry,
+    shared_models_enabled,
+)
+import instrumentation
+from batching import split_batch_result
+from prediction_cache import get_prediction_cache, is_missing, model_version
+from validation import TEMP_SCHEMA, WEATHER_SCHEMA, validate_row
+
+TEMP_PARAMS = ("humidity", "pressure", "wind_speed", "clouds")
+WEATHER_PARAMS = ("temperature", "humidity", "pressure", "wind_speed", "clouds")
+SCHEMAS = {TEMP_PARAMS: TEMP_SCHEMA, WEATHER_PARAMS: WEATHER_SCHEMA}
+
+
+def _float_params(params: Dict[str, Any], names) -> Dict[str, float]:
+    """Checked float parameters (validation.py); ValueError names every bad one."""
+    return validate_row(params, SCHEMAS[tuple(names)])
+
+
+def _station_models(params, models):
+    """That station's models when the request names one ("station"), else `models`."""
+    station = params.get("station")
+    if station is None:
+        return models
+    return get_station_registry().models_for(station, fallback=models)
+
+
+def _op_ping(params, models):
+    return {"status": "ok", "pid": os.getpid(), "shared_models": shared_models_enabled()}
+
+
+def _cached(name: str, fn, row: Dict[str, float], models):
+    cache = get_prediction_cache()
+    version = model_version(models, name) if cache is not None else None
+    if version is None:
+        return fn(**row, models=models)
+    return cache.call(name, row, version, lambda q: fn(**q, models=models))
+
+
+def _op_predict_temperature(params, models):
+    return _cached("predict_temperature", predict_temperature, _float_params(params, TEMP_PARAMS),
+                   _station_models(params, models))
+
+
+def _op_classify_weather(params, models):
+    return _cached("classify_weather", classify_weather, _float_params(params, WEATHER_PARAMS),
+                   _station_models(params, models))
+
+
+def _batch_rows(params):
+    rows = params.get("rows")
+    if not rows:
+        raise ValueError("Batch requests need a non-empty 'rows' list")
+    return rows
+
+
+def _op_predict_temperature_batch(params, models):
+    return batch_result_to_json(predict_temperature_batch(_batch_rows(params), models=_station_models(params, models)))
+
+
+def _op_classify_weather_batch(params, models):
+    return batch_result_to_json(classify_weather_batch(_batch_rows(params), models=_station_models(params, models)))
+
+
+def _op_coalesced(params, models):
+    # every row is validated and cached exactly like its own single-row request;
+    # the cache misses are scored with one *_batch call
+    name = params.get("op")
+    if name not in COALESCED:
+        raise ValueError("Cannot coalesce op: " + repr(name))
+    requests = _batch_rows({"rows": params.get("requests")})
+    batch_fn, names = COALESCED[name]
+    cache = get_prediction_cache()
+    version = model_version(models, name) if cache is not None else None
+    responses = [None] * len(requests)
+    pending = []  # (index, row to score, cache key)
+    for i, p in enumerate(requests):
+        instrumentation.count("requests." + name)
+        try:
+            if not isinstance(p, dict):
+                raise ValueError("Request params must be a JSON object")
+            if p.get("station") is not None:
+                responses[i] = {"result": OPS[name](p, models)}
+                continue
+            row, key = _float_params(p, names), None
+            if version is not None:
+                key, row = cache.key(name, row, version)
+                value = cache.get(key)
+                if not is_missing(value):
+                    responses[i] = {"result": value}
+                    continue
+            pending.append((i, row, key))
+        except Exception as e:
+            instrumentation.count("request_errors")
+            responses[i] = {"error": str(e)}
+    if pending:
+        result = batch_fn([row for _, row, _ in pending], models=models, validate=False)
+        for (i, _, key), value in zip(pending, split_batch_result(result, len(pending))):
+            if key is not None:
+                cache.put(key, value)
+            responses[i] = {"result": value}
+    return {"responses": responses}
+
+
+def _op_stats(params, models):
+    # "since"/"until" switch to the ingested observations in that time range
+    return get_dataset_stats(since=params.get("since"), until=params.get("until"))
+
+
+def _op_ingest(params, models):
+    from observation_store import get_observation_store
+    return get_observation_store().append(_batch_rows(params), flush=bool(params.get("flush")))
+
+
+def _op_compact(params, models):
+    from observation_store import get_observation_store
+    return get_observation_store().compact()
+
+
+def _op_sweep(params, models):
+    from sweep import sweep
+    return sweep(params, models=_station_models(params, models))
+
+
+def _op_cache_stats(params, models):
+    cache = get_prediction_cache()
+    out = dict(cache.stats(), enabled=True) if cache is not None else {"enabled": False}
+    out["station_shards"] = get_station_registry().cache_info()
+    return out
+
+
+def _op_metrics(params, models):
+    return instrumentation.snapshot()
+
+
+# single-row op -> (batch function, parameters) for "coalesced" requests
+COALESCED = {
+    "predict_temperature": (predict_temperature_batch, TEMP_PARAMS),
+    "classify_weather": (classify_weather_batch, WEATHER_PARAMS),
+}
+
+OPS: Dict[str, Callable[[Dict[str, Any], Dict[str, Any]], Any]] = {
+    "ping": _op_ping,
+    "predict_temperature": _op_predict_temperature,
+    "classify_weather": _op_classify_weather,
+    "predict_temperature_batch": _op_predict_temperature_batch,
+    "classify_weather_batch": _op_classify_weather_batch,
+    "stats": _op_stats,
+    "ingest": _op_ingest,
+    "compact": _op_compact,
+    "sweep": _op_sweep,
+    "coalesced": _op_coalesced,
+    "cache_stats": _op_cache_stats,
+    "metrics": _op_metrics,
+}
+
+
+def handle_request(req: Dict[str, Any], models: Dict[str, Any]) -> Dict[str, Any]:
+    """Dispatch one decoded request; never raises, errors go in the response."""
+    req_id = req.get("id") if isinstance(req, dict) else None
+    try:
+        if not isinstance(req, dict):
+            raise ValueError("Request must be a JSON object")
+        op = req.get("op")
+        if op not in OPS:
+            raise ValueError("Unknown op: " + repr(op))
+        params = req.get("params") or {}
+        instrumentation.count("requests." + op)
+        with instrumentation.trace(force=bool(req.get("timings"))) as timings:
+            result = OPS[op](params, models)
+        response = {"id": req_id, "result": result}
+        if timings is not None and instrumentation.timings_in_response(bool(req.get("timings"))):
+            response["timings"] = timings
+        return response
+    except Exception as e:
+        instrumentation.count("request_errors")
+        return {"id": req_id, "error": str(e)}
+
+
+def _finite(obj):
+    if isinstance(obj, float):
+        return obj if math.isfinite(obj) else None
+    if isinstance(obj, dict):
+        return {k: _finite(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_finite(v) for v in obj]
+    return obj
+
+
+def dumps(obj) -> str:
+    """Strict JSON: NaN/Infinity (std of one row, a missing metric) become null."""
+    try:
+        return json.dumps(obj, allow_nan=False)
+    except ValueError:
+        return json.dumps(_finite(obj), allow_nan=False)
+
+
+def handle_line(line: str, models: Dict[str, Any]) -> str:
+    try:
+        req = json.loads(line)
+    except ValueError as e:
+        return dumps({"id": None, "error": "Invalid JSON: " + str(e)})
+    return dumps(handle_request(req, models))
+
+
+def serve_stdio(models: Dict[str, Any], stdin=None, stdout=None):
+    stdin = stdin or sys.stdin
+    stdout = stdout or sys.stdout
+    for line in stdin:
+        if not line.strip():
+            continue
+        stdout.write(handle_line(line, models) + "\n")
+        stdout.flush()
+
+
+def serve_socket(models: Dict[str, Any], socket_path: str):
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            for raw in self.rfile:
+                line = raw.decode("utf-8")
+                if not line.strip():
+                    continue
+                self.wfile.write((handle_line(line, models) + "\n").encode("utf-8"))
+                self.wfile.flush()
+
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    server = socketserver.ThreadingUnixStreamServer(socket_path, Handler)
+    server.daemon_threads = True
+    _debug_print("Worker listening on " + socket_path)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Long-lived weather prediction worker")
+    parser.add_argument("--socket", help="serve on this Unix socket instead of stdin/stdout")
+    args = parser.parse_args(argv)
+
+    # warm every artifact up front; the registry reloads them if a retrain replaces them
+    models = get_registry()
+    models.load_all()
+    if args.socket:
+        serve_socket(models, args.socket)
+    else:
+        serve_stdio(models)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Supervisor that keeps N warm prediction workers (worker.py) running.
+
+Requests arriving on stdin/stdout (default) or on a Unix socket (--socket PATH)
+are handed to the next idle worker; dead workers are respawned on demand.
+Responses keep the request "id", so in stdio mode they may arrive out of order.
+
+Workers start with ML_MODEL_MMAP=1 (see predict.shared_models_enabled): each
+maps the model bundle read-only instead of reading its own copy, so the
+coefficients live once in the page cache however many workers run, and a
+worker's load is a header parse plus one checksum pass over those shared
+pages (compiled.load_bundle). --private-models turns this off.
+
+With --batch-wait-ms (or ML_BATCH_WAIT_MS, as for http_server.py) concurrent
+single-row predict_temperature / classify_weather requests are micro-batched
+(batching.MicroBatcher): each batch goes to one worker as a "coalesced"
+request, which validates and caches every row like its own request but
+scores them as one matrix. Requests naming a "station" or asking for
+"timings" are forwarded unchanged.
+"""
+
+import os
+import sys
+import json
+import queue
+import argparse
+import threading
+import subprocess
+import socketserver
+from functools import partial
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional, Dict, Any, List
+
+from batching import DEFAULT_MAX_BATCH_SIZE, MicroBatcher
+
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "worker.py")
+
+
+def _debug_print(msg: str):
+    print("[worker_pool.py] " + msg, file=sys.stderr)
+
+
+class _Worker:
+    def __init__(self, python: str, env: Optional[Dict[str, str]] = None):
+        self.python = python
+        self.env = env
+        self.proc: Optional[subprocess.Popen] = None
+        self.start()
+
+    def start(self):
+        self.proc = subprocess.Popen(
+            [self.python, WORKER_SCRIPT],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+            bufsize=1,
+            env=self.env,
+        )
+
+    def alive(self) -> bool:
+        return self.proc is not None and self.proc.poll() is None
+
+    def restart(self):
+        self.stop()
+        self.start()
+
+    def call(self, line: str) -> str:
+        self.proc.stdin.write(line.rstrip("\n") + "\n")
+        self.proc.stdin.flush()
+        out = self.proc.stdout.readline()
+        if not out:
+            raise RuntimeError("worker exited (code %s)" % self.proc.poll())
+        return out
+
+    def stop(self):
+        if self.proc is None:
+            return
+        try:
+            self.proc.stdin.close()
+        except Exception:
+            pass
+        try:
+            self.proc.wait(timeout=2)
+        except subprocess.TimeoutExpired:
+            self.proc.kill()
+            self.proc.wait()
+        self.proc = None
+
+
+class WorkerPool:
+    """Fixed-size pool of warm worker processes."""
+
+    def __init__(self, size: int = 2, python: Optional[str] = None, shared_models: bool = True):
+        if size < 1:
+            raise ValueError("Pool size must be >= 1")
+        self.size = size
+        self.python = python or sys.executable
+        env = dict(os.environ, ML_MODEL_MMAP="1" if shared_models else "0")
+        self._workers: List[_Worker] = [_Worker(self.python, env) for _ in range(size)]
+        self._idle: "queue.Queue[_Worker]" = queue.Queue()
+        for w in self._workers:
+            self._idle.put(w)
+
+    def call_line(self, line: str) -> str:
+        """Send one raw NDJSON request line and return the raw response line."""
+        worker = self._idle.get()
+        try:
+            if not worker.alive():
+                _debug_print("Respawning dead worker")
+                worker.restart()
+            try:
+                return worker.call(line)
+            except Exception as e:
+                _debug_print("Worker failed, respawning: " + str(e))
+                worker.restart()
+                try:
+                    req_id = json.loads(line).get("id")
+                except Exception:
+                    req_id = None
+                return json.dumps({"id": req_id, "error": "worker failed: " + str(e)}) + "\n"
+        finally:
+            self._idle.put(worker)
+
+    def request(self, op: str, params: Optional[Dict[str, Any]] = None, req_id: Any = None) -> Dict[str, Any]:
+        line = json.dumps({"id": req_id, "op": op, "params": params or {}})
+        return json.loads(self.call_line(line))
+
+    def close(self):
+        for w in self._workers:
+            w.stop()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class PoolBatchers:
+    """Micro-batches single-row prediction requests into "coalesced" worker requests."""
+
+    OPS = ("predict_temperature", "classify_weather")
+
+    def __init__(self, pool: WorkerPool, max_wait_ms: float, max_batch_size: int = DEFAULT_MAX_BATCH_SIZE):
+        self._pool = pool
+        self.batchers = {op: MicroBatcher(partial(self._score, op), max_batch_size, max_wait_ms,
+                                          name=op + "-batcher")
+                         for op in self.OPS}
+
+    def _score(self, op: str, requests: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        response = self._pool.request("coalesced", {"op": op, "requests": requests})
+        if "error" in response:
+            raise RuntimeError(response["error"])
+        return response["result"]["responses"]
+
+    def submit_line(self, line: str) -> Optional[Future]:
+        """Future of the response line, or None when the request isn't batched."""
+        try:
+            req = json.loads(line)
+        except ValueError:
+            return None
+        if not isinstance(req, dict) or req.get("op") not in self.batchers or req.get("timings"):
+            return None
+        params = req.get("params") or {}
+        if not isinstance(params, dict) or "station" in params:
+            return None
+        out: Future = Future()
+
+        def _done(fut: Future):
+            try:
+                body = fut.result()
+            except Exception as e:
+                body = {"error": "worker failed: " + str(e)}
+            out.set_result(json.dumps(dict({"id": req.get("id")}, **body)) + "\n")
+
+        self.batchers[req["op"]].submit(params).add_done_callback(_done)
+        return out
+
+    def close(self):
+        for b in self.batchers.values():
+            b.close()
+
+
+def serve_stdio(pool: WorkerPool, batchers: Optional[PoolBatchers] = None):
+    write_lock = threading.Lock()
+
+    def _write(out: str):
+        with write_lock:
+            sys.stdout.write(out if out.endswith("\n") else out + "\n")
+            sys.stdout.flush()
+
+    def _answer(line: str):
+        _write(pool.call_line(line))
+
+    with ThreadPoolExecutor(max_workers=pool.size) as executor:
+        for line in sys.stdin:
+            if not line.strip():
+                continue
+            batched = batchers.submit_line(line) if batchers else None
+            if batched is not None:
+                # answered from the batcher thread; no executor thread waits on it
+                batched.add_done_callback(lambda f: _write(f.result()))
+            else:
+                executor.submit(_answer, line)
+
+
+def serve_socket(pool: WorkerPool, socket_path: str, batchers: Optional[PoolBatchers] = None):
+    class Handler(socketserver.StreamRequestHandler):
+        def _write(self, out: str):
+            with self.write_lock:
+                try:
+                    self.wfile.write(out.encode("utf-8"))
+                    self.wfile.flush()
+                except OSError:
+                    pass  # client went away; its other answers are dropped too
+
+        def _answer(self, written: Future, batched: Future):
+            try:
+                self._write(batched.result())
+            finally:
+                written.set_result(None)
+
+        def handle(self):
+            self.write_lock = threading.Lock()
+            in_flight: List[Future] = []
+            for raw in self.rfile:
+                line = raw.decode("utf-8")
+                if not line.strip():
+                    continue
+                batched = batchers.submit_line(line) if batchers else None
+                if batched is not None:
+                    # answered when its batch is scored, so pipelined lines batch together
+                    written: Future = Future()
+                    batched.add_done_callback(partial(self._answer, written))
+                    in_flight = [f for f in in_flight if not f.done()] + [written]
+                else:
+                    self._write(pool.call_line(line))
+            # the connection closes when handle() returns: finish writing first
+            for f in in_flight:
+                f.result()
+
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    server = socketserver.ThreadingUnixStreamServer(socket_path, Handler)
+    server.daemon_threads = True
+    _debug_print("Pool of %d workers listening on %s" % (pool.size, socket_path))
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Keep N warm prediction workers running")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("ML_WORKERS", "2")))
+    parser.add_argument("--socket", help="serve on this Unix socket instead of stdin/stdout")
+    parser.add_argument("--private-models", action="store_true",
+                        help="every worker reads its own copy of the models instead of mapping the bundle")
+    parser.add_argument("--batch-wait-ms", type=float,
+                        default=float(os.environ["ML_BATCH_WAIT_MS"]) if os.environ.get("ML_BATCH_WAIT_MS") else None,
+                        help="micro-batch single-row predictions, waiting up to this long (default: off)")
+    parser.add_argument("--batch-max-size", type=int,
+                        default=int(os.environ.get("ML_BATCH_MAX_SIZE", DEFAULT_MAX_BATCH_SIZE)))
+    args = parser.parse_args(argv)
+
+    with WorkerPool(args.workers, shared_models=not args.private_models) as pool:
+        batchers = PoolBatchers(pool, args.batch_wait_ms, args.batch_max_size) \
+            if args.batch_wait_ms is not None else None
+        try:
+            if args.socket:
+                serve_socket(pool, args.socket, batchers)
+            else:
+                serve_stdio(pool, batchers)
+        finally:
+            if batchers:
+                batchers.close()
+
+
+if __name__ == "__main__":
+    main()